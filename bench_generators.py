@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+# bench_generators - startup cost and records/s for each generator script
+#
+# example: ./bench_generators.py --sizes 1000,10000,100000,1000000 --output bench.json
+#
+# For every script this measures the wall time of a fresh interpreter that
+# only imports it (less the time of an interpreter that imports nothing), and
+# the steady-state rate of its record builder over synthetic rows. Each type
+# has a "typical" input and a "worst" one, e.g. SVCB with every SvcParam or a
+# DKIM TXT holding a 4096-bit key. A worst row may make several records (an
+# AAAA and a "6" line, or two SSHFP fingerprints), so rates are given per row
+# and per record. Rows differ from each other so per-run
+# caches such as tinysvcb's parameter cache are not simply hit every time.
+#
+# Results are written as JSON so runs can be compared between releases; a
+# summary table goes to stderr. A builder that raises on an input is reported
+# with an "error" rather than stopping the run.
+
+import os
+import sys
+import time
+import random
+
+SCRIPTS = ["tinycaa", "tinydkim", "tinyipv6", "tinyloc", "tinysrv", "tinysshfp", "tinysvcb", "tinyuri"]
+
+## a 1024-bit RSA SubjectPublicKeyInfo is 162 bytes, 216 characters of base64;
+## a 4096-bit one is 550 bytes, 736 characters
+B64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+def dkimKey( rng, chars ):
+    return( "".join( rng.choice(B64) for i in range(chars) ) )
+
+def caaRows( rng, worst ):
+    if worst:
+        ## long iodef URL, mostly characters that need escaping
+        return( lambda i: ("example" + str(i) + ".com", "128", "iodef", "mailto:security:" + "/" * 200 + str(i) + "@example.com", "86400") )
+    return( lambda i: ("example" + str(i) + ".com", "0", "issue", "ca.example.net", "86400") )
+
+def dkimRows( rng, worst ):
+    key = dkimKey( rng, 736 if worst else 216 )
+    return( lambda i: ("sel._domainkey.example" + str(i) + ".com", "v=DKIM1; k=rsa; p=" + key, "86400") )
+
+def ipv6Rows( rng, worst ):
+    if worst:
+        ## a raw AAAA line, every byte escaped, and a "6" line (AAAA and PTR)
+        ## for the same address: two records per row
+        def row( i ):
+            fqdn = "host" + str(i) + ".example.com"
+            ip = "ffff:ffff:ffff:ffff:ffff:ffff:%x:%x" % (i >> 16 & 0xffff, i & 0xffff)
+            return( [ ("r", fqdn, ip, "86400"), ("6", fqdn, ip, "86400") ] )
+        return( row )
+    return( lambda i: ("r", "host" + str(i) + ".example.com", "2001:db8::%x" % (i & 0xffff), "86400") )
+
+def locRows( rng, worst ):
+    if worst:
+        return( lambda i: ("host" + str(i) + ".example.com", "89", "59", "59.999", "S", "179", "59", "59.999", "W", "-99999.99m", "90000000m", "90000000m", "90000000m", "86400") )
+    return( lambda i: ("host" + str(i) + ".example.com", "51", "30", "3.637", "N", "0", "8", "29.624", "W", "24m", "30m", "10m", "2.9m", "86400") )
+
+def srvRows( rng, worst ):
+    if worst:
+        ## three 63-octet labels and a 61-octet one, exactly the 255 octet name limit
+        label = "a" * 62
+        return( lambda i: ("example" + str(i) + ".com", "ldap", "tcp", "65535", "65535", "65535", ".".join( [label + str(i % 10)] * 3 + [label[:61]] ), "86400") )
+    return( lambda i: ("example" + str(i) + ".com", "ldap", "tcp", "10", "20", "389", "dir" + str(i) + ".example.com", "86400") )
+
+def sshfpRows( rng, worst ):
+    fp = "%064x" % rng.getrandbits(256)
+    if worst:
+        ## RSA keys with both a SHA-1 and a SHA-256 fingerprint, on owner
+        ## names near the 253 character limit
+        sha1 = "%040x" % rng.getrandbits(160)
+        label = "h" * 60
+        return( lambda i: [ (".".join([label] * 3 + ["host" + str(i) + ".example.com"]), "1", fptype, value, "86400") for fptype, value in (("1", sha1), ("2", fp)) ] )
+    return( lambda i: ("host" + str(i) + ".example.com", "4", "2", fp, "86400") )
+
+def svcbRows( rng, worst ):
+    if worst:
+        ## every SvcParam (key7 is dohpath), with a large ech blob
+        import base64
+        ech = base64.b64encode( bytes( rng.randrange(256) for i in range(512) ) ).decode("ascii")
+        return( lambda i: ("65", "example" + str(i) + ".com", "1", "svc" + str(i) + ".example.net",
+            "mandatory=alpn,port alpn=h3,h2,http/1.1 no-default-alpn port=" + str(1024 + i % 60000)
+            + " ipv4hint=192.0.2." + str(i % 256) + ",198.51.100.1 ech=" + ech
+            + " ipv6hint=2001:db8::" + ("%x" % (i & 0xffff)) + ",2001:db8::1 key7=/dns-query{?dns}", "86400") )
+    return( lambda i: ("65", "example" + str(i) + ".com", "1", ".", "alpn=h2,h3 port=" + str(1024 + i % 60000), "86400") )
+
+def uriRows( rng, worst ):
+    if worst:
+        return( lambda i: ("example" + str(i) + ".com", "_ldap._tcp", "65535", "65535", "ldap://dir" + str(i) + ".example.com:389/" + "%2F" * 300, "86400") )
+    return( lambda i: ("example" + str(i) + ".com", "_ldap._tcp", "10", "20", "ldap://dir" + str(i) + ".example.com:389", "86400") )
+
+## script -> (builder function name, row factory)
+GENERATORS = {
+    "tinycaa": ("tinyCAARecord", caaRows),
+    "tinydkim": ("tinyDkimRecord", dkimRows),
+    "tinyipv6": ("tinyAAAARecord", ipv6Rows),
+    "tinyloc": ("tinyLocRecord", locRows),
+    "tinysrv": ("tinySrvRecord", srvRows),
+    "tinysshfp": ("tinySshfpRecord", sshfpRows),
+    "tinysvcb": ("tinySVCBRecord", svcbRows),
+    "tinyuri": ("tinyUriRecord", uriRows),
+}
+
+def interpreterTime( code, repeat ):
+    ## returns the median wall time of a fresh interpreter running code
+    import subprocess
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for n in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=here, env=env, check=True)
+        times.append( time.perf_counter() - start )
+    times.sort()
+    return( times[len(times) // 2] )
+
+def startupResults( scripts, repeat ):
+    ## returns {script: {"seconds": ..., "import_seconds": ...}}
+    baseline = interpreterTime( "pass", repeat )
+    results = {"python": {"seconds": baseline, "import_seconds": 0.0}}
+    for script in scripts:
+        seconds = interpreterTime( "import " + script, repeat )
+        results[script] = {"seconds": seconds, "import_seconds": max(0.0, seconds - baseline)}
+    return( results )
+
+def throughputResult( script, worst, rows, seed ):
+    ## returns one result dictionary for a builder over rows synthetic inputs
+    import importlib
+    name, factory = GENERATORS[script]
+    builder = getattr(importlib.import_module(script), name)
+    row = factory( random.Random(seed), worst )
+    ## a row is the builder's arguments, or a list of them for inputs that
+    ## make several records per row
+    inputs = []
+    for i in range(rows):
+        args = row(i)
+        inputs.extend( args if isinstance(args, list) else [args] )
+    result = {"generator": script, "input": "worst" if worst else "typical", "rows": rows, "records": len(inputs)}
+    try:
+        size = 0
+        start = time.perf_counter()
+        for args in inputs:
+            size += len( builder( *args ) ) + 1
+        seconds = time.perf_counter() - start
+    except (ValueError, OverflowError) as e:
+        result["error"] = type(e).__name__ + ": " + str(e)
+        return( result )
+    result.update( seconds=seconds, rows_per_second=rows / seconds, records_per_second=len(inputs) / seconds, bytes=size )
+    return( result )
+
+def main( argv=None ):
+    import getopt
+    import json
+    import platform
+    if argv is None:
+        argv = sys.argv[1:]
+    sizes = [1000, 10000, 100000]
+    scripts = list(SCRIPTS)
+    repeat = 5
+    seed = 1876
+    output = ""
+
+    opts, args = getopt.getopt(argv,"hs:g:r:o:",["help","sizes=","generators=","repeat=","seed=","output="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: bench_generators.py [--sizes 1000,10000,100000] [--output bench.json]')
+            print('  --sizes list (comma separated row counts, up to 1000000)')
+            print('  --generators list (comma separated script names, default all)')
+            print('  --repeat int (interpreter launches per startup measurement)')
+            print('  --seed int (random seed for the synthetic inputs)')
+            print('  --output path (write the JSON results here instead of stdout)')
+            return( 0 )
+        elif opt in ("-s", "--sizes"):
+            sizes = [ int(s) for s in arg.split(",") ]
+        elif opt in ("-g", "--generators"):
+            scripts = arg.split(",")
+        elif opt in ("-r", "--repeat"):
+            repeat = int(arg)
+        elif opt == "--seed":
+            seed = int(arg)
+        elif opt in ("-o", "--output"):
+            output = arg
+
+    for script in scripts:
+        if script not in GENERATORS:
+            sys.stderr.write( "bench_generators: unknown generator " + script + "\n" )
+            return( 1 )
+
+    results = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "startup": startupResults( scripts, repeat ),
+        "throughput": [],
+    }
+    sys.stderr.write( "{0:<10} {1:>10} {2:>10}\n".format("startup","total ms","import ms") )
+    for script, times in results["startup"].items():
+        sys.stderr.write( "{0:<10} {1:>10.1f} {2:>10.1f}\n".format(script, times["seconds"] * 1e3, times["import_seconds"] * 1e3) )
+
+    sys.stderr.write( "{0:<10} {1:<8} {2:>8} {3:>12}\n".format("generator","input","rows","rows/s") )
+    for script in scripts:
+        for worst in (False, True):
+            for rows in sizes:
+                result = throughputResult( script, worst, rows, seed )
+                results["throughput"].append( result )
+                rate = "{0:>12.0f}".format(result["rows_per_second"]) if "error" not in result else " " + result["error"]
+                sys.stderr.write( "{0:<10} {1:<8} {2:>8}{3}\n".format(script, result["input"], rows, rate) )
+
+    text = json.dumps(results, indent=1) + "\n"
+    if output:
+        with open(output, "w") as outfile:
+            outfile.write( text )
+    else:
+        sys.stdout.write( text )
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# bench_tinyaddr - compare tinyaddr's inet_pton packing with building ipaddress objects
+#
+# example: ./bench_tinyaddr.py --number 20000
+#
+# "unique" packs a different address each time, as a batch of AAAA hosts does;
+# "repeated" cycles through a few hint addresses, as SVCB ipv4hint/ipv6hint
+# lists do; "aaaa" and "svcb" time the whole builders with the old packing
+# patched back in.
+
+import sys
+import random
+import timeit
+import ipaddress
+import tinyaddr
+import tinyipv6
+import tinysvcb
+
+def legacyPackIPv4( text ):
+    return( ipaddress.IPv4Address(text).packed )
+
+def legacyPackIPv6( text ):
+    return( ipaddress.IPv6Address(text).packed )
+
+def legacyHexIPv6( text ):
+    return( str(ipaddress.IPv6Address(text).exploded).replace(":","") )
+
+def sampleAddresses( seed, count ):
+    rng = random.Random(seed)
+    return( [ str(ipaddress.IPv6Address(0x20010db8 << 96 | rng.getrandbits(64))) for i in range(count) ] )
+
+def timeBoth( name, func ):
+    ## returns (name, legacy seconds, tinyaddr seconds) for func() with each packing
+    saved = (tinyipv6.packIPv6, tinyipv6.hexIPv6, tinysvcb.packIPv4, tinysvcb.packIPv6)
+    tinyipv6.packIPv6, tinyipv6.hexIPv6 = legacyPackIPv6, legacyHexIPv6
+    tinysvcb.packIPv4, tinysvcb.packIPv6 = legacyPackIPv4, legacyPackIPv6
+    try:
+        old = timeit.timeit( func, number=1 )
+    finally:
+        tinyipv6.packIPv6, tinyipv6.hexIPv6, tinysvcb.packIPv4, tinysvcb.packIPv6 = saved
+    ## each test starts with empty address caches
+    tinyaddr.packIPv4.cache_clear()
+    tinyaddr.packIPv6.cache_clear()
+    new = timeit.timeit( func, number=1 )
+    return( (name, old, new) )
+
+def runBench( number, seed ):
+    unique = sampleAddresses( seed, number )
+    hints = sampleAddresses( seed + 1, 8 )
+    repeated = [ hints[i % len(hints)] for i in range(number) ]
+    for address in unique[:100] + hints:
+        if tinyaddr.packIPv6( address ) != legacyPackIPv6( address ) or tinyaddr.hexIPv6( address ) != legacyHexIPv6( address ):
+            raise ValueError("packing mismatch for " + address)
+    return( [
+        timeBoth( "unique", lambda: [ tinyipv6.packIPv6( a ) for a in unique ] ),
+        timeBoth( "repeated", lambda: [ tinyipv6.packIPv6( a ) for a in repeated ] ),
+        timeBoth( "aaaa", lambda: [ tinyipv6.tinyAAAARecord( "3", "host.example.com", a, "300" ) for a in unique ] ),
+        ## unwrapped, so tinysvcb's own parameter cache does not hide the packing
+        timeBoth( "svcb", lambda: [ tinysvcb.encodeParam.__wrapped__( 6, a + "," + hints[i % 8] + "," + hints[(i + 3) % 8] ) for i, a in enumerate(unique) ] ),
+    ] )
+
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    number = 20000
+    seed = 1876
+
+    opts, args = getopt.getopt(argv,"hn:s:",["help","number=","seed="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: bench_tinyaddr.py --number 20000')
+            print('  --number int (addresses per test)')
+            print('  --seed int (random seed for the sample addresses)')
+            return( 0 )
+        elif opt in ("-n", "--number"):
+            number = int(arg)
+        elif opt in ("-s", "--seed"):
+            seed = int(arg)
+
+    sys.stdout.write( "{0:<10} {1:>12} {2:>12} {3:>8}\n".format("test","ipaddress us","tinyaddr us","speedup") )
+    for name, old, new in runBench( number, seed ):
+        sys.stdout.write( "{0:<10} {1:>12.3f} {2:>12.3f} {3:>7.1f}x\n".format(
+            name, old / number * 1e6, new / number * 1e6, old / new) )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# bench_tinybytes - compare the shared tinyBytes encoder with the old per-script copy
+#
+# example: ./bench_tinybytes.py --number 2000
+#
+# Inputs are sized like the rdata we actually generate: a TXT record holding a
+# 2048-bit DKIM key, an SVCB ECH blob, a packed AAAA address and a CAA value.
+
+import sys
+import random
+import timeit
+from tinybytes import tinyBytes
+
+def legacyTinyBytes( bytearr, encode_all=False ):
+    ## the implementation each script used to carry, kept here for comparison
+    output = ""
+    for b in bytearr:
+        if not encode_all and b > 32 and b < 127 and b not in [47,58,92]:
+            output += chr(b)
+        else:
+            output += "\\{0:03o}".format(b)
+    return( output )
+
+def sampleInputs( seed ):
+    ## returns a list of (name, bytes, escape_all) tuples
+    rng = random.Random(seed)
+    b64 = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+    ## a 2048-bit RSA SubjectPublicKeyInfo is 294 bytes, 392 characters of base64
+    dkim_key = bytes( rng.choice(b64) for i in range(392) )
+    dkim = b"v=DKIM1; k=rsa; p=" + dkim_key
+    dkim = bytes([len(dkim) & 0xff]) + dkim
+    ## ECHConfigList blobs are usually a few hundred bytes of binary
+    ech = bytes( rng.randrange(256) for i in range(320) )
+    aaaa = bytes( rng.randrange(256) for i in range(16) )
+    caa = b"\x00\x05issueca.example.net; accounturi=https://ca.example.net/acct/1234"
+    return( [
+        ("dkim-2048", dkim, False),
+        ("svcb-ech", ech, False),
+        ("aaaa", aaaa, True),
+        ("caa", caa, False),
+    ] )
+
+def runBench( number, seed ):
+    results = []
+    for name, data, escape_all in sampleInputs( seed ):
+        if tinyBytes( data, escape_all ) != legacyTinyBytes( data, escape_all ):
+            raise ValueError("encoder mismatch for " + name)
+        old = timeit.timeit( lambda: legacyTinyBytes( data, escape_all ), number=number )
+        new = timeit.timeit( lambda: tinyBytes( data, escape_all ), number=number )
+        results.append( (name, len(data), old, new) )
+    return( results )
+
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    number = 2000
+    seed = 1876
+
+    opts, args = getopt.getopt(argv,"hn:s:",["help","number=","seed="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: bench_tinybytes.py --number 2000')
+            print('  --number int (iterations per input)')
+            print('  --seed int (random seed for the sample inputs)')
+            return( 0 )
+        elif opt in ("-n", "--number"):
+            number = int(arg)
+        elif opt in ("-s", "--seed"):
+            seed = int(arg)
+
+    sys.stdout.write( "{0:<10} {1:>6} {2:>12} {3:>12} {4:>8}\n".format("input","bytes","legacy us","table us","speedup") )
+    for name, size, old, new in runBench( number, seed ):
+        sys.stdout.write( "{0:<10} {1:>6} {2:>12.2f} {3:>12.2f} {4:>7.1f}x\n".format(
+            name, size, old / number * 1e6, new / number * 1e6, old / new) )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
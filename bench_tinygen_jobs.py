@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+# bench_tinygen_jobs - measure how tinygen --jobs throughput scales with worker count
+#
+# example: ./bench_tinygen_jobs.py --rows 200000 --max-jobs 8
+#
+# A synthetic manifest mixing every record type is encoded serially and then
+# with 2..N worker processes. Each parallel run is checked against the serial
+# output before its time is reported.
+
+import os
+import sys
+import time
+import getopt
+from tinygen import manifestRecords, parallelRecords
+
+SAMPLE_ROWS = [
+    'caa example{0}.com 0 issue "ca.example.net; account={0}"',
+    'srv example{0}.com ldap tcp 10 20 389 dir{0}.example.com',
+    'uri example{0}.com _ldap._tcp 10 20 ldap://dir{0}.example.com:389',
+    'loc host{0}.example.com 51 30 3.637 N 0 8 29.624 W 24m 30m 10m 2.9m',
+    'https example{0}.com 1 . "alpn=h2,h3 port=8443 ipv4hint=192.0.2.1 ipv6hint=2001:db8::1"',
+    'aaaa host{0}.example.com 2001:db8::{0:x}',
+    'sshfp host{0}.example.com 4 2 0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
+    'dkim sel._domainkey.example{0}.com "v=DKIM1; p=MIGfMA0GCSqGSIb3DQEBAQUAA4GNADCBiQKBgQC1"',
+]
+
+def syntheticManifest( rows ):
+    ## returns a list of manifest lines cycling through every record type
+    return( [ SAMPLE_ROWS[i % len(SAMPLE_ROWS)].format(i % 65536) for i in range(rows) ] )
+
+def timeRun( lines, jobs, chunksize ):
+    ## returns (seconds, output text) for one encoding pass
+    start = time.perf_counter()
+    if jobs > 1:
+        text = "".join( parallelRecords( lines, "86400", jobs, chunksize ) )
+    else:
+        text = "".join([ line + "\n" for line in manifestRecords( lines, "86400" ) ])
+    return( time.perf_counter() - start, text )
+
+def main( argv ):
+    rows = 100000
+    maxjobs = os.cpu_count() or 1
+    chunksize = 2000
+
+    opts, args = getopt.getopt(argv,"hr:j:",["help","rows=","max-jobs=","chunk="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: bench_tinygen_jobs.py --rows 100000 --max-jobs 8')
+            print('  --rows int (manifest rows to encode)')
+            print('  --max-jobs int (highest worker count to try)')
+            print('  --chunk int (manifest lines per work unit)')
+            return( 0 )
+        elif opt in ("-r", "--rows"):
+            rows = int(arg)
+        elif opt in ("-j", "--max-jobs"):
+            maxjobs = int(arg)
+        elif opt == "--chunk":
+            chunksize = int(arg)
+
+    lines = syntheticManifest( rows )
+    serial, expected = timeRun( lines, 1, chunksize )
+    sys.stdout.write( "{0:>4} {1:>10} {2:>12} {3:>8}\n".format("jobs","seconds","records/s","speedup") )
+    sys.stdout.write( "{0:>4} {1:>10.3f} {2:>12.0f} {3:>7.2f}x\n".format(1, serial, rows / serial, 1.0) )
+    for jobs in range(2, maxjobs + 1):
+        seconds, text = timeRun( lines, jobs, chunksize )
+        if text != expected:
+            raise ValueError("output with " + str(jobs) + " jobs differs from the serial run")
+        sys.stdout.write( "{0:>4} {1:>10.3f} {2:>12.0f} {3:>7.2f}x\n".format(jobs, seconds, rows / seconds, serial / seconds) )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -0,0 +1,38 @@
+import io
+import random
+import tinybytes
+import tinyshard
+from tinybytes import tinyBytes, compactLine
+from tinydata import unescapeBytes
+
+def fields( line ):
+    return( [ unescapeBytes( field.encode("latin-1") ) for field in line.split(":") ] )
+
+def test_round_trip():
+    rand = random.Random(24)
+    for i in range(2000):
+        rdata = bytes( rand.choice(b"\x00\x01\x07\x08\\:/ 0123456789az\xff") for j in range(rand.randint(0, 12)) )
+        line = ":name" + tinyBytes( bytes([i % 256]) ) + ".example.com:257:" + tinyBytes( rdata, i % 2 == 0 ) + ":86400"
+        compact = compactLine( line )
+        assert fields( compact ) == fields( line )
+        assert len(compact) <= len(line)
+
+def test_pads_only_before_digits():
+    line = ":example.com:257:" + tinyBytes( b"\x00\x05issue" ) + ":86400"
+    assert compactLine( line ) == ":example.com:257:\\0\\5issue:86400"
+    line = ":example.com:16:" + tinyBytes( b"\x0112" ) + ":86400"
+    assert compactLine( line ) == ":example.com:16:\\00112:86400"
+
+def test_writer_holds_partial_lines():
+    out = io.StringIO()
+    writer = tinyshard.CompactWriter( out )
+    writer.write( ":example.com:16:\\001" )
+    writer.write( "12:86400\n:a:16:\\000" )
+    writer.write( ":300\n" )
+    assert out.getvalue() == ":example.com:16:\\00112:86400\n:a:16:\\0:300\n"
+
+def test_saved_count():
+    tinybytes.SAVED = 0
+    text = ":example.com:257:\\000\\005issueca.example.net:86400\n"
+    compact = tinybytes.compactText( text )
+    assert tinybytes.SAVED == len(text) - len(compact) == 4
@@ -0,0 +1,23 @@
+import io
+import tinycaa
+
+POLICY = [ "# policy", "0 issue ca.example.net; account=1", "", "0 issuewild ;", "128 iodef mailto:security@example.com" ]
+DOMAINS = [ "example.com", "", "# skipped", "  Mixed.Example.NET  ", "a-b.example.org" ]
+
+def expectedLines( ttl ):
+    output = []
+    for domain in ("example.com", "Mixed.Example.NET", "a-b.example.org"):
+        for flags, tag, value in (("0", "issue", "ca.example.net; account=1"), ("0", "issuewild", ";"), ("128", "iodef", "mailto:security@example.com")):
+            output.append( tinycaa.tinyCAARecord( domain, flags, tag, value, ttl ) )
+    return( output )
+
+def test_policy_matches_single_records():
+    policy = list(tinycaa.policyRows( POLICY ))
+    assert list(tinycaa.policyRecords( DOMAINS, policy, "300" )) == expectedLines( "300" )
+
+def test_policy_option( tmp_path, capfd, monkeypatch ):
+    path = tmp_path / "policy.txt"
+    path.write_text( "\n".join(POLICY) + "\n" )
+    monkeypatch.setattr("sys.stdin", io.StringIO( "\n".join(DOMAINS) + "\n" ))
+    assert tinycaa.main( ["--policy", str(path), "--ttl", "600"] ) == 0
+    assert capfd.readouterr().out.split("\n")[:-1] == expectedLines( "600" )
@@ -0,0 +1,29 @@
+import tinygen
+from tinycache import RecordCache
+
+def rebuild( cache, lines ):
+    output = list(tinygen.manifestRecords( lines, "86400", 1, cache ))
+    cache.save()
+    cache.rotate()
+    return( output )
+
+def test_cache_stays_flat_across_edits( tmp_path ):
+    path = str(tmp_path / "cache")
+    cache = RecordCache( path )
+    lines = [ "caa host" + str(i) + ".example.com 0 issue ca.example.net" for i in range(50) ]
+    rebuild( cache, lines )
+    sizes = []
+    for edit in range(2):
+        lines[edit] = "caa edited" + str(edit) + ".example.com 0 issue ca.example.net"
+        output = rebuild( cache, lines )
+        assert output == list(tinygen.manifestRecords( lines, "86400" ))
+        with open(path) as infile:
+            sizes.append( (len(infile.readlines()), len(cache.entries) + len(cache.used)) )
+    assert sizes == [(51, 50), (51, 50)]
+
+def test_unchanged_rows_hit( tmp_path ):
+    cache = RecordCache( str(tmp_path / "cache") )
+    lines = [ "caa example.com 0 issue ca.example.net" ]
+    rebuild( cache, lines )
+    rebuild( cache, lines )
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,34 @@
+import tinygen
+import tinycdb
+from tinycdb import cdbGet
+from tinydata import parseLine
+
+def test_cdb_matches_text( tmp_path ):
+    manifest = tmp_path / "manifest"
+    manifest.write_text( "caa *.Example.COM 0 issue ca.example.net 300\ncaa Mixed.Example.com 128 iodef mailto:a@b\ncaa Esc\\065.example.com 0 issue ca.example.net\n" )
+    cdbpath = str(tmp_path / "data.cdb")
+    tinygen.writeCdb( [str(manifest)], "86400", 1, 2000, cdbpath )
+    with open(cdbpath, "rb") as infile:
+        data = infile.read()
+    lines = list(tinygen.generatedLines( [str(manifest)], "86400", 1, 2000, None ))
+    expected = [
+        (b"\x07example\x03com\x00", b"*"),
+        (b"\x05mixed\x07example\x03com\x00", b"="),
+        (b"\x07esc\\065\x07example\x03com\x00", b"="),
+    ]
+    assert len(lines) == len(expected)
+    for line, (key, marker) in zip(lines, expected):
+        fqdn, rrtype, rdata, ttl = parseLine( line.encode("latin-1") )
+        assert tinycdb.tinydnsKey( line[1:line.index(":", 1)] )[0] == key
+        values = cdbGet( data, key )
+        assert len(values) == 1
+        value = values[0]
+        assert value[0:2] == rrtype.to_bytes(2, "big")
+        assert value[2:3] == marker
+        assert value[3:7] == int(ttl).to_bytes(4, "big")
+        assert value[15:] == rdata
+
+def test_key_reads_escapes():
+    assert tinycdb.tinydnsKey( "\\052.A\\056b.Example.com." ) == (b"\x03a.b\x07example\x03com\x00", True)
+    assert tinycdb.tinydnsKey( "esc\\134065.example.com" ) == (b"\x07esc\\065\x07example\x03com\x00", False)
+    assert tinycdb.tinydnsKey( "a\\:b..example.com" ) == (b"\x03a:b\x07example\x03com\x00", False)
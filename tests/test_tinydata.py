@@ -0,0 +1,21 @@
+import tinydata
+
+DATA = b"""\
+:a.example.com:16:\\003one:300
+:A.Example.com.:16:\\003old:300
+:b.example.com:16:\\003bbb:300
+:other.example.org:16:\\003zzz:300
+#a comment
+Zexample.com:ns.example.com.:hostmaster.example.com.
+"""
+
+def test_diff_only_touches_generated_names():
+    lines = [":a.example.com:16:\\003one:300", ":a.example.com:16:\\003new:300", ":c.example.com:16:\\003ccc:300"]
+    stats = {}
+    out = list(tinydata.diffRecords( DATA, lines, stats ))
+    assert out == ["+:a.example.com:16:\\003new:300", "+:c.example.com:16:\\003ccc:300", "-:A.Example.com.:16:\\003old:300"]
+    assert stats == {"added": 2, "removed": 1, "unchanged": 1}
+
+def test_diff_duplicates():
+    lines = [":b.example.com:16:\\003bbb:300", ":b.example.com:16:\\003bbb:300"]
+    assert list(tinydata.diffRecords( DATA, lines )) == ["+:b.example.com:16:\\003bbb:300"]
@@ -0,0 +1,50 @@
+import os
+import tinydkim
+from tinycache import RecordCache
+from tinydata import parseLine
+
+def writeKey( path, body, mtime ):
+    path.parent.mkdir( parents=True, exist_ok=True )
+    path.write_text( "-----BEGIN PUBLIC KEY-----\n" + "\n".join( body[i:i + 64] for i in range(0, len(body), 64) ) + "\n-----END PUBLIC KEY-----\n" )
+    os.utime( path, ns=(mtime, mtime) )
+
+def test_cache_invalidated_by_mtime( tmp_path, monkeypatch ):
+    keydir = tmp_path / "keys"
+    writeKey( keydir / "example.com" / "sel1.pem", "A" * 100, 1000000000 )
+    writeKey( keydir / "example.com" / "sel2.pem", "B" * 100, 1000000000 )
+    reads = []
+    readPubKey = tinydkim.readPubKey
+    monkeypatch.setattr(tinydkim, "readPubKey", lambda path: reads.append( os.path.basename(path) ) or readPubKey( path ))
+    cachepath = str(tmp_path / "cache")
+
+    cache = RecordCache( cachepath )
+    assert list(tinydkim.directoryKeys( str(keydir), 1, cache )) == [ ("example.com", "sel1", "A" * 100), ("example.com", "sel2", "B" * 100) ]
+    cache.save()
+    assert sorted(reads) == ["sel1.pem", "sel2.pem"]
+
+    ## same size, new contents and mtime: only that file is read again
+    reads.clear()
+    writeKey( keydir / "example.com" / "sel2.pem", "C" * 100, 2000000000 )
+    cache = RecordCache( cachepath )
+    assert list(tinydkim.directoryKeys( str(keydir), 1, cache )) == [ ("example.com", "sel1", "A" * 100), ("example.com", "sel2", "C" * 100) ]
+    assert reads == ["sel2.pem"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_long_records_are_split():
+    record = tinydkim.dkimText( "M" * 392 )
+    assert len(record) > 255
+    owner, rdata = tinydkim.dkimRdata( "sel._domainkey.example.com", record )
+    assert rdata[0] == 255 and rdata[256] == len(record) - 255
+    assert rdata[1:256] + rdata[257:] == bytes(record, "ascii")
+    line = tinydkim.tinyDkimRecord( "sel._domainkey.example.com", record, "300" )
+    assert parseLine( line.encode("latin-1") ) == ("sel._domainkey.example.com", 16, rdata, "300")
+
+def test_directory_output( tmp_path, capfd ):
+    keydir = tmp_path / "keys"
+    writeKey( keydir / "b.example" / "s.pem", "K" * 392, 1000000000 )
+    writeKey( keydir / "a.example" / "s.pem", "k" * 100, 1000000000 )
+    assert tinydkim.main( ["--directory", str(keydir), "--jobs", "2", "-l", "300"] ) == 0
+    assert capfd.readouterr().out.split("\n")[:-1] == [
+        tinydkim.tinyDkimRecord( "s._domainkey.a.example", tinydkim.dkimText( "k" * 100 ), "300" ),
+        tinydkim.tinyDkimRecord( "s._domainkey.b.example", tinydkim.dkimText( "K" * 392 ), "300" ),
+    ]
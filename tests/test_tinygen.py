@@ -0,0 +1,54 @@
+import tinygen
+
+def test_verify_unknown_svcparam():
+    problems = tinygen.verifyChunk( 1, ['svcb example.com 1 . "foo=bar"'], "300" )
+    assert len(problems) == 1
+    assert problems[0].startswith("line 1: svcb does not build")
+    assert "foo" in problems[0]
+
+def test_verify_unknown_type():
+    problems = tinygen.verifyChunk( 1, ["bogus a b"], "300" )
+    assert problems == ["line 1: unknown record type: bogus"]
+
+def test_verify_keeps_going():
+    lines = ["bogus a b", "caa example.com 0 issue ca.example.net"]
+    assert len(tinygen.verifyChunk( 1, lines, "300" )) == 1
+
+def test_svcb_trailing_ttl():
+    assert tinygen.manifestRow( ["svcb", "example.com", "1", "host.example.com", "300"], "86400" ) == ("svcb", ["example.com", "1", "host.example.com", ""], "300")
+    assert tinygen.manifestRow( ["https", "example.com", "0", "host.example.com", "300"], "86400" )[2] == "300"
+    assert tinygen.manifestRow( ["https", "example.com", "1", ".", "", "300"], "86400" ) == ("https", ["example.com", "1", ".", ""], "300")
+    assert tinygen.manifestRow( ["svcb", "example.com", "1", ".", "alpn=h2"], "86400" ) == ("svcb", ["example.com", "1", ".", "alpn=h2"], "86400")
+
+def numberedManifest( n ):
+    ## returns manifest lines of every record type, each owner numbered, with comments between
+    rows = [
+        "caa host{0}.example.com 0 issue ca.example.net",
+        "srv host{0}.example.com ldap tcp 10 20 389 dir.example.com",
+        "uri host{0}.example.com _ldap._tcp 10 20 ldap://dir.example.com:389",
+        "aaaa host{0}.example.com 2001:db8::{0:x} 60",
+        "sshfp host{0}.example.com 1 1 4e0ebfb3f3bd3a6b9af0b4d2e3e2c9e8ff3d12a1 300",
+        "https host{0}.example.com 1 . alpn=h2,h3",
+        "loc host{0}.example.com 51 30 3.637 N 0 8 29.624 W 0.00 0.00 0.00 0.00",
+        "# comment {0}",
+    ]
+    return( [ rows[i % len(rows)].format(i) for i in range(n) ] )
+
+def test_jobs_keep_manifest_order( tmp_path ):
+    manifest = tmp_path / "manifest"
+    manifest.write_text( "\n".join(numberedManifest( 500 )) + "\n" )
+    serial = list(tinygen.generatedLines( [str(manifest)], "86400", 1, 2000, None ))
+    assert len(serial) == 500 - 500 // 8
+    ## small chunks, so many are in flight and finish out of order
+    assert list(tinygen.generatedLines( [str(manifest)], "86400", 3, 7, None )) == serial
+
+def test_jobs_keep_order_with_cache( tmp_path ):
+    from tinycache import RecordCache
+    manifest = tmp_path / "manifest"
+    lines = numberedManifest( 300 )
+    manifest.write_text( "\n".join(lines) + "\n" )
+    serial = list(tinygen.generatedLines( [str(manifest)], "86400", 1, 2000, None ))
+    cache = RecordCache( str(tmp_path / "cache") )
+    ## half the rows are cached, so chunks mix cached and built rows
+    list(tinygen.manifestRecords( lines[::2], "86400", 1, cache ))
+    assert list(tinygen.generatedLines( [str(manifest)], "86400", 3, 5, cache )) == serial
@@ -0,0 +1,38 @@
+import pytest
+import tinyipv6
+
+def test_ptr_lines():
+    lines = list(tinyipv6.prefixRecords( "2001:db8::/126", "h{n}.example.com", ["r"], "300", ptr=True ))
+    assert len(lines) == 8
+    assert lines[1] == "^" + "0." * 24 + "8.b.d.0.1.0.0.2.ip6.arpa:h0.example.com:300"
+
+def test_no_ptr_lines_with_6():
+    lines = list(tinyipv6.prefixRecords( "2001:db8::/126", "h{n}.example.com", ["r", "6"], "300", ptr=True ))
+    assert len(lines) == 8
+    assert not any( line.startswith("^") for line in lines )
+
+def test_batch_rows_csv_and_whitespace():
+    rows = [ "# hosts", "", "a.example.com 2001:db8::1", "b.example.com, 2001:db8::2 ,60", "c.example.com\t2001:db8::3\t120" ]
+    lines = list(tinyipv6.batchRecords( rows, ["r", "3"], "300" ))
+    assert lines == [
+        tinyipv6.tinyAAAARecord( "r", "a.example.com", "2001:db8::1", "300" ),
+        tinyipv6.tinyAAAARecord( "3", "a.example.com", "2001:db8::1", "300" ),
+        tinyipv6.tinyAAAARecord( "r", "b.example.com", "2001:db8::2", "60" ),
+        tinyipv6.tinyAAAARecord( "3", "b.example.com", "2001:db8::2", "60" ),
+        tinyipv6.tinyAAAARecord( "r", "c.example.com", "2001:db8::3", "120" ),
+        tinyipv6.tinyAAAARecord( "3", "c.example.com", "2001:db8::3", "120" ),
+    ]
+    assert lines[3] == "3b.example.com:20010db8000000000000000000000002:60"
+
+def test_batch_rows_rejected():
+    with pytest.raises(ValueError):
+        list(tinyipv6.batchRows( ["a.example.com 2001:db8::1 300 extra"] ))
+
+def test_batch_file_matches_single_records( tmp_path, capfd ):
+    path = tmp_path / "hosts.txt"
+    path.write_text( "a.example.com,2001:db8::1\nb.example.com 2001:db8::2 60\n" )
+    assert tinyipv6.main( ["-f", str(path), "-l", "900"] ) == 0
+    assert capfd.readouterr().out.split("\n")[:-1] == [
+        tinyipv6.tinyAAAARecord( "r", "a.example.com", "2001:db8::1", "900" ),
+        tinyipv6.tinyAAAARecord( "r", "b.example.com", "2001:db8::2", "60" ),
+    ]
@@ -0,0 +1,27 @@
+import pytest
+import tinyloc
+
+## (d1, m1, s1, l1, d2, m2, s2, l2, alt, siz, hp, vp) at the edges of each field
+EDGES = [
+    ("89", "59", "59.999", "S", "179", "59", "59.999", "W", "-100", "90000000m", "90000000m", "90000000m"),
+    ("89", "59", "59.999", "N", "179", "59", "59.999", "E", "42849672m", "0.01m", "0m", "1m"),
+    ("0", "0", "0", "S", "0", "0", "0", "W", "-10.7m", "1m", "10000m", "10m"),
+    ("51", "30", "3.637", "N", "0", "8", "29.624", "W", "-99999", "2.9m", "0.5m", "123m"),
+    ("90", "0", "0", "S", "180", "0", "0", "E", "0", "5m", "90000000m", "0.01m"),
+]
+
+def bulkLines( edges ):
+    csv = [ "n{0}.example.com,{1} {2} {3} {4},{5} {6} {7} {8},{9},{10},{11},{12}".format(i, *row) for i, row in enumerate(edges) ]
+    return( list(tinyloc.locBulkRecords( csv, "300" )) )
+
+def expectedLines( edges ):
+    return( [ tinyloc.tinyLocRecord( "n{0}.example.com".format(i), *row, "300" ) for i, row in enumerate(edges) ] )
+
+def test_pure_python_bulk_matches_single_records( monkeypatch ):
+    monkeypatch.setattr(tinyloc, "numpy", False)
+    assert bulkLines( EDGES ) == expectedLines( EDGES )
+
+def test_numpy_bulk_matches_single_records( monkeypatch ):
+    np = pytest.importorskip("numpy")
+    monkeypatch.setattr(tinyloc, "numpy", np)
+    assert bulkLines( EDGES ) == expectedLines( EDGES )
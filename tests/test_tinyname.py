@@ -0,0 +1,55 @@
+import pytest
+import tinysrv
+import tinysvcb
+from tinybytes import tinyBytes
+from tinyname import wireName, escapedName, presentName
+
+def legacyLengthPrefixedLabels( domain ):
+    ## the encoder tinysrv and tinysvcb carried before tinyname
+    outbytes = bytearray(b'')
+    if len(domain) > 1:
+        for label in domain.split("."):
+            outbytes += len(label).to_bytes(1, "big")
+            outbytes += bytes(label, "ascii")
+    outbytes += b"\x00"
+    return( outbytes )
+
+TARGETS = ["example.com", "dir.example.com", "_ldap._tcp.example.com", "ab", ".", "x-1.y-2.example.net"]
+
+@pytest.mark.parametrize("target", TARGETS)
+def test_same_as_legacy( target ):
+    legacy = bytes(legacyLengthPrefixedLabels( target ))
+    assert wireName( target ) == legacy
+    assert escapedName( target ) == tinyBytes( legacy )
+    assert tinysrv.lengthPrefixedLabels( target ) == legacy
+    assert tinysvcb.lengthPrefixedLabels( target ) == legacy
+    assert tinysrv.srvRdata( "example.com", "ldap", "tcp", "1", "2", "3", target )[1][6:] == legacy
+    assert tinysvcb.svcbRdata( "example.com", "1", target, "" )[1][2:] == legacy
+
+def test_escapes():
+    assert wireName( "a\\.b.example." ) == b"\x03a.b\x07example\x00"
+    assert wireName( "\\065bc.example" ) == b"\x03Abc\x07example\x00"
+    assert wireName( "a\\\\b" ) == b"\x03a\\b\x00"
+    assert wireName( "example.com." ) == wireName( "example.com" )
+    assert wireName( "a" ) == b"\x01a\x00"
+    assert presentName( "Dir\\.1.example.com." ) == presentName( "Dir\\046\\049.example.com" ) == "Dir\\.1.example.com"
+
+def test_longest_name():
+    ## the SRV worst case in bench_generators.py
+    label = "a" * 62
+    name = ".".join( [label + "0"] * 3 + [label[:61]] )
+    assert len(wireName( name )) == 255
+    with pytest.raises(ValueError):
+        wireName( name + "a" )
+
+@pytest.mark.parametrize("name", [
+    "a" * 64 + ".example.com",
+    "a..example.com",
+    ".example.com",
+    "\\256.example.com",
+    "example.com\\",
+    ".".join( ["a" * 63] * 4 ),
+])
+def test_rejected( name ):
+    with pytest.raises(ValueError):
+        wireName( name )
@@ -0,0 +1,37 @@
+import json
+import asyncio
+import pytest
+import tinygen
+import tinyserver
+
+def test_bad_requests_get_errors( monkeypatch ):
+    def broken( *fields ):
+        raise KeyError("flags")
+    monkeypatch.setitem(tinygen.BUILDERS, "caa", (broken, 4, 0))
+    for text in ('{"type": "caa", "fields": ["example.com", "0", "issue", "x"], "id": 7}', '{"type": "bogus"}', '[1, 2]', '{"type": "svcb", "fields": ["example.com", "1", ".", "foo=bar"]}', 'not json'):
+        response = json.loads(tinyserver.handleRequest( text, "300" ))
+        assert "error" in response and "line" not in response
+    assert json.loads(tinyserver.handleRequest( '{"type": "caa", "fields": ["example.com", "0", "issue", "x"], "id": 7}', "300" ))["id"] == 7
+
+def test_refuses_to_replace_a_file( tmp_path ):
+    path = tmp_path / "data"
+    path.write_text( "keep me\n" )
+    with pytest.raises(FileExistsError):
+        asyncio.run( tinyserver.runServer( str(path), "300" ) )
+    assert path.read_text() == "keep me\n"
+
+def test_overlong_request_line( tmp_path ):
+    path = str(tmp_path / "sock")
+    async def run():
+        server = await asyncio.start_unix_server(lambda r, w: tinyserver.serveClient( r, w, "300" ), path=path, limit=tinyserver.REQUEST_LIMIT)
+        async with server:
+            reader, writer = await asyncio.open_unix_connection( path )
+            writer.write( b'{"type": "caa", "fields": ["' + b"x" * (tinyserver.REQUEST_LIMIT + 10) + b'"]}\n' )
+            await writer.drain()
+            response = await reader.readline()
+            rest = await reader.read()
+            writer.close()
+            return( response, rest )
+    response, rest = asyncio.run( run() )
+    assert "longer than" in json.loads(response)["error"]
+    assert rest == b""
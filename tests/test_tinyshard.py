@@ -0,0 +1,31 @@
+import pytest
+import tinyshard
+
+def test_partial_line_flushed_on_close( tmp_path ):
+    prefix = str(tmp_path / "data")
+    with tinyshard.ShardWriter( prefix, zones=["example.com"] ) as out:
+        out.write( ":a.example.com:16:" )
+        out.write( "\\005hello:300\n:b.example.net:16:\\000:300" )
+    with open(prefix + ".example.com") as infile:
+        assert infile.read() == ":a.example.com:16:\\005hello:300\n"
+    with open(prefix + ".other") as infile:
+        assert infile.read() == ":b.example.net:16:\\000:300"
+
+@pytest.mark.parametrize("argv", [ ["--shards=0"], ["--shards", "-2"], ["--shards", "x"], ["--shards", "2", "--shard-only", "2"] ])
+def test_bad_shard_options( argv ):
+    with pytest.raises(ValueError):
+        tinyshard.splitOptions( argv )
+
+def test_bad_shard_options_are_usage_errors( capsys ):
+    import tinycaa
+    assert tinycaa.main( ["-d", "example.com", "--shards=0"] ) == 1
+    assert "--shards" in capsys.readouterr().err
+
+def test_shard_open_failure_removes_open_files( tmp_path, capsys ):
+    import tinycaa
+    ## the second shard's .tmp name is taken by a directory, so opening it fails
+    prefix = str(tmp_path / "data")
+    (tmp_path / "data.1.tmp").mkdir()
+    assert tinycaa.main( ["-d", "example.com", "--shards", "3", "--shard-prefix", prefix] ) == 1
+    assert "data.1.tmp" in capsys.readouterr().err
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["data.1.tmp"]
@@ -0,0 +1,19 @@
+import pytest
+import tinysshfp
+
+KEY = "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIGQ7M2JVx3H1P0h5zq2bNn0Ww2m6m4pY3y4yq2f3sQ9T"
+
+def test_known_hosts_skips_addresses_and_ports( capsys ):
+    line = "a.example.com,192.0.2.1,[b.example.com]:2222,[c.example.com]:22,2001:db8::1 " + KEY
+    hostnames, keytype, blob = tinysshfp.parseKeyLine( line )
+    assert hostnames == ["a.example.com", "c.example.com"]
+    err = capsys.readouterr().err
+    assert "192.0.2.1" in err and "2001:db8::1" in err and "b.example.com:2222" in err
+
+def test_pub_hostname_from_names():
+    assert tinysshfp.pubKeyHostname( "/keys/host.example.com.pub" ) == "host.example.com"
+    assert tinysshfp.pubKeyHostname( "/keys/host.example.com/ssh_host_rsa_key.pub" ) == "host.example.com"
+
+def test_pub_hostname_needs_domain():
+    with pytest.raises(ValueError):
+        tinysshfp.pubKeyHostname( "/etc/ssh/ssh_host_rsa_key.pub" )
@@ -0,0 +1,28 @@
+import json
+import pytest
+import tinycaa
+
+@pytest.mark.parametrize("option", ["--profile", "--stats-json"])
+def test_option_needs_value( option, capsys ):
+    assert tinycaa.main( ["-d", "example.com", option] ) == 1
+    assert option + " needs a file name" in capsys.readouterr().err
+
+def test_json_report( tmp_path, capfd ):
+    path = tmp_path / "stats.json"
+    assert tinycaa.main( ["-d", "example.com", "--stats-json", str(path)] ) == 0
+    line = capfd.readouterr().out
+    report = json.loads(path.read_text())
+    assert report["records"] == 1
+    assert report["bytes"] == len(line)
+    assert report["escaped_bytes"] == line.count("\\")
+    assert report["escape_ratio"] == pytest.approx(4 * line.count("\\") / len(line))
+    assert set(report["stages"]) == {"setup", "read", "encode", "write"}
+    assert "compact_saved_bytes" not in report
+
+def test_json_report_compact( tmp_path, capfd ):
+    path = tmp_path / "stats.json"
+    assert tinycaa.main( ["-d", "example.com", "--compact", "--stats-json", str(path)] ) == 0
+    line = capfd.readouterr().out
+    report = json.loads(path.read_text())
+    assert report["bytes"] == len(line)
+    assert report["compact_saved_bytes"] == 4
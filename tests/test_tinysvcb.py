@@ -0,0 +1,28 @@
+import pytest
+import tinysvcb
+
+PARAMETERS = [
+    "alpn=h2,h3 port=8443",
+    "port=8443 alpn=h2,h3",
+    "ipv4hint=192.0.2.1,192.0.2.2 ipv6hint=2001:db8::1 mandatory=alpn,port alpn=h3 port=443",
+    "no-default-alpn alpn=\"h2\"",
+    "key65000=abc ech=AEP+DQA/",
+    ("key65000=a b", "port=53"),
+]
+
+def uncachedParameters( parameters ):
+    return( b"".join([ tinysvcb.encodeParam.__wrapped__( svcid, value ) for svcid, value in tinysvcb.parseParameters( parameters ) ]) )
+
+@pytest.mark.parametrize("parameters", PARAMETERS)
+def test_cached_encoding_matches_uncached( parameters ):
+    tinysvcb.encodeParsed.cache_clear()
+    expected = uncachedParameters( parameters )
+    assert tinysvcb.encodeParameters( parameters ) == expected
+    assert tinysvcb.encodeParameters( parameters ) == expected
+
+def test_cache_is_keyed_on_parsed_parameters():
+    tinysvcb.encodeParsed.cache_clear()
+    first = tinysvcb.encodeParameters( "alpn=h2,h3 port=8443" )
+    assert tinysvcb.encodeParameters( "port=8443  alpn=\"h2,h3\"" ) == first
+    info = tinysvcb.encodeParsed.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
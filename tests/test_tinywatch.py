@@ -0,0 +1,14 @@
+import tinywatch
+
+def test_builder_error_keeps_fragment( tmp_path ):
+    fragment = str(tmp_path / "frag")
+    with open(fragment, "w") as outfile:
+        outfile.write( "good\n" )
+    def generate( path ):
+        yield( "partial" )
+        raise TypeError("bad row")
+    error = tinywatch.buildFragment( "manifest", fragment, generate )
+    assert "bad row" in error
+    with open(fragment) as infile:
+        assert infile.read() == "good\n"
+    assert not (tmp_path / "frag.tmp").exists()
@@ -0,0 +1,25 @@
+import tinyzone
+
+def test_escaped_space_and_semicolon():
+    assert tinyzone.lineTokens( "a\\ b.example.com. 300 IN TXT x" ) == ["a\\ b.example.com.", "300", "IN", "TXT", "x"]
+    assert tinyzone.lineTokens( "a\\;b.example.com. IN TXT x" ) == ["a\\;b.example.com.", "IN", "TXT", "x"]
+
+def test_plain_line():
+    assert tinyzone.lineTokens( "www 300 IN A 192.0.2.1" ) == ["www", "300", "IN", "A", "192.0.2.1"]
+
+def test_escaped_owner_names():
+    zone = [ "$ORIGIN example.com.", "a\\.b 300 IN CAA 0 issue \"ca.example.net\"", "\\065\\.: 300 IN SSHFP 1 1 0123456789abcdef0123456789abcdef01234567", "_ld\\097p._tcp 300 IN SRV 0 5 389 ldap.example.com." ]
+    lines = list(tinyzone.zoneLines( zone ))
+    assert lines[0].startswith( ":a\\056b.example.com:257:" )
+    assert lines[1].startswith( ":A\\056\\072.example.com:44:" )
+    assert lines[2].startswith( ":_ldap._tcp.example.com:33:" )
+
+def test_escaped_trailing_dot_is_relative():
+    assert tinyzone.absoluteName( "a\\.", "example.com" ) == "a\\..example.com"
+    assert tinyzone.absoluteName( "a\\\\.", "example.com" ) == "a\\\\"
+
+def test_svcb_quoted_value_with_space():
+    zone = [ "svc.example.com. 300 IN SVCB 1 . key65000=\"a b\" port=\"8443\"" ]
+    line = list(tinyzone.zoneLines( zone ))[0]
+    assert line.endswith( "\\375\\350\\000\\003a\\040b:300" )
+    assert "\\000\\003\\000\\002\\040\\373" in line
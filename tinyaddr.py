@@ -0,0 +1,50 @@
+# tinyaddr - packs IPv4 and IPv6 addresses for the generators
+#
+# example: from tinyaddr import packIPv6, hexIPv6
+#          packIPv6( "2001:db8::1" )  ->  b" \x01\r\xb8\x00...\x01"
+#          hexIPv6( "2001:db8::1" )   ->  "20010db8000000000000000000000001"
+#
+# Building an ipaddress object per address is most of the cost of an AAAA
+# record or an SVCB ipv4hint/ipv6hint list. socket.inet_pton does the same
+# parsing and validation in C, so it is tried first; text it rejects is passed
+# to ipaddress, which either accepts it (eg a "%scope" suffix) or raises the
+# same ValueError as before. Results are kept in a bounded cache, since hint
+# addresses in particular repeat from record to record. socket is imported on
+# first use, as most generators never pack an address.
+
+import functools
+
+## distinct addresses kept per family
+ADDRESS_CACHE_SIZE = 4096
+
+@functools.lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def packIPv4( text ):
+    ## returns the 4 byte network order form of a dotted quad
+    import socket
+    try:
+        return( socket.inet_pton(socket.AF_INET, text) )
+    except (OSError, TypeError):
+        import ipaddress
+        return( ipaddress.IPv4Address(text).packed )
+
+@functools.lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def packIPv6( text ):
+    ## returns the 16 byte network order form of an IPv6 address
+    import socket
+    try:
+        return( socket.inet_pton(socket.AF_INET6, text) )
+    except (OSError, TypeError):
+        import ipaddress
+        return( ipaddress.IPv6Address(text).packed )
+
+def hexIPv6( text ):
+    ## the 32 hex digits used by "3" and "6" lines, as ipaddress's exploded form without ":"
+    return( packIPv6( text ).hex() )
+
+def addressCacheStats():
+    ## returns hit and miss counts for the address caches
+    output = {}
+    for name, func in (("ipv4", packIPv4), ("ipv6", packIPv6)):
+        info = func.cache_info()
+        output[name] = { "hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize }
+    return( output )
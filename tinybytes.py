@@ -0,0 +1,106 @@
+# tinybytes - shared tinydns rdata encoder used by the tiny*.py generators
+#
+# example: from tinybytes import tinyBytes
+#          tinyBytes( b"\x00\x0aldap:" )  ->  "\000\012ldap\072"
+#
+# tinydns-data accepts printable ascii as-is and anything else as an octal
+# \nnn escape. Rather than formatting each byte as we go, both output modes
+# are precomputed as 256-entry tables and the output is built with a join.
+#
+# Each generator encodes its record once, as raw rdata bytes (caaRdata,
+# srvRdata, ...), and tinyLine() turns that into a generic tinydns line, so
+# the text lines and the cdb entries of tinycdb.py cannot drift apart.
+#
+# In compact mode (--compact on any generator, see tinyshard.py) each line is
+# rewritten on its way out with the shortest text tinydns-data reads back as the
+# same bytes: printable ascii, space and "/" as-is, "\" as "\\", and anything
+# else, ":" included since tinydns-data splits fields before it reads escapes,
+# as one to three octal digits. Only a whole line shows what follows an escape,
+# so that is where it is done: a field ends at ":" or the end of the line, and
+# an escape is padded to three digits only before a literal octal digit in its
+# own field. A raw AAAA address typically drops from 64 characters to under 40.
+
+import functools
+
+## printable ascii but not space, "/", ":", "\"
+PRINTABLE_TABLE = tuple(
+    chr(b) if b > 32 and b < 127 and b not in (47,58,92) else "\\{0:03o}".format(b)
+    for b in range(256)
+)
+
+## every byte as an octal \nnn code
+ESCAPE_ALL_TABLE = tuple( "\\{0:03o}".format(b) for b in range(256) )
+
+## shortest form of each byte when the next character is not an octal digit
+COMPACT_TABLE = tuple(
+    chr(b) if b >= 32 and b < 127 and b not in (58,92) else "\\\\" if b == 92 else "\\{0:o}".format(b)
+    for b in range(256)
+)
+
+## as COMPACT_TABLE, but octal escapes always have three digits
+PADDED_TABLE = tuple( ESCAPE_ALL_TABLE[b] if COMPACT_TABLE[b][1:].isdigit() else COMPACT_TABLE[b] for b in range(256) )
+
+## next byte -> the table for the byte before it
+NEXT_TABLES = tuple( PADDED_TABLE if b in b"01234567" else COMPACT_TABLE for b in range(256) )
+
+## distinct repeated rdata pieces kept by repeatedBytes()
+REPEATED_CACHE_SIZE = 4096
+## set by setCompact()
+COMPACT = False
+
+## bytes saved by compactText() in this process
+SAVED = 0
+
+def setCompact( compact=True ):
+    global COMPACT
+    COMPACT = compact
+
+def compactBytes( bytearr ):
+    ## returns the shortest escaping of a whole field's bytes
+    ## ":" stands in for what follows the field, which is never an octal digit
+    following = bytes(bytearr[1:]) + b":"
+    return( "".join([ NEXT_TABLES[n][b] for b, n in zip(bytearr, following) ]) )
+
+def compactLine( line ):
+    ## returns a tinydns data line with every escaped field in compact form
+    if "\\" not in line or line.startswith("#"):
+        return( line )
+    from tinydata import unescapeBytes
+    fields = line.split(":")
+    for i, field in enumerate(fields):
+        if "\\" in field:
+            fields[i] = compactBytes( unescapeBytes( field.encode("latin-1") ) )
+    return( ":".join(fields) )
+
+def compactText( text ):
+    ## returns newline separated lines in compact form, adding what that saved to SAVED
+    global SAVED
+    if "\\" not in text:
+        return( text )
+    compact = "\n".join([ compactLine( line ) for line in text.split("\n") ])
+    SAVED += len(text) - len(compact)
+    return( compact )
+
+def tinyBytes( bytearr, escape_all=False ):
+    ## output printable ascii but not space, "/", ":", "\"
+    ## all other characters output as octal \nnn codes
+    table = ESCAPE_ALL_TABLE if escape_all else PRINTABLE_TABLE
+    return( "".join([table[b] for b in bytearr]) )
+
+@functools.lru_cache(maxsize=REPEATED_CACHE_SIZE)
+def repeatedBytes( bytearr ):
+    ## tinyBytes for a piece of rdata that recurs from record to record
+    return( tinyBytes( bytearr ) )
+
+def tinyLine( owner, rrtype, rdata, ttl, octal=0, repeated=() ):
+    ## returns a generic ":owner:type:rdata:ttl" line for raw rdata bytes
+    ## the first octal bytes of rdata are always written as \nnn codes, as the
+    ## builders write their fixed width numbers; repeated are further pieces
+    ## of the rdata, target names and SvcParams, whose escaping is cached
+    output = ":" + tinyBytes( bytes(owner, "ascii") ) + ":" + str(rrtype) + ":"
+    if octal:
+        output += tinyBytes( rdata[:octal], True )
+    output += tinyBytes( rdata[octal:] )
+    for piece in repeated:
+        output += repeatedBytes( piece )
+    return( output + ":" + ttl )
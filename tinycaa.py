@@ -4,41 +4,61 @@
 #
 # example: ./tinycaa.py --domain example.com --flag 1 --tag issue --ca ca.example.net
 #
+# policy: ./tinycaa.py --policy policy.txt < domains.txt
+#   policy.txt has one "flags tag value" row per line, eg
+#     0 issue ca.example.net
+#     0 issuewild ;
+#     0 iodef mailto:security@example.com
+#   and every domain read from stdin (one per line) gets a record for each row.
+#   Each row's rdata is encoded once, so per domain only the name is escaped.
+#
 # https://www.rfc-editor.org/rfc/rfc8659
 #
 # 2022 Lee Maguire
 
 import sys
-import getopt
-
-domain = "example.com"
-flags = "0"
-tags = "issue"
-value = "ca.example.net"
-ttl = "86400"
+from tinybytes import tinyBytes, tinyLine
+from tinystats import statsOptions, statsStage, statsTimed, statsOutput, statsCount
+from tinyshard import outputStream, outputOptions
 
 def tinyCAARecord( domain, flags, tags, value, ttl ):
     ## output a single line containing a tinydns formatted record
-    output = ":" 
-    output += tinyBytes( bytes(domain, "ascii") )
-    output += ":257:"
-    output += tinyBytes( nboInt(1, flags) )
-    output += tinyBytes( nboInt(1, len(tags)) )
-    output += tinyBytes( bytes(tags, "ascii") )
-    output += tinyBytes( bytes(value, "ascii") )
-    output += ":" + ttl
-    return( output )
+    owner, rdata = caaRdata( domain, flags, tags, value )
+    return( tinyLine( owner, 257, rdata, ttl ) )
+
+def caaRdata( domain, flags, tags, value ):
+    ## returns the owner name and raw rdata bytes of the record tinyCAARecord describes
+    outbytes = bytearray(b'')
+    outbytes += nboInt(1, flags)
+    outbytes += nboInt(1, len(tags))
+    outbytes += bytes(tags, "ascii")
+    outbytes += bytes(value, "ascii")
+    return( domain, bytes(outbytes) )
+
+def policyRows( lines ):
+    ## yields (flags, tag, value) from "flags tag value" lines
+    ## the value is the rest of the line, so it may contain spaces
+    ## blank lines and "#" comments are skipped
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split(None, 2)
+        if len(fields) != 3:
+            raise ValueError("expected 'flags tag value', got: " + line)
+        yield( tuple(fields) )
 
-def tinyBytes( bytearr, encode_all=False ):
-    ## output printable ascii but not space, "/", ":", "\"
-    ## all other characters output as octal \nnn codes
-    output = ""
-    for b in bytearr:
-        if not encode_all and b > 32 and b < 127 and b not in [47,58,92]:
-            output += chr(b)
-        else:
-            output += "\\{0:03o}".format(b)
-    return( output )
+def policyRecords( domains, policy, ttl ):
+    ## yields a record for every (flags, tag, value) in policy for each domain
+    ## the ":257:rdata:ttl" ends are escaped once and reused for every domain
+    ends = [ ":257:" + tinyBytes( caaRdata( "", flags, tag, value )[1] ) + ":" + ttl for flags, tag, value in policy ]
+    for domain in domains:
+        domain = domain.strip()
+        if not domain or domain.startswith("#"):
+            continue
+        start = ":" + tinyBytes( bytes(domain, "ascii") )
+        for end in ends:
+            yield( start + end )
 
 def nboInt( length, number ):
     ## returns bytes representing an integer in network byte order (big endian)
@@ -46,28 +66,63 @@ def nboInt( length, number ):
     intbytes = int(number).to_bytes(length, "big")
     return( intbytes )
 
-opts, args = getopt.getopt(sys.argv[1:],"hd:f:t:v:l:",["help","domain=","flags=","tags=","value=","ttl="])
-for opt, arg in opts:
-    if opt in ("-h", "--help"):
-        print('Usage: tinycaa.py --domain example.com --flags 1 --tags issue --value ca.example.net')
-        print('  --domain hostname (domain hostname)')
-        print('  --flags int (0=non-critical 1=critical)')
-        print('  --tags string ("issue","issuewild","iodef")')
-        print('  --value strint (CA identifier)')
-        print('  --ttl int (dns ttl)')
-        sys.exit()
-    elif opt in ("-d", "--domain"):
-        domain = arg
-    elif opt in ("-f", "--flags"):
-        flags = arg
-    elif opt in ("-t", "--tags"):
-        tags = arg
-    elif opt in ("-v", "--value"):
-        value = arg
-    elif opt in ("-l", "--ttl"):
-        ttl = arg
+@statsOptions
+@outputOptions
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    domain = "example.com"
+    flags = "0"
+    tags = "issue"
+    value = "ca.example.net"
+    ttl = "86400"
+    policyfile = ""
+
+    opts, args = getopt.getopt(argv,"hd:f:t:v:l:p:",["help","domain=","flags=","tags=","value=","ttl=","policy="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: tinycaa.py --domain example.com --flags 1 --tags issue --value ca.example.net')
+            print('  --domain hostname (domain hostname)')
+            print('  --flags int (0=non-critical 1=critical)')
+            print('  --tags string ("issue","issuewild","iodef")')
+            print('  --value strint (CA identifier)')
+            print('  --ttl int (dns ttl)')
+            print('  --policy file ("flags tag value" rows applied to every domain on stdin)')
+            print('  --stats, --stats-json file, --profile file (report run statistics, see tinystats.py)')
+            print('  --compact (write the shortest escaping tinydns-data accepts, report bytes saved)')
+            print('  --shards N or --shard-zones list, --shard-prefix path, --shard-only names (write to fragment files, see tinyshard.py)')
+            return( 0 )
+        elif opt in ("-d", "--domain"):
+            domain = arg
+        elif opt in ("-f", "--flags"):
+            flags = arg
+        elif opt in ("-t", "--tags"):
+            tags = arg
+        elif opt in ("-v", "--value"):
+            value = arg
+        elif opt in ("-l", "--ttl"):
+            ttl = arg
+        elif opt in ("-p", "--policy"):
+            policyfile = arg
+
+    if policyfile:
+        with open(policyfile, "r") as infile:
+            policy = list(policyRows( infile ))
+        statsStage( "write" )
+        with outputStream() as out:
+            for line in statsOutput( policyRecords( statsTimed( "read", sys.stdin ), policy, ttl ) ):
+                out.write( line + "\n" )
+        return( 0 )
+
+    statsStage( "encode" )
+    line = tinyCAARecord( domain, flags, tags, value, ttl )
+    statsStage( "write" )
+    statsCount( line )
+    with outputStream() as out:
+        out.write( line + "\n" )
 
-line = tinyCAARecord( domain, flags, tags, value, ttl )
-sys.stdout.write( line + "\n")
+    return( 0 )
 
-sys.exit(0)
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
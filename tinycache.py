@@ -0,0 +1,90 @@
+# tinycache - content-addressed cache of encoded tinydns lines
+#
+# example: cache = RecordCache( "tinygen.cache" )
+#          key = cache.key( "srv", ["example.com", "ldap", ...], "86400" )
+#          line = cache.get( key )
+#          if line is None:
+#              line = tinySrvRecord( ... )
+#              cache.put( key, line )
+#          cache.save()
+#
+# Rows are keyed by a hash of the normalized record type, fields and ttl, so
+# an unchanged manifest row never has to go back through its builder. The
+# cache file is rewritten by save() with only the entries used in this run;
+# anything no longer referenced by the manifest is evicted. A long-running
+# user such as tinygen --watch calls rotate() after each pass, so rows that
+# were not built again in the last pass are dropped from memory as well.
+
+import os
+import hashlib
+
+## bump when a builder changes its output, so stale entries are not reused
+CACHE_VERSION = "2"
+CACHE_HEADER = "# tinycache " + CACHE_VERSION + "\n"
+
+class RecordCache:
+
+    def __init__( self, path ):
+        self.path = path
+        self.entries = {}  ## loaded from disk and not yet referenced
+        self.used = {}     ## referenced in this run, kept by save()
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load( self ):
+        try:
+            infile = open(self.path, "r")
+        except FileNotFoundError:
+            return
+        with infile:
+            if infile.readline() != CACHE_HEADER:
+                return
+            for line in infile:
+                key, sep, record = line.rstrip("\n").partition("\t")
+                if sep:
+                    self.entries[key] = record
+
+    def key( self, rtype, fields, ttl ):
+        ## fields are joined with a separator that cannot appear in a manifest field
+        text = "\x1f".join( [rtype] + list(fields) + [ttl] )
+        return( hashlib.sha256( text.encode("utf-8") ).hexdigest() )
+
+    def get( self, key ):
+        ## returns the cached line, or None on a miss
+        if key in self.used:
+            self.hits += 1
+            return( self.used[key] )
+        record = self.entries.pop(key, None)
+        if record is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.used[key] = record
+        return( record )
+
+    def put( self, key, record ):
+        self.used[key] = record
+
+    def save( self ):
+        ## write the referenced entries to a temporary file and rename it into place
+        tmppath = self.path + ".tmp"
+        with open(tmppath, "w") as outfile:
+            outfile.write( CACHE_HEADER )
+            for key, record in self.used.items():
+                outfile.write( key + "\t" + record + "\n" )
+        os.replace(tmppath, self.path)
+
+    def rotate( self ):
+        ## starts a new pass: this pass's entries can still be hit, anything
+        ## not referenced since the previous rotate() is dropped
+        self.entries = self.used
+        self.used = {}
+
+    def stats( self ):
+        return( {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": len(self.entries),
+            "entries": len(self.used),
+        } )
@@ -0,0 +1,136 @@
+# tinycdb - write generated records straight into a tinydns data.cdb
+#
+# example: cdb = CdbMake( "data.cdb" )
+#          cdb.add( tinydnsKey("example.com"), tinydnsValue(257, 86400, rdata) )
+#          cdb.finish()
+#
+# tinydns-data turns each ":fqdn:type:rdata:ttl" line into one cdb entry:
+#   key   - the owner name in DNS wire format, lower case, with a leading
+#           "*" label removed for wildcards
+#   value - type (2 bytes), "=" (or "*" for a wildcard), ttl (4 bytes),
+#           ttd (8 bytes, zero for no timestamp), then the raw rdata
+# Writing those entries directly avoids escaping the rdata as octal text only
+# for tinydns-data to parse it back again.
+#
+# The result is a fragment, not a data.cdb to serve: it has only the records
+# given to it, and tinydns will not answer for a name without an SOA and NS
+# for its zone, which the generators do not make. Nor does it hold the
+# entries tinydns-data adds for "." or "Z" lines, or for "=" and "6" PTRs.
+#
+# The cdb file format is described at https://cr.yp.to/cdb/cdb.txt
+# cdbGet() is a small reader so output can be checked without tinydns.
+
+import os
+import struct
+from tinydata import unescapeBytes
+
+## a label of an owner field: escapes, or anything but "\\" and "."
+LABEL_PATTERN = rb"(?:\\[0-7]{1,3}|\\.|[^\\.])+"
+LABEL_RE = None
+
+def cdbHash( key ):
+    h = 5381
+    for c in key:
+        h = ((h << 5) + h ^ c) & 0xffffffff
+    return( h )
+
+class CdbMake:
+
+    def __init__( self, path ):
+        ## records are written to a temporary file, finish() renames it into place
+        self.path = path
+        self.tmppath = path + ".tmp"
+        self.outfile = open(self.tmppath, "wb")
+        self.outfile.write( b"\0" * 2048 )
+        self.pos = 2048
+        self.hashes = [ [] for i in range(256) ]
+
+    def add( self, key, value ):
+        h = cdbHash( key )
+        self.hashes[h & 0xff].append( (h, self.pos) )
+        self.outfile.write( struct.pack("<LL", len(key), len(value)) )
+        self.outfile.write( key )
+        self.outfile.write( value )
+        self.pos += 8 + len(key) + len(value)
+        if self.pos > 0xffffffff:
+            raise ValueError("cdb file exceeds 4GB")
+
+    def finish( self ):
+        header = bytearray(b'')
+        for entries in self.hashes:
+            ## each table has twice as many slots as entries, with linear probing
+            slots = len(entries) * 2
+            header += struct.pack("<LL", self.pos, slots)
+            table = [ (0, 0) ] * slots
+            for h, pos in entries:
+                i = (h >> 8) % slots
+                while table[i][1]:
+                    i = (i + 1) % slots
+                table[i] = (h, pos)
+            for h, pos in table:
+                self.outfile.write( struct.pack("<LL", h, pos) )
+            self.pos += slots * 8
+        self.outfile.seek(0)
+        self.outfile.write( header )
+        self.outfile.close()
+        os.replace(self.tmppath, self.path)
+
+def cdbGet( data, key ):
+    ## returns a list of every value stored under key in the cdb contents given
+    output = []
+    h = cdbHash( key )
+    tablepos, slots = struct.unpack_from("<LL", data, (h & 0xff) * 8)
+    if slots == 0:
+        return( output )
+    i = (h >> 8) % slots
+    for n in range(slots):
+        slot_h, pos = struct.unpack_from("<LL", data, tablepos + i * 8)
+        if pos == 0:
+            break
+        if slot_h == h:
+            klen, dlen = struct.unpack_from("<LL", data, pos)
+            if data[pos + 8:pos + 8 + klen] == key:
+                output.append( bytes(data[pos + 8 + klen:pos + 8 + klen + dlen]) )
+        i = (i + 1) % slots
+    return( output )
+
+def tinydnsLabels( fqdn ):
+    ## returns the labels of an owner field as lower case bytes, reading its
+    ## escapes as tinydns-data does, so "\\056" is a dot inside a label
+    ## empty labels are dropped
+    text = fqdn.encode("latin-1")
+    if b"\\" not in text:
+        return( [ label for label in text.lower().split(b".") if label ] )
+    global LABEL_RE
+    if LABEL_RE is None:
+        import re
+        LABEL_RE = re.compile(LABEL_PATTERN)
+    return( [ unescapeBytes( label ).lower() for label in LABEL_RE.findall(text) ] )
+
+def tinydnsKey( fqdn ):
+    ## returns the cdb key for an owner field, and whether it was a wildcard
+    ## if input "*.Example.com", output should be (b"\007example\003com\000", True)
+    labels = tinydnsLabels( fqdn )
+    wildcard = len(labels) > 0 and labels[0] == b"*"
+    if wildcard:
+        labels = labels[1:]
+    outbytes = bytearray(b'')
+    for label in labels:
+        if len(label) > 63:
+            raise ValueError("label longer than 63 octets in " + fqdn)
+        outbytes += bytes([len(label)]) + label
+    outbytes += b"\0"
+    if len(outbytes) > 255:
+        raise ValueError("name longer than 255 octets: " + fqdn)
+    return( bytes(outbytes), wildcard )
+
+def tinydnsValue( rrtype, ttl, rdata, wildcard=False ):
+    ## returns the cdb value tinydns-data would write for a generic record
+    marker = b"*" if wildcard else b"="
+    return( struct.pack(">H", int(rrtype)) + marker + struct.pack(">L", int(ttl)) + b"\0" * 8 + rdata )
+
+def tinydnsEntry( fqdn, rrtype, ttl, rdata ):
+    ## returns the (key, value) pair for one record
+    ## fqdn is the owner field as it would be written in a data line
+    key, wildcard = tinydnsKey( fqdn )
+    return( key, tinydnsValue( rrtype, ttl, rdata, wildcard ) )
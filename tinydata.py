@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+# tinydata - scan and index an existing tinydns data file
+#
+# example: ./tinydata.py data                      (count records by type)
+#          ./tinydata.py --domain example.com --type 257 data
+#
+# The file is memory-mapped and scanned line by line, so multi-gigabyte data
+# files are never loaded whole. Generic ":fqdn:type:rdata:ttl" lines, and the
+# "3fqdn:hex:ttl" / "6fqdn:hex:ttl" AAAA lines tinyipv6.py can emit, are
+# decoded back to raw rdata bytes (the inverse of tinyBytes). Other line types
+# are counted but not indexed.
+#
+# diffRecords() compares freshly generated lines against a data file by
+# (fqdn, type) and a hash of the decoded rdata and ttl, so two spellings of
+# the same rdata (eg "\101" and "A") are not reported as a change. The
+# generated lines are read first and spooled to a temporary file; in the
+# data file, only lines with one of their owner names are decoded and hashed.
+# Only one digest per distinct generated record is kept, so memory follows
+# the number of distinct generated records, not the line counts of either
+# side.
+
+import sys
+import mmap
+
+## tinydns-data reads "\" followed by up to 3 octal digits as that byte,
+## and "\" followed by anything else as the character itself
+ESCAPE_PATTERN = rb"\\([0-7]{1,3}|.)"
+ESCAPE_RE = None
+
+def unescapeMatch( m ):
+    code = m.group(1)
+    if code[0] in b"01234567":
+        return( bytes([int(code, 8) & 0xff]) )
+    return( code )
+
+def unescapeBytes( text ):
+    ## returns the raw bytes for tinydns escaped text
+    ## if input b"\\000\\012ldap\\072", output should be b"\x00\x0aldap:"
+    if b"\\" not in text:
+        return( bytes(text) )
+    global ESCAPE_RE
+    if ESCAPE_RE is None:
+        import re
+        ESCAPE_RE = re.compile(ESCAPE_PATTERN, re.DOTALL)
+    return( ESCAPE_RE.sub(unescapeMatch, text) )
+
+def normalName( fqdn ):
+    ## returns a lower case name without a trailing dot, for index keys
+    return( unescapeBytes( fqdn ).decode("latin-1").lower().rstrip(".") )
+
+def parseLine( line ):
+    ## returns (fqdn, rrtype, rdata, ttl) for a generic or AAAA data line, or None
+    ## line is bytes without the trailing newline; ttl is "" if not given
+    if not line:
+        return( None )
+    kind = line[0:1]
+    fields = line[1:].split(b":")
+    if kind == b":":
+        if len(fields) < 3 or not fields[1].isdigit():
+            return( None )
+        fqdn, rrtype, rdata = fields[0], fields[1], fields[2]
+        ttl = fields[3] if len(fields) > 3 else b""
+        return( normalName( fqdn ), int(rrtype), unescapeBytes( rdata ), ttl.decode("ascii") )
+    elif kind in (b"3", b"6"):
+        if len(fields) < 2:
+            return( None )
+        ttl = fields[2] if len(fields) > 2 else b""
+        try:
+            rdata = bytes.fromhex( unescapeBytes( fields[1] ).decode("ascii") )
+        except ValueError:
+            return( None )
+        return( normalName( fields[0] ), 28, rdata, ttl.decode("ascii") )
+    return( None )
+
+def mapFile( path ):
+    ## returns a read-only mmap of the file, or empty bytes for an empty file
+    with open(path, "rb") as infile:
+        try:
+            return( mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) )
+        except ValueError:
+            return( b"" )
+
+def scanLines( data ):
+    ## yields (offset, line) for every line in a mapped data file
+    pos = 0
+    end = len(data)
+    while pos < end:
+        nl = data.find(b"\n", pos)
+        if nl < 0:
+            nl = end
+        yield( pos, data[pos:nl].rstrip(b"\r") )
+        pos = nl + 1
+
+def scanRecords( data ):
+    ## yields (offset, fqdn, rrtype, rdata, ttl) for every recognised record
+    for offset, line in scanLines( data ):
+        record = parseLine( line )
+        if record is not None:
+            yield( (offset,) + record )
+
+def readRecord( data, offset ):
+    ## returns the parsed record of the line starting at offset
+    nl = data.find(b"\n", offset)
+    if nl < 0:
+        nl = len(data)
+    return( parseLine( data[offset:nl].rstrip(b"\r") ) )
+
+def recordDigest( rdata, ttl ):
+    import hashlib
+    return( hashlib.blake2b( rdata + b":" + ttl.encode("ascii"), digest_size=16 ).digest() )
+
+def generatedEntry( line ):
+    ## returns the (fqdn, rrtype) key and digest of a generated line
+    record = parseLine( line.encode("latin-1") )
+    if record is None:
+        raise ValueError("not a generic or AAAA data line: " + line)
+    fqdn, rrtype, rdata, ttl = record
+    return( ( (fqdn, rrtype), recordDigest( rdata, ttl ) ) )
+
+def touchedRecords( data, owners, counts ):
+    ## yields (line, entry, matched) for each data file line that shares an
+    ## (fqdn, type) with a generated line, matching each generated copy once
+    pending = dict(counts)
+    for offset, line in scanLines( data ):
+        end = line.find(b":", 1)
+        if end < 0 or line[0:1] not in (b":", b"3", b"6") or normalName( line[1:end] ) not in owners:
+            continue
+        record = parseLine( line )
+        if record is None:
+            continue
+        entry = ( (record[0], record[1]), recordDigest( record[2], record[3] ) )
+        if pending.get(entry):
+            pending[entry] -= 1
+            yield( line, entry, True )
+        elif entry[0] in owners.get(record[0], ()):
+            yield( line, entry, False )
+
+def diffRecords( data, lines, stats=None ):
+    ## yields "+line" for each generated line not already in the data file,
+    ## then "-line" for each data file line that was not generated but shares
+    ## an (fqdn, type) with a generated one; other names and types are left alone
+    ## stats, if given, is a dictionary that gets added/removed/unchanged counts
+    ## the generated lines are spooled to a temporary file and only their
+    ## digests are counted; the data file is scanned twice, once to match and
+    ## once to yield the stale lines, so none of them are held in memory
+    import tempfile
+    counts = {}
+    owners = {}
+    total = 0
+    with tempfile.TemporaryFile("w+", encoding="latin-1", newline="\n") as spool:
+        for line in lines:
+            entry = generatedEntry( line )
+            counts[entry] = counts.get(entry, 0) + 1
+            owners.setdefault( entry[0][0], set() ).add( entry[0] )
+            spool.write( line + "\n" )
+            total += 1
+        matched = dict.fromkeys( counts, 0 )
+        for line, entry, found in touchedRecords( data, owners, counts ):
+            if found:
+                matched[entry] += 1
+        ## the first generated copies of a record are the ones already there
+        added = 0
+        spool.seek(0)
+        for line in spool:
+            line = line[:-1]
+            entry = generatedEntry( line )
+            if matched[entry]:
+                matched[entry] -= 1
+            else:
+                added += 1
+                yield( "+" + line )
+    removed = 0
+    for line, entry, found in touchedRecords( data, owners, counts ):
+        if not found:
+            removed += 1
+            yield( "-" + line.decode("latin-1") )
+    if stats is not None:
+        stats.update( added=added, removed=removed, unchanged=total - added )
+
+class DataIndex:
+
+    def __init__( self, path ):
+        ## one pass over the file, keeping line offsets by (fqdn, rrtype)
+        self.data = mapFile( path )
+        self.offsets = {}
+        self.other = 0
+        for offset, line in scanLines( self.data ):
+            record = parseLine( line )
+            if record is None:
+                if line and not line.startswith(b"#"):
+                    self.other += 1
+                continue
+            key = (record[0], record[1])
+            if key in self.offsets:
+                self.offsets[key].append( offset )
+            else:
+                self.offsets[key] = [offset]
+
+    def lookup( self, fqdn, rrtype ):
+        ## returns a list of (fqdn, rrtype, rdata, ttl) for a name and type
+        key = (fqdn.lower().rstrip("."), int(rrtype))
+        return( [ readRecord( self.data, offset ) for offset in self.offsets.get(key, []) ] )
+
+    def typeCounts( self ):
+        ## returns a dictionary of rrtype -> number of records
+        counts = {}
+        for (fqdn, rrtype), offsets in self.offsets.items():
+            counts[rrtype] = counts.get(rrtype, 0) + len(offsets)
+        return( counts )
+
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    domain = ""
+    rrtype = ""
+
+    opts, args = getopt.getopt(argv,"hd:t:",["help","domain=","type="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: tinydata.py [--domain example.com --type 257] data')
+            print('  --domain hostname (show records for this name)')
+            print('  --type int (record type to show with --domain)')
+            print('  without --domain, prints the number of records of each type')
+            return( 0 )
+        elif opt in ("-d", "--domain"):
+            domain = arg
+        elif opt in ("-t", "--type"):
+            rrtype = arg
+
+    index = DataIndex( args[0] if args else "data" )
+    if domain:
+        if not rrtype:
+            sys.stderr.write( "tinydata: --domain needs --type\n" )
+            return( 1 )
+        for fqdn, rtype, rdata, ttl in index.lookup( domain, rrtype ):
+            sys.stdout.write( fqdn + " " + str(rtype) + " " + ttl + " " + rdata.hex() + "\n" )
+    else:
+        for rtype, count in sorted(index.typeCounts().items()):
+            sys.stdout.write( str(rtype) + " " + str(count) + "\n" )
+        sys.stdout.write( "other " + str(index.other) + "\n" )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
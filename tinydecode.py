@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+
+# tinydecode - decode the rdata of generated tinydns lines back into fields
+#
+# example: ./tinydecode.py data.generated
+#   example.com 257 86400 flags=0 tag=issue value=ca.example.net
+#
+# There is a decoder for each type the generators write: 257 CAA, 33 SRV,
+# 256 URI, 29 LOC, 64 SVCB, 65 HTTPS, 28 AAAA, 44 SSHFP and 16 TXT. Decoders
+# read the raw rdata (see tinydata.parseLine) and raise ValueError for rdata a
+# resolver would reject: labels over 63 octets, names over 255, SvcParams out
+# of order or with the wrong length, trailing bytes and so on.
+#
+# verifyRecord() compares a decoded line with the builder arguments it was
+# made from; tinygen.py --verify runs it over a whole manifest. Lines that do
+# not decode are reported on stderr and the exit status is 1.
+
+import sys
+from tinydata import parseLine
+from tinyname import presentLabel, presentName
+
+class Approx:
+    ## compares equal to numbers within tolerance of value, for LOC fields
+    ## that the wire format rounds
+
+    def __init__( self, value, tolerance ):
+        self.value = value
+        self.tolerance = tolerance
+
+    def __eq__( self, other ):
+        return( isinstance(other, (int, float)) and abs(other - self.value) <= self.tolerance )
+
+    def __repr__( self ):
+        return( "{0:g}~{1:g}".format(self.value, self.tolerance) )
+
+def uint( rdata, pos, length ):
+    if pos + length > len(rdata):
+        raise ValueError("rdata ends inside a " + str(length * 8) + "-bit field")
+    return( int.from_bytes(rdata[pos:pos + length], "big") )
+
+def readName( rdata, pos ):
+    ## returns (name, next position) for an uncompressed wire format name
+    ## if input b"\x07example\x03com\x00", output should be ("example.com", 13)
+    ## labels are in presentation form, so a dot inside a label comes out as "\."
+    labels = []
+    total = 1
+    while True:
+        length = uint( rdata, pos, 1 )
+        if length == 0:
+            return( ".".join(labels) or ".", pos + 1 )
+        if length > 63:
+            raise ValueError("label length " + str(length) + " is over 63")
+        total += length + 1
+        if total > 255:
+            raise ValueError("name is over 255 octets")
+        if pos + 1 + length > len(rdata):
+            raise ValueError("rdata ends inside a label")
+        labels.append( presentLabel( rdata[pos + 1:pos + 1 + length] ) )
+        pos += length + 1
+
+def endOf( rdata, pos ):
+    if pos != len(rdata):
+        raise ValueError(str(len(rdata) - pos) + " bytes after the end of the rdata")
+
+def decodeCaa( rdata ):
+    flags = uint( rdata, 0, 1 )
+    taglen = uint( rdata, 1, 1 )
+    if taglen == 0 or 2 + taglen > len(rdata):
+        raise ValueError("bad CAA tag length " + str(taglen))
+    tag = rdata[2:2 + taglen].decode("latin-1")
+    if not tag.isalnum():
+        raise ValueError("CAA tag is not alphanumeric: " + tag)
+    return( {"flags": flags, "tag": tag, "value": rdata[2 + taglen:].decode("latin-1")} )
+
+def decodeSrv( rdata ):
+    target, pos = readName( rdata, 6 )
+    endOf( rdata, pos )
+    return( {"priority": uint( rdata, 0, 2 ), "weight": uint( rdata, 2, 2 ), "port": uint( rdata, 4, 2 ), "target": target} )
+
+def decodeUri( rdata ):
+    if len(rdata) < 5:
+        raise ValueError("URI target is empty")
+    return( {"priority": uint( rdata, 0, 2 ), "weight": uint( rdata, 2, 2 ), "target": rdata[4:].decode("latin-1")} )
+
+def locCm( byte, name ):
+    ## size and precisions are a significand and a power of ten, in cm
+    sig = byte >> 4
+    exp = byte & 0x0f
+    if sig > 9 or exp > 9:
+        raise ValueError("bad LOC " + name + " byte " + hex(byte))
+    return( sig * 10 ** exp )
+
+def decodeLoc( rdata ):
+    if len(rdata) != 16:
+        raise ValueError("LOC rdata is " + str(len(rdata)) + " bytes, not 16")
+    if rdata[0] != 0:
+        raise ValueError("LOC version " + str(rdata[0]) + " is not 0")
+    ## coordinates are thousandths of an arc second from 2^31, altitude cm from -100000m
+    return( {
+        "size_cm": locCm( rdata[1], "size" ),
+        "hp_cm": locCm( rdata[2], "horizontal precision" ),
+        "vp_cm": locCm( rdata[3], "vertical precision" ),
+        "latitude_ms": uint( rdata, 4, 4 ) - 2 ** 31,
+        "longitude_ms": uint( rdata, 8, 4 ) - 2 ** 31,
+        "altitude_cm": uint( rdata, 12, 4 ) - 10000000,
+    } )
+
+def presentParam( svcid, value ):
+    ## returns the presentation form of one SvcParam value
+    import ipaddress
+    import base64
+    if svcid == 0:
+        if not value or len(value) % 2:
+            raise ValueError("bad mandatory length " + str(len(value)))
+        return( ",".join( str(uint( value, i, 2 )) for i in range(0, len(value), 2) ) )
+    elif svcid == 1:
+        alpns = []
+        pos = 0
+        while pos < len(value):
+            length = value[pos]
+            if length == 0 or pos + 1 + length > len(value):
+                raise ValueError("bad alpn length " + str(length))
+            alpns.append( value[pos + 1:pos + 1 + length].decode("latin-1") )
+            pos += 1 + length
+        if not alpns:
+            raise ValueError("empty alpn")
+        return( ",".join(alpns) )
+    elif svcid == 2:
+        if value:
+            raise ValueError("no-default-alpn has a value")
+        return( "" )
+    elif svcid == 3:
+        if len(value) != 2:
+            raise ValueError("bad port length " + str(len(value)))
+        return( str(uint( value, 0, 2 )) )
+    elif svcid == 4:
+        if not value or len(value) % 4:
+            raise ValueError("bad ipv4hint length " + str(len(value)))
+        return( ",".join( str(ipaddress.IPv4Address(value[i:i + 4])) for i in range(0, len(value), 4) ) )
+    elif svcid == 5:
+        return( base64.b64encode(value).decode("ascii") )
+    elif svcid == 6:
+        if not value or len(value) % 16:
+            raise ValueError("bad ipv6hint length " + str(len(value)))
+        return( ",".join( str(ipaddress.IPv6Address(value[i:i + 16])) for i in range(0, len(value), 16) ) )
+    return( value.decode("latin-1") )
+
+def decodeSvcb( rdata ):
+    priority = uint( rdata, 0, 2 )
+    target, pos = readName( rdata, 2 )
+    params = {}
+    last = -1
+    while pos < len(rdata):
+        svcid = uint( rdata, pos, 2 )
+        length = uint( rdata, pos + 2, 2 )
+        if svcid <= last:
+            raise ValueError("SvcParam key " + str(svcid) + " is out of order")
+        if pos + 4 + length > len(rdata):
+            raise ValueError("SvcParam key " + str(svcid) + " runs past the end of the rdata")
+        params[svcid] = presentParam( svcid, rdata[pos + 4:pos + 4 + length] )
+        last = svcid
+        pos += 4 + length
+    if priority == 0 and params:
+        raise ValueError("AliasMode record has SvcParams")
+    return( {"priority": priority, "target": target, "params": params} )
+
+def decodeAaaa( rdata ):
+    import ipaddress
+    if len(rdata) != 16:
+        raise ValueError("AAAA rdata is " + str(len(rdata)) + " bytes, not 16")
+    return( {"address": str(ipaddress.IPv6Address(rdata))} )
+
+## SSHFP fingerprint type -> digest length
+FPLENGTHS = {1: 20, 2: 32}
+
+def decodeSshfp( rdata ):
+    algorithm = uint( rdata, 0, 1 )
+    fptype = uint( rdata, 1, 1 )
+    fp = rdata[2:]
+    if fptype in FPLENGTHS and len(fp) != FPLENGTHS[fptype]:
+        raise ValueError("fingerprint type " + str(fptype) + " should be " + str(FPLENGTHS[fptype]) + " bytes, not " + str(len(fp)))
+    return( {"algorithm": algorithm, "fptype": fptype, "fingerprint": fp.hex()} )
+
+def decodeTxt( rdata ):
+    strings = []
+    pos = 0
+    while pos < len(rdata):
+        length = rdata[pos]
+        if pos + 1 + length > len(rdata):
+            raise ValueError("character-string runs past the end of the rdata")
+        strings.append( rdata[pos + 1:pos + 1 + length].decode("latin-1") )
+        pos += 1 + length
+    return( {"strings": strings, "text": "".join(strings)} )
+
+## rrtype -> decoder of raw rdata into a dictionary of fields
+DECODERS = {
+    257: decodeCaa,
+    33: decodeSrv,
+    256: decodeUri,
+    29: decodeLoc,
+    64: decodeSvcb,
+    65: decodeSvcb,
+    28: decodeAaaa,
+    44: decodeSshfp,
+    16: decodeTxt,
+}
+
+def decodeLine( line ):
+    ## returns (fqdn, rrtype, ttl, fields) for a data line, None if it is not
+    ## a generic or AAAA line of a type with a decoder
+    ## raises ValueError if its rdata does not decode
+    record = parseLine( line.encode("latin-1") if isinstance(line, str) else line )
+    if record is None or record[1] not in DECODERS:
+        return( None )
+    fqdn, rrtype, rdata, ttl = record
+    return( fqdn, rrtype, ttl, DECODERS[rrtype]( rdata ) )
+
+def normalName( name ):
+    return( name.lower().rstrip(".") or "." )
+
+def locSizeCm( metres ):
+    ## the expected size in cm, within the rounding of the one-digit encoding
+    import math
+    cm = float(metres.replace("m", "")) * 100
+    return( Approx( cm, 0.5 * 10 ** math.floor(math.log10(cm)) if cm >= 1 else 1 ) )
+
+def locMs( d, m, s, l ):
+    ms = (int(d) * 3600 + int(m) * 60 + float(s)) * 1000
+    return( Approx( -ms if l in "SW" else ms, 1 ) )
+
+def normalParam( svcid, value ):
+    ## the presentation form presentParam() should give back for an input value
+    import ipaddress
+    import base64
+    from tinysvcb import getParamId
+    if svcid == 0:
+        return( ",".join( str(i) for i in sorted( getParamId(key) for key in value.split(",") ) ) )
+    elif svcid == 2:
+        return( "" )
+    elif svcid == 3:
+        return( str(int(value)) )
+    elif svcid == 4:
+        return( ",".join( str(ipaddress.IPv4Address(a)) for a in value.split(",") ) )
+    elif svcid == 5:
+        return( base64.b64encode(base64.b64decode(value)).decode("ascii") )
+    elif svcid == 6:
+        return( ",".join( str(ipaddress.IPv6Address(a)) for a in value.split(",") ) )
+    return( value )
+
+def caaFields( domain, flags, tag, value ):
+    return( domain, 257, {"flags": int(flags), "tag": tag, "value": value} )
+
+def srvFields( domain, service, proto, priority, weight, port, target ):
+    return( "_" + service + "._" + proto + "." + domain, 33, {"priority": int(priority), "weight": int(weight), "port": int(port), "target": presentName( target )} )
+
+def uriFields( domain, prefix, priority, weight, target ):
+    return( prefix + "." + domain, 256, {"priority": int(priority), "weight": int(weight), "target": target} )
+
+def locFields( domain, d1, m1, s1, l1, d2, m2, s2, l2, alt, siz, hp, vp ):
+    return( domain, 29, {
+        "size_cm": locSizeCm( siz ),
+        "hp_cm": locSizeCm( hp ),
+        "vp_cm": locSizeCm( vp ),
+        "latitude_ms": locMs( d1, m1, s1, l1 ),
+        "longitude_ms": locMs( d2, m2, s2, l2 ),
+        "altitude_cm": Approx( float(alt.replace("m", "")) * 100, 1 ),
+    } )
+
+def svcbFields( rrtype ):
+    def fields( domain, priority, target, parameters ):
+        from tinysvcb import parseParameters
+        params = {}
+        if int(priority) > 0:
+            params = { svcid: normalParam( svcid, value ) for svcid, value in parseParameters( parameters ) }
+        return( domain, rrtype, {"priority": int(priority), "target": presentName( target ), "params": params} )
+    return( fields )
+
+def aaaaFields( fqdn, ipv6addr ):
+    import ipaddress
+    return( fqdn, 28, {"address": str(ipaddress.IPv6Address(ipv6addr))} )
+
+def sshfpFields( hostname, algid, fptype, fp ):
+    return( hostname, 44, {"algorithm": int(algid), "fptype": int(fptype), "fingerprint": fp.lower()} )
+
+def dkimFields( domain, record ):
+    return( domain, 16, {"text": record} )
+
+## tinygen record type -> function of the builder arguments returning
+## (owner, rrtype, fields the decoder should give back)
+EXPECTED = {
+    "caa": caaFields,
+    "srv": srvFields,
+    "uri": uriFields,
+    "loc": locFields,
+    "svcb": svcbFields( 64 ),
+    "https": svcbFields( 65 ),
+    "aaaa": aaaaFields,
+    "sshfp": sshfpFields,
+    "dkim": dkimFields,
+}
+
+def verifyRecord( rtype, args, ttl, line ):
+    ## returns a list of problems found decoding line, which was built from
+    ## the builder arguments args of tinygen record type rtype
+    try:
+        decoded = decodeLine( line )
+    except ValueError as e:
+        return( ["rdata does not decode: " + str(e)] )
+    if decoded is None:
+        return( ["not a data line the decoders understand"] )
+    fqdn, rrtype, linettl, fields = decoded
+    owner, exprrtype, expected = EXPECTED[rtype]( *args )
+    problems = []
+    if fqdn != normalName( owner ):
+        problems.append( "owner " + fqdn + " should be " + normalName( owner ) )
+    if rrtype != exprrtype:
+        problems.append( "type " + str(rrtype) + " should be " + str(exprrtype) )
+    if linettl != ttl:
+        problems.append( "ttl " + linettl + " should be " + ttl )
+    for key, value in expected.items():
+        if value != fields.get(key):
+            problems.append( key + " decodes as " + repr(fields.get(key)) + ", expected " + repr(value) )
+    return( problems )
+
+def presentFields( fields ):
+    output = []
+    for key, value in fields.items():
+        if isinstance(value, dict):
+            value = " ".join( "key" + str(k) + "=" + v for k, v in value.items() )
+            output.append( key + "=\"" + value + "\"" )
+        elif isinstance(value, list):
+            output.append( key + "=" + "|".join(value) )
+        else:
+            output.append( key + "=" + str(value) )
+    return( " ".join(output) )
+
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+
+    opts, args = getopt.getopt(argv,"h",["help"])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: tinydecode.py [data ...]')
+            print('  prints the decoded fields of each line with a decoder, "-" or no file for stdin')
+            print('  lines that do not decode are reported on stderr and the exit status is 1')
+            return( 0 )
+
+    errors = 0
+    for name in args or ["-"]:
+        infile = sys.stdin.buffer if name == "-" else open(name, "rb")
+        with infile:
+            for lineno, line in enumerate(infile, 1):
+                try:
+                    decoded = decodeLine( line.rstrip(b"\r\n") )
+                except ValueError as e:
+                    sys.stderr.write( name + ":" + str(lineno) + ": " + str(e) + "\n" )
+                    errors += 1
+                    continue
+                if decoded is not None:
+                    fqdn, rrtype, ttl, fields = decoded
+                    sys.stdout.write( fqdn + " " + str(rrtype) + " " + ttl + " " + presentFields( fields ) + "\n" )
+
+    return( 1 if errors else 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
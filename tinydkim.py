@@ -4,44 +4,51 @@
 #
 # example: openssl rsa -in test.pem -pubout | ./tinydkim.py -s test -d foo.com 
 #
+# directory: ./tinydkim.py --directory keys/ --jobs 4 --cache dkim.cache
+#   makes a record for every keys/<domain>/<selector>.pem, in domain and selector
+#   order. A .pem may hold the public key or the private key, which is passed
+#   through "openssl pkey -pubout". Keys are read by a pool of --jobs processes;
+#   with --cache, keys already extracted from a file with the same path, size
+#   and mtime are taken from the cache file and the .pem is not read again.
+#
+# Records longer than 255 bytes (any key over 1024 bits) are split into
+# several 255 byte character-strings, which DKIM verifiers join back together.
+#
 # TODO: add support for notes field?
 #
 # https://www.rfc-editor.org/rfc/rfc6376.html
 #
 # 2016,2022 Lee Maguire
 
-import getopt
 import sys
-import re
+from tinybytes import tinyLine
+from tinystats import statsOptions, statsStage, statsTimed, statsCount
+from tinyshard import outputStream, outputOptions
 
-bind = ''
-opt_h = ''
-opt_t = ''
-ttl = "86400"
-selector = "selector"
-domain = "example.com"
+PEM_ARMOR = ('-----BEGIN PUBLIC KEY-----', '-----END PUBLIC KEY-----',
+    '-----BEGIN RSA PUBLIC KEY-----', '-----END RSA PUBLIC KEY-----')
+
+## str.translate table deleting the whitespace between base64 lines
+PEM_WHITESPACE = str.maketrans("", "", "\r\n\t ")
 
 def extractPubKey( key ):
-    output = ""
-    key = key.replace('-----BEGIN PUBLIC KEY-----','')
-    key = key.replace('-----END PUBLIC KEY-----','')
-    key = key.replace('-----BEGIN RSA PUBLIC KEY-----','')
-    key = key.replace('-----END RSA PUBLIC KEY-----','')
-    for c in key:
-        if not c in ["\r","\n","\t"," "]:
-            output = output + c
-    return( output );
-
-def tinyBytes( bytearr, escape_all=False ):
-    ## output printable ascii but not space, "/", ":", "\"
-    ## all other characters output as octal \nnn codes
-    output = ""
-    for b in bytearr:
-        if not escape_all and int(b) > 32 and int(b) < 127 and int(b) not in [47,58,92]:
-            output += chr(b)
-        else:
-            output += "\\{0:03o}".format(b)
-    return( output )
+    for armor in PEM_ARMOR:
+        key = key.replace(armor, '')
+    return( key.translate(PEM_WHITESPACE) )
+
+def readPubKey( path ):
+    ## returns the base64 public key of a .pem file holding a public or private key
+    with open(path, "r") as infile:
+        text = infile.read()
+    if "PRIVATE KEY-----" in text:
+        import subprocess
+        result = subprocess.run(["openssl", "pkey", "-pubout"], input=text, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise ValueError(path + ": openssl could not read the private key: " + result.stderr.strip())
+        text = result.stdout
+    elif "PUBLIC KEY-----" not in text:
+        raise ValueError(path + ": no PEM public or private key")
+    return( extractPubKey( text ) )
 
 def nboInt( length, number ):
     ## returns bytes representing an integer in network byte order (big endian)
@@ -49,64 +56,169 @@ def nboInt( length, number ):
     intbytes = int(number).to_bytes(length, "big")
     return( intbytes )
 
+def txtStrings( record ):
+    ## splits a record into the 255 byte pieces a TXT character-string can hold
+    text = bytes(record, "ascii")
+    return( [ text[i:i + 255] for i in range(0, len(text), 255) ] or [b''] )
+
 def tinyDkimRecord( domain, record, ttl ):
-    output = ":"
-    output += tinyBytes( bytes(domain, "ascii") )
-    output += ":16:"
-    output += tinyBytes ( nboInt(1, len(record)) )
-    output += tinyBytes( bytes(record, "ascii"))
-    output += ":" + ttl
-    return( output )
+    owner, rdata = dkimRdata( domain, record )
+    return( tinyLine( owner, 16, rdata, ttl ) )
+
+def dkimRdata( domain, record ):
+    ## returns the owner name and raw rdata bytes of the record tinyDkimRecord describes
+    outbytes = bytearray(b'')
+    for string in txtStrings( record ):
+        outbytes += nboInt(1, len(string))
+        outbytes += string
+    return( domain, bytes(outbytes) )
 
 def dnsQuotedText( text ):
-    output = ""
-    for c in text:
-        if c in [";"]:
-            output = output + "\\;"
-        else:
-            output = output + c
-    output = "\"" + output + "\""
-    return( output );
+    return( "\"" + text.replace(";", "\\;") + "\"" )
 
 def dnsTxtRecord( domain, record, ttl ):
-    output = domain + ". " + ttl + " IN TXT " +  dnsQuotedText( record );
+    strings = [ dnsQuotedText( string.decode("ascii") ) for string in txtStrings( record ) ]
+    output = domain + ". " + ttl + " IN TXT " + " ".join(strings)
     return( output )
 
-opts, args = getopt.getopt(sys.argv[1:],"hs:d:t:l:b",["selector=","domain=","hash=","testing=","ttl=","bind"])
-for opt, arg in opts:
-    if opt == '-h':
-        print('Usage: tinydkim.py -s selector -d example.com -t y < pubkey.pem')
-        sys.exit()
-    elif opt in ("-s", "--selector"):
-        selector = arg
-    elif opt in ("-d", "--domain"):
-        domain = arg
-    elif opt in ("-h", "--hash"):
-        opt_h = arg
-    elif opt in ("-t", "--testing"):
-        opt_t = arg
-    elif opt in ("-l", "--ttl"):
-        ttl = arg
-    elif opt in ("-b", "--bind"):
-        bind = 1
-
-input_text = "".join(sys.stdin)
-
-rdata = "v=DKIM1"
-if opt_h:
-    rdata = rdata + "; h=" + opt_h 
-rdata = rdata + "; p=" + extractPubKey( input_text )
-if opt_t:
-    rdata = rdata + "; t=" + opt_t
-
-fqdn = selector + "._domainkey." +  domain
-
-line = tinyDkimRecord( fqdn, rdata, ttl )
-sys.stdout.write( line + "\n")
-
-## optionally output the format used by lookup tools for comparison
-if bind:
-    line = dnsTxtRecord( fqdn, rdata, ttl )
-    sys.stdout.write( "\n# " + line + "\n" )
-
-sys.exit(0)
+def dkimText( pubkey, opt_h="", opt_t="" ):
+    ## returns the TXT record text for a base64 public key
+    rdata = "v=DKIM1"
+    if opt_h:
+        rdata = rdata + "; h=" + opt_h 
+    rdata = rdata + "; p=" + pubkey
+    if opt_t:
+        rdata = rdata + "; t=" + opt_t
+    return( rdata )
+
+def keyFiles( dirpath ):
+    ## yields (domain, selector, path, stat) for each dirpath/<domain>/<selector>.pem
+    ## in domain and selector order
+    import os
+    for domain in sorted(os.listdir(dirpath)):
+        domaindir = os.path.join(dirpath, domain)
+        if domain.startswith(".") or not os.path.isdir(domaindir):
+            continue
+        for name in sorted(os.listdir(domaindir)):
+            path = os.path.join(domaindir, name)
+            if name.endswith(".pem") and not name.startswith(".") and os.path.isfile(path):
+                yield( domain, name[:-4], path, os.stat(path) )
+
+def directoryKeys( dirpath, jobs=1, cache=None ):
+    ## yields (domain, selector, public key) for every key file under dirpath
+    ## files missed by the cache are read by a pool of jobs processes
+    files = list(keyFiles( dirpath ))
+    keys = [None] * len(files)
+    cachekeys = [None] * len(files)
+    misses = []
+    for i, (domain, selector, path, st) in enumerate(files):
+        if cache is not None:
+            cachekeys[i] = cache.key( "pem", [path, str(st.st_size), str(st.st_mtime_ns)], "" )
+            keys[i] = cache.get( cachekeys[i] )
+        if keys[i] is None:
+            misses.append( i )
+    paths = [ files[i][2] for i in misses ]
+    if jobs > 1 and len(paths) > 1:
+        import multiprocessing
+        with multiprocessing.Pool(jobs) as pool:
+            extracted = pool.map( readPubKey, paths, max(1, len(paths) // (jobs * 4)) )
+    else:
+        extracted = map( readPubKey, paths )
+    for i, pubkey in zip(misses, extracted):
+        keys[i] = pubkey
+        if cache is not None:
+            cache.put( cachekeys[i], pubkey )
+    for (domain, selector, path, st), pubkey in zip(files, keys):
+        yield( domain, selector, pubkey )
+
+@statsOptions
+@outputOptions
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    bind = ''
+    opt_h = ''
+    opt_t = ''
+    ttl = "86400"
+    selector = "selector"
+    domain = "example.com"
+    keydir = ""
+    jobs = 1
+    cachefile = ""
+
+    opts, args = getopt.getopt(argv,"hs:d:t:l:bD:j:c:",["selector=","domain=","hash=","testing=","ttl=","bind","directory=","jobs=","cache="])
+    for opt, arg in opts:
+        if opt == '-h':
+            print('Usage: tinydkim.py -s selector -d example.com -t y < pubkey.pem')
+            print('       tinydkim.py --directory keys/ [--jobs 4] [--cache dkim.cache] [-t y] [-b]')
+            print('  --directory dir (a record for every dir/<domain>/<selector>.pem)')
+            print('  --jobs int (processes reading key files, default 1)')
+            print('  --cache file (reuse keys from unchanged .pem files, report hits and misses)')
+            print('  --stats, --stats-json file, --profile file (report run statistics, see tinystats.py)')
+            print('  --compact (write the shortest escaping tinydns-data accepts, report bytes saved)')
+            print('  --shards N or --shard-zones list, --shard-prefix path, --shard-only names (write to fragment files, see tinyshard.py)')
+            return( 0 )
+        elif opt in ("-s", "--selector"):
+            selector = arg
+        elif opt in ("-d", "--domain"):
+            domain = arg
+        elif opt in ("-h", "--hash"):
+            opt_h = arg
+        elif opt in ("-t", "--testing"):
+            opt_t = arg
+        elif opt in ("-l", "--ttl"):
+            ttl = arg
+        elif opt in ("-b", "--bind"):
+            bind = 1
+        elif opt in ("-D", "--directory"):
+            keydir = arg
+        elif opt in ("-j", "--jobs"):
+            jobs = int(arg)
+        elif opt in ("-c", "--cache"):
+            cachefile = arg
+
+    if keydir:
+        cache = None
+        if cachefile:
+            from tinycache import RecordCache
+            cache = RecordCache( cachefile )
+        statsStage( "write" )
+        with outputStream() as out:
+            ## reading the keys is the costly part, so building the lines is counted as write
+            for domain, selector, pubkey in statsTimed( "read", directoryKeys( keydir, jobs, cache ) ):
+                fqdn = selector + "._domainkey." + domain
+                rdata = dkimText( pubkey, opt_h, opt_t )
+                line = tinyDkimRecord( fqdn, rdata, ttl )
+                statsCount( line )
+                out.write( line + "\n" )
+                if bind:
+                    out.write( "# " + dnsTxtRecord( fqdn, rdata, ttl ) + "\n" )
+        if cache is not None:
+            cache.save()
+            sys.stderr.write( "tinydkim cache: {hits} hits, {misses} misses, {evicted} evicted, {entries} entries\n".format(**cache.stats()) )
+        return( 0 )
+
+    statsStage( "read" )
+    input_text = "".join(sys.stdin)
+    statsStage( "encode" )
+
+    rdata = dkimText( extractPubKey( input_text ), opt_h, opt_t )
+
+    fqdn = selector + "._domainkey." +  domain
+
+    line = tinyDkimRecord( fqdn, rdata, ttl )
+    statsStage( "write" )
+    statsCount( line )
+    with outputStream() as out:
+        out.write( line + "\n" )
+
+        ## optionally output the format used by lookup tools for comparison
+        if bind:
+            line = dnsTxtRecord( fqdn, rdata, ttl )
+            out.write( "\n# " + line + "\n" )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+
+# tinygen - generate tinydns records of any supported type from a single manifest
+#
+# example: ./tinygen.py records.txt > data.generated
+#          cat records.txt | ./tinygen.py -l 300
+#
+# Each manifest line is a record type followed by the arguments of that type's
+# builder, in order, with an optional ttl at the end. Fields are separated by
+# whitespace and may be quoted shell-style. Blank lines and "#" comments are skipped.
+#
+#   caa   domain flags tag value [ttl]
+#   srv   domain service proto priority weight port target [ttl]
+#   uri   domain prefix priority weight target [ttl]      (prefix eg "_ldap._tcp")
+#   loc   domain d1 m1 s1 l1 d2 m2 s2 l2 alt siz hp vp [ttl]
+#   svcb  domain priority target [parameters] [ttl]       (also "https")
+#         a lone number after the target is the ttl, as parameters are never
+#         a bare number; "" stands for empty parameters before a ttl too
+#   aaaa  fqdn ip [ttl]
+#   sshfp hostname algid fptype fingerprint [ttl]
+#   dkim  fqdn txt-record [ttl]
+#
+# With --jobs N the manifest is cut into chunks that are encoded by a pool of
+# N processes. Chunks are written back in input order, so the output is
+# byte-identical to a serial run.
+#
+# With --cache FILE, rows whose type, fields and ttl are unchanged since the
+# last run are copied from the cache instead of being re-encoded. Under
+# --watch the cache is saved after each rebuild and keeps only the rows of
+# the manifests rebuilt in it, so it does not grow while the watcher runs.
+#
+# With --cdb FILE, the raw rdata is written straight into a cdb file in the
+# format of tinydns' data.cdb instead of being printed as text. It is a
+# fragment: it holds only the generated records, with no SOA or NS, and
+# tinydns answers nothing from a data.cdb without them. Use it to check or
+# compare generated records (tinycdb.cdbGet); to serve them, send the text
+# output through tinydns-data with the rest of the data file.
+#
+# With --diff DATAFILE, only the differences against an existing data file
+# are printed: "+line" for new records and "-line" for records with the same
+# name and type that the manifest no longer produces.
+#
+# With --verify, nothing is printed on stdout. Every row is built, its line
+# decoded again by tinydecode.py and the fields compared with the manifest;
+# problems go to stderr and the exit status is 1 if there were any. --jobs
+# spreads the checking over a process pool.
+#
+# With --watch DIR --output FILE, every manifest in DIR is built into its own
+# fragment and FILE is reassembled whenever one of them changes; see
+# tinywatch.py.
+
+import sys
+import tinybytes
+from tinybytes import compactLine
+from tinystats import statsOptions, statsStage, statsTimed, statsOutput, statsBlock
+from tinyshard import outputStream, outputOptions, stdoutStream
+from tinycaa import tinyCAARecord, caaRdata
+from tinysrv import tinySrvRecord, srvRdata
+from tinyuri import tinyUriRecord, uriRdata
+from tinyloc import tinyLocRecord, locRdata
+from tinysvcb import tinySVCBRecord, svcbRdata
+from tinyipv6 import tinyAAAARecord, aaaaRdata
+from tinysshfp import tinySshfpRecord, sshfpRdata
+from tinydkim import tinyDkimRecord, dkimRdata
+
+## record type -> (builder, required fields, optional fields)
+## the builder takes the fields in manifest order followed by the ttl
+BUILDERS = {
+    "caa": (tinyCAARecord, 4, 0),
+    "srv": (tinySrvRecord, 7, 0),
+    "uri": (tinyUriRecord, 5, 0),
+    "loc": (tinyLocRecord, 13, 0),
+    "svcb": (lambda *f: tinySVCBRecord( "64", *f ), 3, 1),
+    "https": (lambda *f: tinySVCBRecord( "65", *f ), 3, 1),
+    "aaaa": (lambda *f: tinyAAAARecord( "r", *f ), 2, 0),
+    "sshfp": (tinySshfpRecord, 4, 0),
+    "dkim": (tinyDkimRecord, 2, 0),
+}
+
+## record type -> (rdata function, rr type) for the --cdb backend
+## the rdata function takes the same fields as the builder, without the ttl
+RDATA = {
+    "caa": (caaRdata, 257),
+    "srv": (srvRdata, 33),
+    "uri": (uriRdata, 256),
+    "loc": (locRdata, 29),
+    "svcb": (svcbRdata, 64),
+    "https": (svcbRdata, 65),
+    "aaaa": (aaaaRdata, 28),
+    "sshfp": (sshfpRdata, 44),
+    "dkim": (dkimRdata, 16),
+}
+
+def splitManifestLine( line ):
+    ## plain lines are split on whitespace, only quoted lines need shlex
+    if '"' in line or "'" in line:
+        import shlex
+        return( shlex.split(line) )
+    return( line.split() )
+
+def manifestRow( fields, ttl ):
+    ## returns the normalized (rtype, args, ttl) for a row already split into fields
+    rtype = fields[0].lower()
+    if rtype not in BUILDERS:
+        raise ValueError("unknown record type: " + fields[0])
+    builder, required, optional = BUILDERS[rtype]
+    args = fields[1:]
+    if len(args) == required + optional + 1:
+        ttl = args.pop()
+    elif optional and len(args) > required and args[-1].isdigit():
+        ttl = args.pop()
+    if len(args) < required or len(args) > required + optional:
+        raise ValueError(rtype + " expects " + str(required) + " fields and an optional ttl, got " + str(len(args)))
+    if len(args) < required + optional:
+        args += [""] * (required + optional - len(args))
+    return( rtype, args, ttl )
+
+def buildRow( rtype, args, ttl ):
+    ## returns the tinydns line for a normalized row
+    return( BUILDERS[rtype][0]( *args, ttl ) )
+
+def buildEntry( rtype, args, ttl ):
+    ## returns the cdb (key, value) pair for a normalized row
+    from tinycdb import tinydnsEntry
+    rdatafn, rrtype = RDATA[rtype]
+    owner, rdata = rdatafn( *args )
+    ## the builders write the owner through tinyBytes, so a "\" in it is literal
+    if "\\" in owner:
+        owner = tinybytes.tinyBytes( bytes(owner, "ascii") )
+    return( tinydnsEntry( owner, rrtype, ttl, rdata ) )
+
+def manifestRecord( fields, ttl ):
+    ## returns the tinydns line for one manifest row already split into fields
+    return( buildRow( *manifestRow( fields, ttl ) ) )
+
+def manifestRows( lines, ttl, start=1 ):
+    ## yields (line number, rtype, args, ttl) for each manifest row
+    ## start is the line number of the first line, for error messages
+    for lineno, line in enumerate(lines, start):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            yield( (lineno,) + manifestRow( splitManifestLine( line ), ttl ) )
+        except ValueError as e:
+            raise ValueError("line " + str(lineno) + ": " + str(e))
+
+def buildRows( rows, build=buildRow ):
+    ## returns the tinydns lines for a list of (line number, rtype, args, ttl) rows
+    ## or with build=buildEntry, their cdb entries
+    output = []
+    for lineno, rtype, args, ttl in rows:
+        try:
+            output.append( build( rtype, args, ttl ) )
+        except ValueError as e:
+            raise ValueError("line " + str(lineno) + ": " + str(e))
+    return( output )
+
+def manifestRecords( lines, ttl, start=1, cache=None ):
+    ## yields one tinydns line per manifest row
+    ## rows found in the cache are not re-encoded
+    for row in manifestRows( lines, ttl, start ):
+        if cache is None:
+            yield( buildRows( [row] )[0] )
+            continue
+        key = cache.key( *row[1:] )
+        line = cache.get( key )
+        if line is None:
+            line = buildRows( [row] )[0]
+            cache.put( key, line )
+        yield( line )
+
+def manifestChunks( lines, size ):
+    ## yields (first line number, list of lines) for consecutive chunks of the input
+    import itertools
+    lines = iter(lines)
+    start = 1
+    while True:
+        chunk = list(itertools.islice(lines, size))
+        if not chunk:
+            return
+        yield( start, chunk )
+        start += len(chunk)
+
+def encodeChunk( start, lines, ttl ):
+    ## worker entry point, returns the output text for one chunk
+    return( "".join([ line + "\n" for line in manifestRecords( lines, ttl, start ) ]) )
+
+def entryChunk( start, lines, ttl ):
+    ## worker entry point for --cdb, returns the cdb entries for one chunk
+    return( buildRows( list(manifestRows( lines, ttl, start )), buildEntry ) )
+
+def cachedChunk( pool, start, lines, ttl, cache ):
+    ## looks up a chunk in the cache and sends only the misses to the pool
+    ## returns (output lines with None for misses, miss keys, async result)
+    output = []
+    keys = []
+    misses = []
+    for row in manifestRows( lines, ttl, start ):
+        key = cache.key( *row[1:] )
+        line = cache.get( key )
+        if line is None:
+            keys.append( key )
+            misses.append( row )
+        output.append( line )
+    result = None
+    if misses:
+        result = pool.apply_async(buildRows, (misses,))
+    return( output, keys, result )
+
+def mergeChunk( output, keys, result, cache ):
+    ## fills in the misses of a cachedChunk result and returns the chunk text
+    if result is not None:
+        built = result.get()
+        j = 0
+        for i, line in enumerate(output):
+            if line is None:
+                output[i] = built[j]
+                cache.put( keys[j], built[j] )
+                j += 1
+    return( "".join([ line + "\n" for line in output ]) )
+
+def parallelRecords( lines, ttl, jobs, chunksize, cache=None, encoder=encodeChunk ):
+    ## yields output text chunk by chunk, in input order
+    ## (or whatever encoder returns for a chunk, eg entryChunk)
+    ## at most a few chunks per worker are in flight so memory stays bounded
+    ## with a cache, only the rows it misses are sent to the workers
+    import collections
+    import multiprocessing
+    with multiprocessing.Pool(jobs) as pool:
+        pending = collections.deque()
+        for start, chunk in manifestChunks( lines, chunksize ):
+            if cache is None:
+                pending.append( pool.apply_async(encoder, (start, chunk, ttl)) )
+            else:
+                pending.append( cachedChunk( pool, start, chunk, ttl, cache ) )
+            if len(pending) >= jobs * 4:
+                yield( finishChunk( pending.popleft(), cache ) )
+        while pending:
+            yield( finishChunk( pending.popleft(), cache ) )
+
+def verifyChunk( start, lines, ttl ):
+    ## worker entry point for --verify, returns the problems found in one chunk
+    ## every row is parsed and built on its own, so one bad row is reported
+    ## and the rest are still checked
+    from tinydecode import verifyRecord
+    problems = []
+    for lineno, line in enumerate(lines, start):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            rtype, args, rowttl = manifestRow( splitManifestLine( line ), ttl )
+        except ValueError as e:
+            problems.append( "line " + str(lineno) + ": " + str(e) )
+            continue
+        try:
+            built = buildRow( rtype, args, rowttl )
+            found = verifyRecord( rtype, args, rowttl, built )
+        except (ValueError, OverflowError, TypeError, KeyError) as e:
+            problems.append( "line " + str(lineno) + ": " + rtype + " does not build: " + str(e) )
+            continue
+        for problem in found:
+            problems.append( "line " + str(lineno) + ": " + rtype + " " + problem )
+    return( problems )
+
+def verifyManifests( names, ttl, jobs, chunksize ):
+    ## yields each problem --verify finds, checking chunks in a pool when jobs > 1
+    for infile in manifestFiles( names ):
+        name = getattr(infile, "name", "-")
+        if jobs > 1:
+            chunks = parallelRecords( infile, ttl, jobs, chunksize, None, verifyChunk )
+        else:
+            chunks = ( verifyChunk( start, chunk, ttl ) for start, chunk in manifestChunks( infile, chunksize ) )
+        for problems in chunks:
+            for problem in problems:
+                yield( name + ": " + problem )
+
+def finishChunk( chunk, cache ):
+    ## waits for a pending chunk from parallelRecords and returns its text
+    if cache is None:
+        return( chunk.get() )
+    return( mergeChunk( *chunk, cache ) )
+
+def manifestFiles( names ):
+    ## yields each named manifest as an open file, "-" is stdin
+    for name in names:
+        if name == "-":
+            yield( sys.stdin )
+        else:
+            with open(name, "r") as infile:
+                yield( infile )
+
+def writeCdb( names, ttl, jobs, chunksize, cdbfile ):
+    ## compiles the manifests straight into a cdb file
+    from tinycdb import CdbMake
+    cdb = CdbMake( cdbfile )
+    for infile in manifestFiles( names ):
+        if jobs > 1:
+            for entries in parallelRecords( infile, ttl, jobs, chunksize, None, entryChunk ):
+                for key, value in entries:
+                    cdb.add( key, value )
+        else:
+            for row in manifestRows( infile, ttl ):
+                cdb.add( *buildRows( [row], buildEntry )[0] )
+    cdb.finish()
+
+def generatedLines( names, ttl, jobs, chunksize, cache ):
+    ## yields every generated line, without its newline, in manifest order
+    for infile in manifestFiles( names ):
+        if jobs > 1:
+            for text in parallelRecords( infile, ttl, jobs, chunksize, cache ):
+                for line in text.split("\n")[:-1]:
+                    yield( line )
+        else:
+            for line in manifestRecords( infile, ttl, 1, cache ):
+                yield( line )
+
+@statsOptions
+@outputOptions
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    ttl = "86400"
+    jobs = 1
+    chunksize = 2000
+    cachefile = ""
+    cdbfile = ""
+    difffile = ""
+    verify = False
+    watchdir = ""
+    outfile = ""
+    interval = 2.0
+    command = ""
+
+    opts, args = getopt.getopt(argv,"hl:j:c:o:",["help","ttl=","jobs=","chunk=","cache=","cdb=","diff=","verify","watch=","output=","interval=","command="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: tinygen.py [--ttl 86400] [manifest ...]')
+            print('  --ttl int (default dns ttl for rows without one)')
+            print('  --jobs int (worker processes, default 1)')
+            print('  --chunk int (manifest lines per work unit with --jobs, default 2000)')
+            print('  --cache file (reuse encoded lines for unchanged rows, report hits and misses)')
+            print('  --cdb file (write the records alone in tinydns data.cdb format, not servable without SOA and NS)')
+            print('  --diff file (print only +added and -removed lines against an existing data file)')
+            print('  --verify (decode every generated line and compare it with its manifest row)')
+            print('  --watch dir --output file (rebuild file from the manifests in dir as they change)')
+            print('  --interval seconds (how often --watch polls if inotify is not available, default 2)')
+            print('  --command "cmd args" (run after each rebuild of the --watch output, eg tinydns-data)')
+            print('  --stats, --stats-json file, --profile file (report run statistics, see tinystats.py)')
+            print('  --compact (write the shortest escaping tinydns-data accepts, report bytes saved)')
+            print('  --shards N or --shard-zones list, --shard-prefix path, --shard-only names (write to fragment files, see tinyshard.py)')
+            print('  manifest files are read in order, stdin if none are given')
+            print('  record types: ' + " ".join(BUILDERS))
+            return( 0 )
+        elif opt in ("-l", "--ttl"):
+            ttl = arg
+        elif opt in ("-j", "--jobs"):
+            jobs = int(arg)
+        elif opt == "--chunk":
+            chunksize = int(arg)
+        elif opt == "--cdb":
+            cdbfile = arg
+        elif opt == "--diff":
+            difffile = arg
+        elif opt == "--verify":
+            verify = True
+        elif opt == "--watch":
+            watchdir = arg
+        elif opt in ("-o", "--output"):
+            outfile = arg
+        elif opt == "--interval":
+            interval = float(arg)
+        elif opt == "--command":
+            command = arg
+        elif opt in ("-c", "--cache"):
+            cachefile = arg
+
+    cache = None
+    if cachefile:
+        from tinycache import RecordCache
+        cache = RecordCache( cachefile )
+
+    if watchdir:
+        if not outfile or cdbfile or difffile:
+            sys.stderr.write( "tinygen: --watch needs --output, and cannot be used with --cdb or --diff\n" )
+            return( 1 )
+        from tinywatch import watchManifests
+        def generate( path ):
+            lines = generatedLines( [path], ttl, jobs, chunksize, cache )
+            if tinybytes.COMPACT:
+                return( map(compactLine, lines) )
+            return( lines )
+        def after():
+            if cache is not None:
+                cache.save()
+                cache.rotate()
+            if command:
+                import shlex
+                import subprocess
+                try:
+                    result = subprocess.run(shlex.split(command))
+                except OSError as e:
+                    return( command + ": " + str(e) )
+                if result.returncode != 0:
+                    return( command + ": exit status " + str(result.returncode) )
+            return( None )
+        try:
+            watchManifests( watchdir, outfile, generate, "", interval, after )
+        except KeyboardInterrupt:
+            pass
+        return( 0 )
+
+    if verify:
+        statsStage( "encode" )
+        problems = 0
+        for problem in verifyManifests( args or ["-"], ttl, jobs, chunksize ):
+            sys.stderr.write( "tinygen verify: " + problem + "\n" )
+            problems += 1
+        sys.stderr.write( "tinygen verify: " + str(problems) + " problems\n" )
+        return( 1 if problems else 0 )
+
+    if cdbfile:
+        if cachefile:
+            sys.stderr.write( "tinygen: --cache applies to text output and cannot be used with --cdb\n" )
+            return( 1 )
+        statsStage( "encode" )
+        writeCdb( args or ["-"], ttl, jobs, chunksize, cdbfile )
+        return( 0 )
+
+    statsStage( "write" )
+    ## a diff is for reading, so it is not sharded
+    with (stdoutStream() if difffile else outputStream()) as out:
+        if difffile:
+            from tinydata import mapFile, diffRecords
+            stats = {}
+            lines = statsOutput( generatedLines( args or ["-"], ttl, jobs, chunksize, cache ) )
+            for line in diffRecords( mapFile( difffile ), lines, stats ):
+                out.write( line + "\n" )
+            sys.stderr.write( "tinygen diff: {added} added, {removed} removed, {unchanged} unchanged\n".format(**stats) )
+        else:
+            for infile in manifestFiles( args or ["-"] ):
+                if jobs > 1:
+                    for text in statsTimed( "encode", parallelRecords( statsTimed( "read", infile ), ttl, jobs, chunksize, cache ) ):
+                        statsBlock( text )
+                        out.write( text )
+                else:
+                    for line in statsOutput( manifestRecords( statsTimed( "read", infile ), ttl, 1, cache ) ):
+                        out.write( line + "\n" )
+
+    if cache is not None:
+        cache.save()
+        stats = cache.stats()
+        sys.stderr.write( "tinygen cache: {hits} hits, {misses} misses, {evicted} evicted, {entries} entries\n".format(**stats) )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -7,77 +7,223 @@
 #
 # -3 and -6 options will generate "3:" and "6:" type records, if your server supports them 
 #
+# batch: ./tinyipv6.py -f hosts.txt -3   (or "-f -" to read stdin)
+#   one "fqdn ip [ttl]" row per line, whitespace or comma separated
+#
+# prefix: ./tinyipv6.py -p 2001:db8::/112 -t "pool-{x}.example.com" --ptr
+#         ./tinyipv6.py -p 2001:db8:1::/64 -t "host{n}.example.com" --start 1 --count 500
+#   one record per address of the network (or of the numbered range), named by
+#   the template: {n} is the address's offset in the network in decimal, {x}
+#   in hex and {ip} is the address with ":" written as "-"; --ptr adds a "^"
+#   line for its nibble-reversed ip6.arpa name ("6" lines already imply one)
+#
 # 2022 Lee Maguire
 
-import ipaddress
 import sys
-import getopt
-
-ttl = "86400"
-domain= "host.example.com"
-ip = "2001:db8:85a3:8d3:1319:8a2e:370:7348"
-opt_r = 0
-opt_3 = 0
-opt_6 = 0
-
-def tinyBytes( bytearr, encode_all=False ):
-    ## output printable ascii but not space, "/", ":", "\"
-    ## all other characters output as octal \nnn codes
-    output = ""
-    for b in bytearr:
-        if not encode_all and int(b) > 32 and int(b) < 127 and int(b) not in [47,58,92]:
-            output += chr(b)
-        else:
-            output += "\\{0:03o}".format(b)
-    return( output )
+from tinybytes import tinyBytes, tinyLine
+from tinyaddr import packIPv6, hexIPv6
+from tinystats import statsOptions, statsStage, statsTimed, statsOutput, statsCount
+from tinyshard import outputStream, outputOptions
 
 def tinyAAAARecord( rtype, fqdn, ipv6addr, ttl ):
-    output = ""
-    if rtype in "3":
-        output += "3"
-    elif rtype in "6":
-        output += "6"
-    else:
-        output += ":"
-    output += tinyBytes( bytes(fqdn, "ascii") ) 
+    ## "3" and "6" lines take the address in hex, anything else is a generic
+    ## type 28 line with the raw address written as \nnn codes
     if rtype in ("3","6"):
-        ip6_out = str(ipaddress.IPv6Address(ipv6addr).exploded).replace(":","")
-        output += ":" + tinyBytes( bytes(ip6_out, "ascii") )
-    else:
-        output += ":28:" + tinyBytes( ipaddress.IPv6Address(ipv6addr).packed, True ) 
-    output +=  ":" + ttl
-    return( output )
-
-opts, args = getopt.getopt(sys.argv[1:],"hd:i:l:36r",["domain=","ip=","ttl=","raw"])
-for opt, arg in opts:
-  if opt == '-h':
-    print('Usage: tinyipv6.py -d host.example.com -i 2001:db8:85a3:8d3:1319:8a2e:370:7348 -l 60 [-r][-3][-6]')
-    sys.exit()
-  elif opt in ("-d", "--domain"):
-    domain = arg
-  elif opt in ("-i", "--ip"):
-    ip = arg
-  elif opt in ("-l", "--ttl"):
-    ttl = arg
-  elif opt in ("-r", "--raw"):
-    opt_r = 1
-  elif opt in ("-3"):
-    opt_3 = 1
-  elif opt in ("-6"):
-    opt_6 = 1
-
-## default to the raw format if not specified
-if not opt_3 and not opt_6:
-    opt_r = 1
-
-if opt_r:
-  line = tinyAAAARecord( "r", domain, ip, ttl)
-  sys.stdout.write( line + "\n")
-if opt_3:
-  line = tinyAAAARecord( "3", domain, ip, ttl)
-  sys.stdout.write( line + "\n")
-if opt_6:
-  line = tinyAAAARecord( "6", domain, ip, ttl)
-  sys.stdout.write( line + "\n")
-
-sys.exit(0)
+        return( rtype + tinyBytes( bytes(fqdn, "ascii") ) + ":" + hexIPv6( ipv6addr ) + ":" + ttl )
+    owner, rdata = aaaaRdata( fqdn, ipv6addr )
+    return( tinyLine( owner, 28, rdata, ttl, 16 ) )
+
+def aaaaRdata( fqdn, ipv6addr ):
+    ## returns the owner name and raw rdata bytes of a type 28 record
+    return( fqdn, packIPv6( ipv6addr ) )
+
+## byte -> "\ooo", and byte -> its two nibbles reversed, as in ip6.arpa names
+OCTAL_TABLE = tuple( "\\{0:03o}".format(b) for b in range(256) )
+NIBBLE_TABLE = tuple( "{0:x}.{1:x}.".format(b & 0xf, b >> 4) for b in range(256) )
+
+def nameTemplate( template ):
+    ## returns a function of (offset, address int) giving the name for an address
+    ## only the fields the template uses are computed
+    import string
+    fields = set( field for text, field, spec, conv in string.Formatter().parse(template) if field is not None )
+    unknown = fields - {"n", "x", "ip"}
+    if unknown:
+        raise ValueError("unknown template field: {" + unknown.pop() + "}")
+    def name( offset, address ):
+        values = {}
+        if "n" in fields:
+            values["n"] = offset
+        if "x" in fields:
+            values["x"] = "{0:x}".format(offset)
+        if "ip" in fields:
+            import ipaddress
+            values["ip"] = str(ipaddress.IPv6Address(address)).replace(":", "-")
+        return( template.format(**values) )
+    return( name )
+
+def prefixRecords( prefix, template, rtypes, ttl, ptr=False, start=0, count=None ):
+    ## yields the lines for each address of an IPv6 network, or for count
+    ## addresses from offset start, without building a list of addresses
+    ## the bytes above the network's host bits are escaped once, not per address
+    import ipaddress
+    network = ipaddress.IPv6Network(prefix, strict=False)
+    end = network.num_addresses if count is None else start + count
+    if start < 0 or end > network.num_addresses:
+        raise ValueError("range is outside " + str(network))
+    hostbytes = (128 - network.prefixlen + 7) // 8
+    base = int(network.network_address)
+    fixed = network.network_address.packed[:16 - hostbytes]
+    rawfixed = "".join( OCTAL_TABLE[b] for b in fixed )
+    hexfixed = fixed.hex()
+    ptrfixed = "".join( NIBBLE_TABLE[b] for b in reversed(fixed) ) + "ip6.arpa"
+    hexformat = "{0:0" + str(hostbytes * 2) + "x}"
+    mask = (1 << (hostbytes * 8)) - 1
+    name = nameTemplate( template )
+    ## a "6" line already makes tinydns-data add the PTR
+    ptr = ptr and "6" not in rtypes
+    for offset in range(start, end):
+        address = base + offset
+        low = (address & mask).to_bytes(hostbytes, "big")
+        fqdn = tinyBytes( bytes(name( offset, address ), "ascii") )
+        for rtype in rtypes:
+            if rtype in ("3", "6"):
+                yield( rtype + fqdn + ":" + hexfixed + hexformat.format(address & mask) + ":" + ttl )
+            else:
+                yield( ":" + fqdn + ":28:" + rawfixed + "".join( OCTAL_TABLE[b] for b in low ) + ":" + ttl )
+        if ptr:
+            yield( "^" + "".join( NIBBLE_TABLE[b] for b in reversed(low) ) + ptrfixed + ":" + fqdn + ":" + ttl )
+
+def batchRows( lines ):
+    ## yields (fqdn, ip, ttl) tuples from "fqdn ip [ttl]" rows
+    ## rows may be whitespace separated or CSV, blank lines and "#" comments are skipped
+    import csv
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "," in line:
+            fields = [ f.strip() for f in next(csv.reader([line])) ]
+        else:
+            fields = line.split()
+        if len(fields) == 2:
+            yield( fields[0], fields[1], "" )
+        elif len(fields) == 3:
+            yield( fields[0], fields[1], fields[2] )
+        else:
+            raise ValueError("expected 'fqdn ip [ttl]', got: " + line)
+
+def batchRecords( lines, rtypes, ttl ):
+    ## yields one tinydns line per requested rtype for each input row
+    ## rows without a ttl use the default given
+    for fqdn, ipv6addr, rowttl in batchRows( lines ):
+        for rtype in rtypes:
+            yield( tinyAAAARecord( rtype, fqdn, ipv6addr, rowttl or ttl ) )
+
+@statsOptions
+@outputOptions
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    ttl = "86400"
+    domain= "host.example.com"
+    ip = "2001:db8:85a3:8d3:1319:8a2e:370:7348"
+    opt_r = 0
+    opt_3 = 0
+    opt_6 = 0
+    batchfile = ""
+    prefix = ""
+    template = ""
+    start = 0
+    count = None
+    ptr = False
+
+    opts, args = getopt.getopt(argv,"hd:i:l:36rf:p:t:",["domain=","ip=","ttl=","raw","file=","prefix=","template=","start=","count=","ptr"])
+    for opt, arg in opts:
+        if opt == '-h':
+            print('Usage: tinyipv6.py -d host.example.com -i 2001:db8:85a3:8d3:1319:8a2e:370:7348 -l 60 [-r][-3][-6]')
+            print('       tinyipv6.py -f hosts.txt -l 60 [-r][-3][-6]  (rows of "fqdn ip [ttl]", "-" for stdin)')
+            print('       tinyipv6.py -p 2001:db8::/112 -t "pool-{x}.example.com" [--start 0] [--count N] [--ptr] [-r][-3][-6]')
+            print('  -t template ({n} decimal offset, {x} hex offset, {ip} address with "-" for ":")')
+            print('  --ptr (also write "^" ip6.arpa PTR lines)')
+            print('  --stats, --stats-json file, --profile file (report run statistics, see tinystats.py)')
+            print('  --compact (write the shortest escaping tinydns-data accepts, report bytes saved)')
+            print('  --shards N or --shard-zones list, --shard-prefix path, --shard-only names (write to fragment files, see tinyshard.py)')
+            return( 0 )
+        elif opt in ("-d", "--domain"):
+            domain = arg
+        elif opt in ("-i", "--ip"):
+            ip = arg
+        elif opt in ("-l", "--ttl"):
+            ttl = arg
+        elif opt in ("-r", "--raw"):
+            opt_r = 1
+        elif opt in ("-3"):
+            opt_3 = 1
+        elif opt in ("-6"):
+            opt_6 = 1
+        elif opt in ("-f", "--file"):
+            batchfile = arg
+        elif opt in ("-p", "--prefix"):
+            prefix = arg
+        elif opt in ("-t", "--template"):
+            template = arg
+        elif opt == "--start":
+            start = int(arg)
+        elif opt == "--count":
+            count = int(arg)
+        elif opt == "--ptr":
+            ptr = True
+
+    ## default to the raw format if not specified
+    if not opt_3 and not opt_6:
+        opt_r = 1
+
+    rtypes = []
+    if opt_r:
+        rtypes.append("r")
+    if opt_3:
+        rtypes.append("3")
+    if opt_6:
+        rtypes.append("6")
+
+    if prefix:
+        if not template:
+            sys.stderr.write( "tinyipv6: --prefix needs a --template for the names\n" )
+            return( 1 )
+        statsStage( "write" )
+        with outputStream() as out:
+            for line in statsOutput( prefixRecords( prefix, template, rtypes, ttl, ptr, start, count ) ):
+                out.write( line + "\n" )
+        return( 0 )
+
+    if batchfile:
+        if batchfile == "-":
+            infile = sys.stdin
+        else:
+            infile = open(batchfile, "r", newline="")
+        ## one process for the whole inventory, lines are streamed through a large write buffer
+        statsStage( "write" )
+        with outputStream() as out:
+            for line in statsOutput( batchRecords( statsTimed( "read", infile ), rtypes, ttl ) ):
+                out.write( line + "\n" )
+        return( 0 )
+
+    statsStage( "encode" )
+    lines = []
+    if opt_r:
+        lines.append( tinyAAAARecord( "r", domain, ip, ttl) )
+    if opt_3:
+        lines.append( tinyAAAARecord( "3", domain, ip, ttl) )
+    if opt_6:
+        lines.append( tinyAAAARecord( "6", domain, ip, ttl) )
+    statsStage( "write" )
+    with outputStream() as out:
+        for line in lines:
+            statsCount( line )
+            out.write( line + "\n" )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
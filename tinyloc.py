@@ -5,53 +5,47 @@
 # example: ./tinyuri.py --domain example.com --d1 51 --m1 30 --s1 3.637 --l1 N --d2 0 --m2 8 --s2 29.624 --l2 W
 #   :example.com:29:\000\000\000\000\213\015\010\365\177\370\071\110\000\230\226\200:86400
 #
+# bulk: ./tinyloc.py --file nodes.csv   (or "--file -" to read stdin)
+#   CSV rows of fqdn,lat,lon,alt,siz,hp,vp[,ttl] where lat and lon are decimal
+#   degrees ("51.501", "-0.1416") or DMS ("51 30 3.637 N"); the numeric fields
+#   are computed a batch at a time with NumPy if it is installed
+#
 # https://www.rfc-editor.org/rfc/rfc1876
 #
 # 2022 Lee Maguire
 
 import sys
-import getopt
-from math import log10, floor
-
-domain = "example.com"
-d1 = "0"
-m1 = "0"
-s1 = "0.0"
-l1 = "N"
-d2 = "0"
-m2 = "0"
-s2 = "0.0"
-l2 = "W"
-alt = "0.00"
-siz = "0.00"
-hp = "0.00"
-vp = "0.00"
-ttl = "86400"
+import itertools
+from tinybytes import tinyLine
+from tinystats import statsOptions, statsStage, statsTimed, statsOutput, statsCount
+from tinyshard import outputStream, outputOptions
+
+## numpy is optional and slow to import, loadNumpy() imports it on first use
+numpy = None
+
+## rows encoded per batch in bulk mode
+BATCH_SIZE = 4096
+
+## a number, optionally followed by more numbers, then an optional hemisphere
+DMS_PATTERN = r"^\s*(-?[0-9.]+)(?:[\s:]+([0-9.]+))?(?:[\s:]+([0-9.]+))?\s*([NSEWnsew]?)\s*$"
+DMS_RE = None
 
 def tinyLocRecord( domain, d1, m1, s1, l1, d2, m2, s2, l2, alt, siz, hp, vp, ttl ):
-    output = ":"
-    output += tinyBytes( bytes(domain, "ascii") )
-    output += ":29:"
-    output += tinyBytes( nboInt(1,0) ) # version = 0
-    output += tinyBytes( locSize( siz ), True )
-    output += tinyBytes( locSize( hp ), True )
-    output += tinyBytes( locSize( vp ), True )
-    output += tinyBytes( dmsBytes( d1, m1, s1, l1 ), True )
-    output += tinyBytes( dmsBytes( d2, m2, s2, l2 ), True )
-    output += tinyBytes( locAlt( alt ), True )
-    output += ":" + ttl
-    return( output )
+    ## every byte is written as a \nnn code
+    owner, rdata = locRdata( domain, d1, m1, s1, l1, d2, m2, s2, l2, alt, siz, hp, vp )
+    return( tinyLine( owner, 29, rdata, ttl, len(rdata) ) )
 
-def tinyBytes( bytearr, encode_all=False ):
-    ## output printable ascii (but not space, "/", ":", "\")
-    ## all other characters output as octal \nnn codes
-    output = ""
-    for b in bytearr:
-        if not encode_all and b > 32 and b < 127 and b not in [47,58,92]:
-            output += chr(b)
-        else:
-            output += "\\{0:03o}".format(b)
-    return( output )
+def locRdata( domain, d1, m1, s1, l1, d2, m2, s2, l2, alt, siz, hp, vp ):
+    ## returns the owner name and raw rdata bytes of the record tinyLocRecord describes
+    outbytes = bytearray(b'')
+    outbytes += nboInt(1,0) # version = 0
+    outbytes += locSize( siz )
+    outbytes += locSize( hp )
+    outbytes += locSize( vp )
+    outbytes += dmsBytes( d1, m1, s1, l1 )
+    outbytes += dmsBytes( d2, m2, s2, l2 )
+    outbytes += locAlt( alt )
+    return( domain, bytes(outbytes) )
 
 def nboInt( length, number ):
     ## returns bytes representing an integer in network byte order (big endian)
@@ -61,6 +55,7 @@ def nboInt( length, number ):
 
 ## https://stackoverflow.com/a/3411435
 def round_to_1(x):
+    from math import log10, floor
     if int(x) == 0:
         return(x)
     else:
@@ -111,55 +106,199 @@ def dmsBytes( d, m, s, l ):
     dms = int(pos).to_bytes(4, "big")
     return( dms )
 
-opts, args = getopt.getopt(sys.argv[1:],"hd:l:",["help","domain=","d1=","m1=","s1=","l1=","d2=","m2=","s2=","l2=","alt=","siz=","hp=","vp=","ttl="])
-for opt, arg in opts:
-    if opt in ("-h", "--help"):
-        print('Usage: tinyloc.py --domain example.com --d1 51 --m1 30 --s1 3.637 --l1 N --d2 0 --m2 8 --s2 29.624 --l2 W')
-        print('  --domain domain-name')
-        print('  --d1 0-90 (degrees lat)')
-        print('  --m1 0-59 (minutes lat)')
-        print('  --s1 0-59.999 (seconds lat)')
-        print('  --l1 direction ("N"/"S)')
-        print('  --d2 0-90 (degrees lon)')
-        print('  --m2 0-59 (minutes lon)')
-        print('  --s2 0-59.999 (seconds lon)')
-        print('  --l2 direction ("E"/"W")')
-        print('  --alt -100000.00 - 42849672.95m (altitude in m)')
-        print('  --siz 0 .. 90000000.00m (size)')
-        print('  --hp 0 .. 90000000.00m (horizonal precision)')
-        print('  --vp 0 .. 90000000.00m (vertical precision)')
-        print('  --ttl int (dns ttl)')
-        sys.exit()
-    elif opt in ("-d", "--domain"):
-        domain = arg
-    elif opt in ("--d1"):
-        d1 = arg
-    elif opt in ("--m1"):
-        m1 = arg
-    elif opt in ("--s1"):
-        s1 = arg
-    elif opt in ("--l1"):
-        l1 = arg
-    elif opt in ("--d2"):
-        d2 = arg
-    elif opt in ("--m2"):
-        m2 = arg
-    elif opt in ("--s2"):
-        s2 = arg
-    elif opt in ("--l2"):
-        l2 = arg
-    elif opt in ("--alt"):
-        alt = arg
-    elif opt in ("--siz"):
-        siz = arg
-    elif opt in ("--hp"):
-        hp = arg
-    elif opt in ("--vp"):
-        vp = arg
-    elif opt in ("-l", "--ttl"):
-        ttl = arg
-
-line = tinyLocRecord( domain, d1, m1, s1, l1, d2, m2, s2, l2, alt, siz, hp, vp, ttl )
-sys.stdout.write( line + "\n")
-
-sys.exit(0)
+def loadNumpy():
+    ## returns the numpy module, or False if it is not installed
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as np
+            numpy = np
+        except ImportError:
+            numpy = False
+    return( numpy )
+
+def coordinateMs( text, negative ):
+    ## returns signed thousandths of a second for "51.501", "-0.1416" or "51 30 3.637 N"
+    ## negative is the hemisphere letter for south or west
+    global DMS_RE
+    if DMS_RE is None:
+        import re
+        DMS_RE = re.compile(DMS_PATTERN)
+    m = DMS_RE.match(text)
+    if m is None:
+        raise ValueError("cannot parse coordinate: " + text)
+    d, mins, secs, hemi = m.groups()
+    if mins is None:
+        ms = float(d) * 3600000
+        sign = -1 if ms < 0 else 1
+        ms = abs(ms)
+    else:
+        ## the same arithmetic as dmsBytes, so both give identical output
+        ms = int(d) * 3600000
+        ms += int(mins) * 60000
+        ms += float(secs or "0") * 1000
+        sign = 1
+    if hemi.upper() == negative:
+        sign = -sign
+    return( sign, ms )
+
+def locCsvRows( lines ):
+    ## yields (fqdn, lat, lon, alt, siz, hp, vp, ttl) from CSV rows
+    ## blank lines and "#" comments are skipped, empty numeric fields are 0
+    import csv
+    for fields in csv.reader( line for line in lines if line.strip() and not line.lstrip().startswith("#") ):
+        fields = [ f.strip() for f in fields ]
+        if len(fields) == 7:
+            fields.append( "" )
+        if len(fields) != 8:
+            raise ValueError("expected fqdn,lat,lon,alt,siz,hp,vp[,ttl], got: " + ",".join(fields))
+        yield( [ f or "0" for f in fields[:7] ] + [fields[7]] )
+
+def locSizeTable( values ):
+    ## returns a dictionary of the locSize byte for each distinct size string
+    ## sizes repeat across a fleet, so each is only worked out once per batch
+    table = {}
+    for v in values:
+        if v not in table:
+            table[v] = locSize( v )[0]
+    return( table )
+
+def locBatchRdata( rows ):
+    ## returns the 16 byte LOC rdata for each row of a batch
+    midpoint = 2 ** 31
+    lat = [ coordinateMs( r[1], "S" ) for r in rows ]
+    lon = [ coordinateMs( r[2], "W" ) for r in rows ]
+    alt = [ float(r[3].replace("m", "")) for r in rows ]
+    sizes = locSizeTable( v for r in rows for v in r[4:7] )
+    if loadNumpy():
+        packed = numpy.zeros(len(rows), dtype=[("version","u1"),("siz","u1"),("hp","u1"),("vp","u1"),("lat",">u4"),("lon",">u4"),("alt",">u4")])
+        for field, col in (("siz", 4), ("hp", 5), ("vp", 6)):
+            packed[field] = [ sizes[r[col]] for r in rows ]
+        for field, values in (("lat", lat), ("lon", lon)):
+            sign = numpy.array([ v[0] for v in values ], dtype=numpy.float64)
+            ms = numpy.array([ v[1] for v in values ], dtype=numpy.float64)
+            packed[field] = numpy.trunc(midpoint + sign * ms)
+        altcm = (numpy.trunc(numpy.array(alt, dtype=numpy.float64)).astype(numpy.int64) + 100000) * 100
+        if len(rows) and (altcm.min() < 0 or altcm.max() > 0xffffffff):
+            raise ValueError("altitude out of range")
+        packed["alt"] = altcm
+        data = packed.tobytes()
+        return( [ data[i * 16:i * 16 + 16] for i in range(len(rows)) ] )
+    output = []
+    for i, r in enumerate(rows):
+        rdata = bytearray(b'\0')
+        rdata += bytes([ sizes[r[4]], sizes[r[5]], sizes[r[6]] ])
+        for sign, ms in (lat[i], lon[i]):
+            rdata += int(midpoint + sign * ms).to_bytes(4, "big")
+        rdata += ((int(alt[i]) + 100000) * 100).to_bytes(4, "big")
+        output.append( bytes(rdata) )
+    return( output )
+
+def locBulkRecords( lines, ttl ):
+    ## yields one tinydns line per CSV row, encoding BATCH_SIZE rows at a time
+    rows = locCsvRows( lines )
+    while True:
+        batch = list(itertools.islice(rows, BATCH_SIZE))
+        if not batch:
+            return
+        for row, rdata in zip(batch, locBatchRdata( batch )):
+            yield( tinyLine( row[0], 29, rdata, row[7] or ttl, 16 ) )
+
+@statsOptions
+@outputOptions
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    domain = "example.com"
+    d1 = "0"
+    m1 = "0"
+    s1 = "0.0"
+    l1 = "N"
+    d2 = "0"
+    m2 = "0"
+    s2 = "0.0"
+    l2 = "W"
+    alt = "0.00"
+    siz = "0.00"
+    hp = "0.00"
+    vp = "0.00"
+    ttl = "86400"
+    bulkfile = ""
+
+    opts, args = getopt.getopt(argv,"hd:l:f:",["help","file=","domain=","d1=","m1=","s1=","l1=","d2=","m2=","s2=","l2=","alt=","siz=","hp=","vp=","ttl="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: tinyloc.py --domain example.com --d1 51 --m1 30 --s1 3.637 --l1 N --d2 0 --m2 8 --s2 29.624 --l2 W')
+            print('  --domain domain-name')
+            print('  --d1 0-90 (degrees lat)')
+            print('  --m1 0-59 (minutes lat)')
+            print('  --s1 0-59.999 (seconds lat)')
+            print('  --l1 direction ("N"/"S)')
+            print('  --d2 0-90 (degrees lon)')
+            print('  --m2 0-59 (minutes lon)')
+            print('  --s2 0-59.999 (seconds lon)')
+            print('  --l2 direction ("E"/"W")')
+            print('  --alt -100000.00 - 42849672.95m (altitude in m)')
+            print('  --siz 0 .. 90000000.00m (size)')
+            print('  --hp 0 .. 90000000.00m (horizonal precision)')
+            print('  --vp 0 .. 90000000.00m (vertical precision)')
+            print('  --ttl int (dns ttl)')
+            print('  --file csv (bulk mode, rows of fqdn,lat,lon,alt,siz,hp,vp[,ttl], "-" for stdin)')
+            print('  --stats, --stats-json file, --profile file (report run statistics, see tinystats.py)')
+            print('  --compact (write the shortest escaping tinydns-data accepts, report bytes saved)')
+            print('  --shards N or --shard-zones list, --shard-prefix path, --shard-only names (write to fragment files, see tinyshard.py)')
+            return( 0 )
+        elif opt in ("-d", "--domain"):
+            domain = arg
+        elif opt in ("--d1"):
+            d1 = arg
+        elif opt in ("--m1"):
+            m1 = arg
+        elif opt in ("--s1"):
+            s1 = arg
+        elif opt in ("--l1"):
+            l1 = arg
+        elif opt in ("--d2"):
+            d2 = arg
+        elif opt in ("--m2"):
+            m2 = arg
+        elif opt in ("--s2"):
+            s2 = arg
+        elif opt in ("--l2"):
+            l2 = arg
+        elif opt in ("--alt"):
+            alt = arg
+        elif opt in ("--siz"):
+            siz = arg
+        elif opt in ("--hp"):
+            hp = arg
+        elif opt in ("--vp"):
+            vp = arg
+        elif opt in ("-l", "--ttl"):
+            ttl = arg
+        elif opt in ("-f", "--file"):
+            bulkfile = arg
+
+    if bulkfile:
+        if bulkfile == "-":
+            infile = sys.stdin
+        else:
+            infile = open(bulkfile, "r", newline="")
+        statsStage( "write" )
+        with outputStream() as out:
+            for line in statsOutput( locBulkRecords( statsTimed( "read", infile ), ttl ) ):
+                out.write( line + "\n" )
+        return( 0 )
+
+    statsStage( "encode" )
+    line = tinyLocRecord( domain, d1, m1, s1, l1, d2, m2, s2, l2, alt, siz, hp, vp, ttl )
+    statsStage( "write" )
+    statsCount( line )
+    with outputStream() as out:
+        out.write( line + "\n" )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -0,0 +1,107 @@
+# tinyname - wire format domain names for SRV and SVCB/HTTPS targets
+#
+# example: from tinyname import wireName, escapedName
+#          wireName( "example.com" )     ->  b"\x07example\x03com\x00"
+#          escapedName( "example.com" )  ->  "\007example\003com\000"
+#          wireName( "a\\.b.example." )  ->  b"\x03a.b\x07example\x00"
+#
+# Names are read as in a zone file (RFC 1035 section 5.1): "\." is a dot
+# inside a label, "\DDD" is the byte with decimal value DDD, and "\" before any
+# other character stands for that character. A trailing dot is allowed, "." is
+# the root, and empty labels, labels over 63 octets and names over 255 octets
+# are rejected with a ValueError.
+#
+# Targets come from a few hundred hostnames however many records there are,
+# so both forms are kept in bounded caches keyed by the name as given.
+
+import functools
+from tinybytes import tinyBytes
+
+## distinct target names kept
+NAME_CACHE_SIZE = 4096
+
+## byte -> its presentation form, the inverse of nameLabels
+PRESENT_TABLE = tuple(
+    chr(b) if b > 32 and b < 127 and b not in (46,92) else "\\" + chr(b) if b in (46,92) else "\\{0:03d}".format(b)
+    for b in range(256)
+)
+
+def escapedLabels( name ):
+    ## returns the labels of a name containing backslash escapes, the last one
+    ## empty if the name ends with an unescaped dot
+    labels = []
+    label = bytearray(b'')
+    i = 0
+    while i < len(name):
+        c = name[i]
+        if c == ".":
+            labels.append( bytes(label) )
+            label = bytearray(b'')
+        elif c != "\\":
+            label += bytes(c, "ascii")
+        elif len(name[i + 1:i + 4]) == 3 and all( d in "0123456789" for d in name[i + 1:i + 4] ):
+            value = int(name[i + 1:i + 4])
+            if value > 255:
+                raise ValueError("escape \\" + name[i + 1:i + 4] + " is over 255 in " + name)
+            label.append( value )
+            i += 3
+        elif i + 1 < len(name):
+            label += bytes(name[i + 1], "ascii")
+            i += 1
+        else:
+            raise ValueError("name ends with a backslash: " + name)
+        i += 1
+    labels.append( bytes(label) )
+    return( labels )
+
+def nameLabels( name ):
+    ## returns the labels of a name as bytes, [] for the root
+    if name in ("", "."):
+        return( [] )
+    if "\\" in name:
+        labels = escapedLabels( name )
+    else:
+        labels = [ bytes(label, "ascii") for label in name.split(".") ]
+    if len(labels) > 1 and labels[-1] == b'':
+        labels.pop()
+    for label in labels:
+        if not label:
+            raise ValueError("empty label in " + name)
+        if len(label) > 63:
+            raise ValueError("label longer than 63 octets in " + name)
+    return( labels )
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def wireName( name ):
+    ## if input "example.com", output should be b"\x07example\x03com\x00"
+    ## if input ".", output should be b"\x00"
+    outbytes = bytearray(b'')
+    for label in nameLabels( name ):
+        outbytes.append( len(label) )
+        outbytes += label
+    outbytes.append( 0 )
+    if len(outbytes) > 255:
+        raise ValueError("name longer than 255 octets: " + name)
+    return( bytes(outbytes) )
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def escapedName( name ):
+    ## returns tinyBytes( wireName( name ) ), cached per name
+    return( tinyBytes( wireName( name ) ) )
+
+def presentLabel( label ):
+    ## returns a label's bytes in presentation form, with "." and "\" escaped
+    return( "".join([ PRESENT_TABLE[b] for b in label ]) )
+
+def presentName( name ):
+    ## returns a name in one canonical presentation form, without a trailing dot
+    ## so "Dir\.1.example.com." and "Dir\046\049.example.com" come out the same
+    return( ".".join([ presentLabel( label ) for label in nameLabels( name ) ]) or "." )
+
+def nameCacheStats():
+    ## returns hit and miss counts for the name caches
+    output = {}
+    for name, func in (("wire", wireName), ("escaped", escapedName)):
+        info = func.cache_info()
+        output[name] = { "hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize }
+    return( output )
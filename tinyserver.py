@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+# tinyserver - resident record generator listening on a Unix domain socket
+#
+# example: ./tinyserver.py --socket /run/tinyserver.sock &
+#          echo '{"type": "caa", "fields": ["example.com", "0", "issue", "ca.example.net"]}' \
+#              | ./tinyserver.py --socket /run/tinyserver.sock --client
+#          {"line": ":example.com:257:\\000\\005issueca.example.net:86400"}
+#
+# Each request is one line of JSON naming a record type and the builder's
+# fields, in the same order as a tinygen.py manifest row, with an optional
+# "ttl" and an optional "id" that is echoed back. Each response is one line of
+# JSON holding either "line" (the tinydns data line) or "error".
+#
+# Clients may pipeline: requests on a connection are answered in order, and
+# any number of clients can be connected at once. A request line over 64 KiB
+# gets an error response and the connection is closed.
+
+import sys
+import json
+from tinygen import BUILDERS, manifestRow, buildRow
+
+## longest request line, the asyncio stream reader's default limit
+REQUEST_LIMIT = 1 << 16
+
+def handleRequest( text, ttl ):
+    ## returns the JSON response line for one JSON request line
+    response = {}
+    try:
+        request = json.loads(text)
+        if "id" in request:
+            response["id"] = request["id"]
+        fields = [ str(f) for f in request.get("fields", []) ]
+        rtype, args, rowttl = manifestRow( [str(request.get("type", ""))] + fields, str(request.get("ttl", ttl)) )
+        response["line"] = buildRow( rtype, args, rowttl )
+    ## a bad request gets an error response, the connection stays open
+    except KeyError as e:
+        response["error"] = "KeyError: " + str(e)
+    except (ValueError, TypeError, AttributeError, OverflowError) as e:
+        response["error"] = str(e)
+    return( json.dumps(response) + "\n" )
+
+async def serveClient( reader, writer, ttl ):
+    try:
+        while True:
+            try:
+                text = await reader.readline()
+            except ValueError:
+                ## a line over the stream limit cannot be resynchronised,
+                ## so it gets an error and the connection is closed
+                writer.write( (json.dumps({"error": "request line longer than " + str(REQUEST_LIMIT) + " bytes"}) + "\n").encode("utf-8") )
+                break
+            if not text:
+                break
+            if not text.strip():
+                continue
+            writer.write( handleRequest( text, ttl ).encode("utf-8") )
+            ## only wait for the client when the write buffer is full,
+            ## so pipelined requests are answered without a round trip each
+            if writer.transport.get_write_buffer_size() > 1 << 16:
+                await writer.drain()
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def runServer( path, ttl ):
+    ## a socket left by an earlier run is replaced, anything else at path is refused
+    import os
+    import stat
+    import asyncio
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        mode = None
+    if mode is not None:
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(path + " exists and is not a socket")
+        os.unlink(path)
+    server = await asyncio.start_unix_server(lambda r, w: serveClient( r, w, ttl ), path=path, limit=REQUEST_LIMIT)
+    async with server:
+        await server.serve_forever()
+
+def queryServer( path, lines, window=256 ):
+    ## small blocking client: pipelines the request lines, yielding responses in order
+    ## at most window requests are sent ahead of their responses, so neither
+    ## side can fill its socket buffer while the other is not reading
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        with sock.makefile("r", encoding="utf-8") as responses:
+            pending = 0
+            batch = []
+            for line in lines:
+                if not line.strip():
+                    continue
+                batch.append( line.rstrip("\n") + "\n" )
+                if pending + len(batch) >= window:
+                    sock.sendall( "".join(batch).encode("utf-8") )
+                    pending += len(batch)
+                    batch = []
+                    while pending > window // 2:
+                        yield( responses.readline().rstrip("\n") )
+                        pending -= 1
+            sock.sendall( "".join(batch).encode("utf-8") )
+            pending += len(batch)
+            sock.shutdown(socket.SHUT_WR)
+            for n in range(pending):
+                yield( responses.readline().rstrip("\n") )
+
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    path = "tinyserver.sock"
+    ttl = "86400"
+    client = False
+
+    opts, args = getopt.getopt(argv,"hs:l:c",["help","socket=","ttl=","client"])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: tinyserver.py --socket /run/tinyserver.sock [--ttl 86400]')
+            print('       tinyserver.py --socket /run/tinyserver.sock --client < requests.jsonl')
+            print('  --socket path (unix domain socket to listen on or connect to)')
+            print('  --ttl int (dns ttl for requests without one)')
+            print('  --client (send JSON request lines from stdin, print the responses)')
+            print('  record types: ' + " ".join(BUILDERS))
+            return( 0 )
+        elif opt in ("-s", "--socket"):
+            path = arg
+        elif opt in ("-l", "--ttl"):
+            ttl = arg
+        elif opt in ("-c", "--client"):
+            client = True
+
+    if client:
+        for line in queryServer( path, sys.stdin ):
+            sys.stdout.write( line + "\n" )
+        return( 0 )
+
+    import asyncio
+    try:
+        asyncio.run( runServer( path, ttl ) )
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        sys.stderr.write( "tinyserver: " + str(e) + "\n" )
+        return( 1 )
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -0,0 +1,290 @@
+# tinyshard - where the generators write: stdout, or fragment files by owner name
+#
+# example: ./tinygen.py --shards 8 --shard-prefix out/data manifest.txt
+#          ./tinycaa.py --policy policy.txt --shard-zones example.com,example.net < domains.txt
+#          ./tinygen.py --shards 8 --shard-prefix out/data --shard-only 3 manifest.txt
+#
+# Every generator takes these options, through the @outputOptions decorator,
+# and writes its records to fragment files instead of stdout:
+#
+#   --shards N            N files, <prefix>.0 to <prefix>.N-1, picked by a
+#                         crc32 of the owner name (lower case, escapes read)
+#   --shard-zones list    one file per zone, <prefix>.<zone>, picked by the
+#                         longest zone the owner is in, and <prefix>.other
+#                         for the rest; list is comma separated, or a file
+#                         with one zone per line
+#   --shard-prefix path   file name prefix, default "data"
+#   --shard-only names    only write these shards (eg "3" or "example.com"),
+#                         leaving the other files as they are
+#
+# Bad values, eg "--shards 0" or a --shard-only name that is not a shard, are
+# reported on stderr before the generator runs. A shard file that cannot be
+# created is reported the same way, and the ones already created are removed.
+#
+# A record always lands in the same shard, so each shard can go through
+# tinydns-data or rsync on its own and be regenerated alone with --shard-only.
+# Shards are written to "<file>.tmp" through large buffers and renamed into
+# place when the run succeeds; if it fails, the old files are left untouched.
+# Every shard is rewritten, even if empty, so a shard that lost all its
+# records does not keep stale ones. Comment and blank lines follow the record
+# before them. tinygen --diff, --cdb, --verify and --watch keep their own
+# outputs and are not sharded.
+#
+# @outputOptions also takes --compact, which rewrites every line written to
+# stdout or the shards with the shortest escaping tinydns-data accepts (see
+# tinybytes.py) and reports the bytes saved on stderr, or as
+# compact_saved_bytes in the --stats report. tinygen --watch output is
+# compacted too; tinygen --diff prints lines as they are built.
+
+import os
+import sys
+import zlib
+import functools
+import tinybytes
+from tinystats import statsCompacted
+
+## set by @outputOptions: ShardWriter arguments, or None for stdout
+SHARDING = None
+
+## write buffer per shard file
+SHARD_BUFFER = 1 << 20
+
+SHARD_OPTIONS = ("--shards", "--shard-zones", "--shard-prefix", "--shard-only")
+
+def normalOwner( owner ):
+    ## returns an owner field in lower case with escapes read, so every
+    ## spelling of a name agrees
+    if "\\" in owner:
+        from tinydata import unescapeBytes
+        owner = unescapeBytes( owner.encode("latin-1") ).decode("latin-1")
+    return( owner.lower().rstrip(".") )
+
+def readZones( text ):
+    ## returns the zones from a comma separated list, or a file of one per line
+    if os.path.isfile(text):
+        with open(text, "r") as infile:
+            zones = [ line.strip() for line in infile if line.strip() and not line.startswith("#") ]
+    else:
+        zones = text.split(",")
+    return( [ zone.strip().lower().rstrip(".") for zone in zones if zone.strip() ] )
+
+def shardNames( shards=0, zones=(), only=() ):
+    ## returns the names of the shards, checking the ShardWriter arguments
+    if zones:
+        names = sorted(set(zones)) + ["other"]
+    elif shards > 0:
+        names = [ str(i) for i in range(shards) ]
+    else:
+        raise ValueError("sharding needs --shards N, with N at least 1, or --shard-zones")
+    unknown = set(only) - set(names)
+    if unknown:
+        raise ValueError("no shard named " + unknown.pop())
+    return( names )
+
+class ShardError( OSError ):
+    ## a shard file could not be opened; @outputOptions reports it on stderr
+    pass
+
+class ShardWriter:
+
+    def __init__( self, prefix="data", shards=0, zones=(), only=() ):
+        names = shardNames( shards, zones, only )
+        self.prefix = prefix
+        self.shards = shards
+        self.zones = set(zones)
+        self.files = {}
+        ## if one shard cannot be opened, the ones already open are removed
+        try:
+            for name in names:
+                if only and name not in only:
+                    self.files[name] = None
+                else:
+                    self.files[name] = open(self.path( name ) + ".tmp", "w", buffering=SHARD_BUFFER)
+        except OSError as e:
+            self.abort()
+            raise ShardError( e.errno, e.strerror, e.filename ) from e
+        self.last = self.files[names[0]]
+        self.lastowner = None
+        self.partial = ""
+
+    def path( self, name ):
+        return( self.prefix + "." + name )
+
+    def route( self, owner ):
+        ## returns the name of the shard for a normalOwner() name
+        if not self.zones:
+            return( str(zlib.crc32(owner.encode("latin-1")) % self.shards) )
+        ## longest zone first: try the owner, then each of its parents
+        while True:
+            if owner in self.zones:
+                return( owner )
+            dot = owner.find(".")
+            if dot < 0:
+                return( "other" )
+            owner = owner[dot + 1:]
+
+    def write( self, text ):
+        ## a line is routed when its newline arrives, or on close
+        if self.partial:
+            text = self.partial + text
+            self.partial = ""
+        if text.find("\n") == len(text) - 1:
+            lines = (text,)
+        else:
+            lines = text.split("\n")
+            self.partial = lines.pop()
+            lines = [ line + "\n" for line in lines ]
+        for line in lines:
+            self.writeLine( line )
+
+    def writeLine( self, line ):
+        ## generators write a name's records together, so the shard is only
+        ## looked up again when the owner field changes
+        end = line.find(":", 1)
+        if end > 0 and line[0] != "#":
+            owner = line[1:end]
+            if owner != self.lastowner:
+                self.lastowner = owner
+                self.last = self.files[self.route( normalOwner( owner ) )]
+        if self.last is not None:
+            self.last.write( line )
+
+    def close( self ):
+        ## writes out a last line without a newline, and renames every
+        ## written shard into place
+        if self.partial:
+            self.writeLine( self.partial )
+            self.partial = ""
+        for name, outfile in self.files.items():
+            if outfile is not None:
+                outfile.close()
+                os.replace(self.path( name ) + ".tmp", self.path( name ))
+
+    def abort( self ):
+        for name, outfile in self.files.items():
+            if outfile is not None:
+                outfile.close()
+                os.unlink(self.path( name ) + ".tmp")
+
+    def __enter__( self ):
+        return( self )
+
+    def __exit__( self, exc_type, exc, tb ):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class CompactWriter:
+
+    ## rewrites whole lines in compact form on their way to another stream
+    ## a line written in pieces is held back until its newline arrives
+    def __init__( self, out ):
+        self.out = out
+        self.partial = ""
+
+    def write( self, text ):
+        if self.partial:
+            text = self.partial + text
+            self.partial = ""
+        end = text.rfind("\n") + 1
+        if end < len(text):
+            self.partial = text[end:]
+            text = text[:end]
+        compact = tinybytes.compactText( text )
+        statsCompacted( text, compact )
+        self.out.write( compact )
+
+    def __enter__( self ):
+        self.out.__enter__()
+        return( self )
+
+    def __exit__( self, exc_type, exc, tb ):
+        if exc_type is None and self.partial:
+            text = self.partial
+            self.partial = ""
+            compact = tinybytes.compactText( text )
+            statsCompacted( text, compact )
+            self.out.write( compact )
+        return( self.out.__exit__( exc_type, exc, tb ) )
+
+def splitOptions( argv ):
+    ## returns (remaining argv, ShardWriter arguments or None, compact)
+    rest = []
+    sharding = {}
+    compact = False
+    args = iter(argv)
+    for arg in args:
+        name, eq, value = arg.partition("=")
+        if arg == "--":
+            rest.append( arg )
+            rest.extend( args )
+        elif arg == "--compact":
+            compact = True
+        elif name in SHARD_OPTIONS:
+            if not eq:
+                value = next(args, "")
+            if not value:
+                raise ValueError(name + " needs a value")
+            if name == "--shards":
+                if not value.isdigit():
+                    raise ValueError("--shards needs a number, not " + value)
+                sharding["shards"] = int(value)
+            elif name == "--shard-zones":
+                sharding["zones"] = readZones( value )
+            elif name == "--shard-prefix":
+                sharding["prefix"] = value
+            else:
+                sharding["only"] = value.split(",")
+        else:
+            rest.append( arg )
+    if sharding:
+        shardNames( sharding.get("shards", 0), sharding.get("zones", ()), sharding.get("only", ()) )
+    return( rest, sharding or None, compact )
+
+def stdoutStream():
+    ## stdout through a large buffer
+    return( open(sys.stdout.fileno(), "w", buffering=1 << 16, closefd=False) )
+
+def outputStream():
+    ## where a generator writes its records: shard files if sharding was asked
+    ## for, stdout otherwise; use as "with outputStream() as out:"
+    if SHARDING is None:
+        out = stdoutStream()
+    else:
+        out = ShardWriter( **SHARDING )
+    if tinybytes.COMPACT:
+        return( CompactWriter( out ) )
+    return( out )
+
+def outputOptions( main ):
+    ## decorator for a script's main( argv=None ) adding --compact and the --shard options
+    ## goes under @statsOptions, so the stats report sees the compacted output
+    name = main.__module__ if main.__module__ != "__main__" else sys.argv[0].rsplit("/", 1)[-1].rsplit(".", 1)[0]
+
+    @functools.wraps(main)
+    def wrapper( argv=None ):
+        global SHARDING
+        if argv is None:
+            argv = sys.argv[1:]
+        try:
+            rest, sharding, compact = splitOptions( argv )
+        except ValueError as e:
+            sys.stderr.write( name + ": " + str(e) + "\n" )
+            return( 1 )
+        SHARDING = sharding
+        if compact:
+            tinybytes.setCompact()
+            tinybytes.SAVED = 0
+        try:
+            return( main( rest ) )
+        except ShardError as e:
+            sys.stderr.write( name + ": " + str(e) + "\n" )
+            return( 1 )
+        finally:
+            SHARDING = None
+            if compact:
+                sys.stderr.write( "{0} compact: {1} bytes saved\n".format(name, tinybytes.SAVED) )
+                tinybytes.setCompact( False )
+
+    return( wrapper )
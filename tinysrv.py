@@ -9,40 +9,31 @@
 # 2022 Lee Maguire
 
 import sys
-import getopt
-
-domain = "example.com"
-service = "ldap"
-proto = "tcp"
-priority = 10
-weight = 20
-port = 389
-target = "dir.example.com"
-ttl = "86400"
+from tinybytes import tinyLine
+from tinyname import wireName
+from tinystats import statsOptions, statsStage, statsCount
+from tinyshard import outputStream, outputOptions
 
 def tinySrvRecord( domain, service, proto, priority, weight, port, target, ttl ):
-    output = ":"
+    ## priority, weight and port are written as \nnn codes
+    owner, numbers, name = srvParts( domain, service, proto, priority, weight, port, target )
+    return( tinyLine( owner, 33, numbers, ttl, 6, (name,) ) )
+
+def srvRdata( domain, service, proto, priority, weight, port, target ):
+    ## returns the owner name and raw rdata bytes of the record tinySrvRecord describes
+    owner, numbers, name = srvParts( domain, service, proto, priority, weight, port, target )
+    return( owner, numbers + name )
+
+def srvParts( domain, service, proto, priority, weight, port, target ):
+    ## returns the owner name, and the rdata as its fixed width numbers and
+    ## the target name, which is kept apart as it repeats across records
     srvdomain = "_" + service + "._" + proto + "." + domain
-    output += tinyBytes( bytes(srvdomain, "ascii") )
-    output += ":33:"
-    output += tinyBytes( nboInt(2, priority), True )
-    output += tinyBytes( nboInt(2, weight), True )
-    output += tinyBytes( nboInt(2, port), True )
+    outbytes = bytearray(b'')
+    outbytes += nboInt(2, priority)
+    outbytes += nboInt(2, weight)
+    outbytes += nboInt(2, port)
     ## it's not clear from the RFC that the target should be length prefixed labels
-    output += tinyBytes( lengthPrefixedLabels(target) )
-    output += ":" + ttl
-    return( output )
-
-def tinyBytes( bytearr, encode_all=False ):
-    ## output printable ascii (but not space, "/", ":", "\")
-    ## all other characters output as octal \nnn codes
-    output = ""
-    for b in bytearr:
-        if not encode_all and b > 32 and b < 127 and b not in [47,58,92]:
-            output += chr(b)
-        else:
-            output += "\\{0:03o}".format(b)
-    return( output )
+    return( srvdomain, bytes(outbytes), wireName( target ) )
 
 def nboInt( length, number ):
     ## returns bytes representing an integer in network byte order (big endian)
@@ -53,46 +44,65 @@ def nboInt( length, number ):
 def lengthPrefixedLabels( domain ):
     ## if input "example.com", output should be "\007example\003com\000"
     ## if input ".", output should be "\000"
-    ## TODO: account for pre-escaped text
-    outbytes = bytearray(b'')
-    if len(domain) > 1:
-        for label in domain.split("."):
-            outbytes += nboInt(1, len(label))
-            outbytes += bytes(label, "ascii")
-    outbytes += nboInt(1, 0)
-    return( outbytes )
+    ## kept for callers of the old name, see tinyname.wireName
+    return( bytearray(wireName( domain )) )
+
+@statsOptions
+@outputOptions
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    domain = "example.com"
+    service = "ldap"
+    proto = "tcp"
+    priority = 10
+    weight = 20
+    port = 389
+    target = "dir.example.com"
+    ttl = "86400"
+
+    opts, args = getopt.getopt(argv,"hd:s:p:t:l:",["help","domain=","service=","proto=","priority=","weight=","port=","target=","ttl="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: tinysrv.py --domain example.com --service ldap --proto tcp --priority 10 --weight 20 --port 389 --target dir.example.com')
+            print('  --domain domain-name')
+            print('  --service service-name (eg "ldap")')
+            print('  --proto protocol ("tcp" or "udp")')
+            print('  --priority int (eg 1)')
+            print('  --weight int (eg 10)')
+            print('  --port int (eg 389)')
+            print('  --target hostname (service hostname)')
+            print('  --ttl int (dns ttl)')
+            print('  --stats, --stats-json file, --profile file (report run statistics, see tinystats.py)')
+            print('  --compact (write the shortest escaping tinydns-data accepts, report bytes saved)')
+            print('  --shards N or --shard-zones list, --shard-prefix path, --shard-only names (write to fragment files, see tinyshard.py)')
+            return( 0 )
+        elif opt in ("-d", "--domain"):
+            domain = arg
+        elif opt in ("--service"):
+            service = arg
+        elif opt in ("--proto"):
+            proto = arg
+        elif opt in ("-p", "--priority"):
+            priority = arg
+        elif opt in ("--weight"):
+            weight = arg
+        elif opt in ("--port"):
+            port = arg
+        elif opt in ("-t", "--target"):
+            target = arg
+        elif opt in ("-l", "--ttl"):
+            ttl = arg
 
-opts, args = getopt.getopt(sys.argv[1:],"hd:s:p:t:l:",["help","domain=","service=","proto=","priority=","weight=","port=","target=","ttl="])
-for opt, arg in opts:
-    if opt in ("-h", "--help"):
-        print('Usage: tinysrv.py --domain example.com --service ldap --proto tcp --priority 10 --weight 20 --port 389 --target dir.example.com')
-        print('  --domain domain-name')
-        print('  --service service-name (eg "ldap")')
-        print('  --proto protocol ("tcp" or "udp")')
-        print('  --priority int (eg 1)')
-        print('  --weight int (eg 10)')
-        print('  --port int (eg 389)')
-        print('  --target hostname (service hostname)')
-        print('  --ttl int (dns ttl)')
-        sys.exit()
-    elif opt in ("-d", "--domain"):
-        domain = arg
-    elif opt in ("--service"):
-        service = arg
-    elif opt in ("--proto"):
-        proto = arg
-    elif opt in ("-p", "--priority"):
-        priority = arg
-    elif opt in ("--weight"):
-        weight = arg
-    elif opt in ("--port"):
-        port = arg
-    elif opt in ("-t", "--target"):
-        target = arg
-    elif opt in ("-l", "--ttl"):
-        ttl = arg
+    statsStage( "encode" )
+    line = tinySrvRecord( domain, service, proto, priority, weight, port, target, ttl )
+    statsStage( "write" )
+    statsCount( line )
+    with outputStream() as out:
+        out.write( line + "\n" )
 
-line = tinySrvRecord( domain, service, proto, priority, weight, port, target, ttl )
-sys.stdout.write( line + "\n")
+    return( 0 )
 
-sys.exit(0)
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -4,25 +4,43 @@
 #
 # example: ssh-keygen -r example.com | ./tinysshfp.py 
 #
+# or reads OpenSSH public keys directly, without running ssh-keygen:
+#   ./tinysshfp.py -d host.example.com -k /etc/ssh/ssh_host_ed25519_key.pub
+#   ./tinysshfp.py -k ~/.ssh/known_hosts
+#   ./tinysshfp.py -j 8 -k /srv/hostkeys
+# a directory is searched for *.pub files; "<dir>/host.example.com.pub" is for
+# host.example.com, as is "<dir>/host.example.com/ssh_host_rsa_key.pub"; other
+# key files, eg /etc/ssh/ssh_host_rsa_key.pub, need -d. known_hosts entries for
+# IP addresses or for a port other than 22 are skipped with a notice on stderr.
+#
 # https://www.rfc-editor.org/rfc/rfc4255
+# https://www.rfc-editor.org/rfc/rfc6594 (SHA-256, ECDSA)
+# https://www.rfc-editor.org/rfc/rfc7479 (Ed25519)
+# https://www.rfc-editor.org/rfc/rfc8709 (Ed448)
 # 2017,2022 Lee Maguire
 
-import getopt
 import sys
-import re
+import os
+from tinybytes import tinyLine
+from tinystats import statsOptions, statsStage, statsTimed, statsCount
+from tinyshard import outputStream, outputOptions
 
-ttl = "86400"
+## OpenSSH key type -> SSHFP algorithm number
+ALGORITHMS = {
+    "ssh-rsa": 1,
+    "ssh-dss": 2,
+    "ecdsa-sha2-nistp256": 3,
+    "ecdsa-sha2-nistp384": 3,
+    "ecdsa-sha2-nistp521": 3,
+    "ssh-ed25519": 4,
+    "ssh-ed448": 6,
+}
 
-def tinyBytes( bytearr, escape_all=False ):
-    ## output printable ascii but not space, "/", ":", "\"
-    ## all other characters output as octal \nnn codes
-    output = ""
-    for b in bytearr:
-        if not escape_all and int(b) > 32 and int(b) < 127 and int(b) not in [47,58,92]:
-            output += chr(b)
-        else:
-            output += "\\{0:03o}".format(b)
-    return( output )
+## SSHFP fingerprint type -> hashlib name
+FPTYPES = {
+    1: "sha1",
+    2: "sha256",
+}
 
 def nboInt( length, number ):
     ## returns bytes representing an integer in network byte order (big endian)
@@ -31,27 +49,191 @@ def nboInt( length, number ):
     return( intbytes )
 
 def tinySshfpRecord( hostname, algid, fptype, fp, ttl ):
-    output = ""
-    output += ":"
-    output += tinyBytes(bytes(hostname, "ascii"))
-    output += ":44:"
-    output += tinyBytes( nboInt(1,algid) )
-    output += tinyBytes( nboInt(1,fptype) )
-    output += tinyBytes( bytes.fromhex(fp), True )
-    output += ":" + ttl
-    return( output );
-
-opts, args = getopt.getopt(sys.argv[1:],"ht:",["ttl="])
-for opt, arg in opts:
-    if opt == '-h':
-        print('Usage: tinysshfp.py -t 60')
-        sys.exit()
-    elif opt in ("-t", "--ttl"):
-        ttl = arg
-
-for input_text in sys.stdin:
-    hostname,xin,xsshfp,algid,fptype,fp = input_text.rstrip().split(" ")
-    line = tinySshfpRecord( hostname, algid, fptype, fp, ttl )
-    sys.stdout.write( line + "\n")
-
-sys.exit(0)
+    ## every byte is written as a \nnn code; algorithm and type numbers are
+    ## all below 32, so they would be anyway
+    owner, rdata = sshfpRdata( hostname, algid, fptype, fp )
+    return( tinyLine( owner, 44, rdata, ttl, len(rdata) ) )
+
+def sshfpRdata( hostname, algid, fptype, fp ):
+    ## returns the owner name and raw rdata bytes of the record tinySshfpRecord describes
+    outbytes = bytearray(b'')
+    outbytes += nboInt(1,algid)
+    outbytes += nboInt(1,fptype)
+    outbytes += bytes.fromhex(fp)
+    return( hostname, bytes(outbytes) )
+
+def keyFingerprints( keytype, blob, fptypes=(1,2) ):
+    ## returns a list of (algid, fptype, hex fingerprint) for a base64 key blob
+    ## the fingerprint is a hash of the decoded key, as in "ssh-keygen -r"
+    import base64
+    import hashlib
+    key = base64.b64decode(blob)
+    ## the blob starts with its own length-prefixed key type, which must agree
+    namelen = int.from_bytes(key[0:4], "big")
+    if key[4:4 + namelen] != bytes(keytype, "ascii"):
+        raise ValueError("key blob does not match key type " + keytype)
+    output = []
+    for fptype in fptypes:
+        fp = hashlib.new(FPTYPES[fptype], key).hexdigest()
+        output.append( (ALGORITHMS[keytype], fptype, fp) )
+    return( output )
+
+def parseKeyLine( line ):
+    ## returns (hostnames, keytype, blob) for a *.pub or known_hosts line, or None
+    ## hostnames is None for a *.pub line, which does not name its host
+    fields = line.split()
+    if len(fields) >= 2 and fields[0] in ALGORITHMS:
+        return( None, fields[0], fields[1] )
+    if len(fields) >= 3 and fields[1] in ALGORITHMS and not fields[0].startswith("@"):
+        hostnames = []
+        for host in fields[0].split(","):
+            if host.startswith("|") or host.startswith("!"):
+                continue ## hashed or negated entries have no usable name
+            if host.startswith("["):
+                host, bracket, port = host[1:].partition("]")
+                if port not in ("", ":22"):
+                    ## SSHFP has no port, so a key for another port would
+                    ## be published as the host's own
+                    sys.stderr.write( "tinysshfp: skipping " + host + port + ", SSHFP records are for port 22\n" )
+                    continue
+            if "*" in host or "?" in host:
+                continue
+            if isAddress( host ):
+                sys.stderr.write( "tinysshfp: skipping address " + host + ", SSHFP records need a host name\n" )
+                continue
+            hostnames.append( host )
+        return( hostnames, fields[1], fields[2] )
+    return( None )
+
+def isAddress( host ):
+    ## True for an IPv4 or IPv6 literal, which known_hosts allows but DNS
+    ## cannot use as an owner name
+    if ":" in host:
+        return( True )
+    from tinyaddr import packIPv4
+    try:
+        packIPv4( host )
+    except ValueError:
+        return( False )
+    return( True )
+
+def pubKeyHostname( path ):
+    ## "host.example.com.pub" or "host.example.com/ssh_host_rsa_key.pub"
+    ## any other name, eg /etc/ssh/ssh_host_rsa_key.pub, needs --domain
+    name = os.path.basename(path)
+    if name.startswith("ssh_host_"):
+        name = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    elif name.endswith(".pub"):
+        name = name[:-len(".pub")]
+    if "." not in name:
+        raise ValueError("cannot tell the host of " + path + ", give it with --domain")
+    return( name )
+
+def keyFiles( paths ):
+    ## yields the key files named, searching directories for *.pub
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.endswith(".pub"):
+                        yield( os.path.join(dirpath, name) )
+        else:
+            yield( path )
+
+def keyFileRecords( path, hostname, fptypes, ttl ):
+    ## returns the tinydns lines for every key in one file
+    ## hostname is used for *.pub lines, known_hosts lines carry their own
+    output = []
+    with open(path, "r") as infile:
+        for line in infile:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parsed = parseKeyLine( line )
+            if parsed is None:
+                continue
+            hostnames, keytype, blob = parsed
+            if hostnames is None and not hostname:
+                hostname = pubKeyHostname( path )
+            for algid, fptype, fp in keyFingerprints( keytype, blob, fptypes ):
+                for host in hostnames if hostnames is not None else [hostname]:
+                    output.append( tinySshfpRecord( host, algid, fptype, fp, ttl ) )
+    return( output )
+
+def keyFileJob( args ):
+    ## worker entry point for parallel hashing
+    return( keyFileRecords( *args ) )
+
+@statsOptions
+@outputOptions
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    ttl = "86400"
+    keypaths = []
+    hostname = ""
+    fptypes = (1,2)
+    jobs = 1
+
+    opts, args = getopt.getopt(argv,"ht:k:d:f:j:",["ttl=","keys=","domain=","fptype=","jobs="])
+    for opt, arg in opts:
+        if opt == '-h':
+            print('Usage: tinysshfp.py -t 60 < ssh-keygen-r-output')
+            print('       tinysshfp.py -t 60 [-d hostname] [-f 2] [-j 4] -k keyfile-or-dir [-k ...]')
+            print('  -k path (*.pub file, known_hosts file, or a directory of *.pub files)')
+            print('  -d hostname (host for *.pub files, default from the file or directory name, which must have a dot)')
+            print('  -f int (fingerprint type, 1=SHA-1 2=SHA-256, default both)')
+            print('  -j int (hash key files in this many processes)')
+            print('  --stats, --stats-json file, --profile file (report run statistics, see tinystats.py)')
+            print('  --compact (write the shortest escaping tinydns-data accepts, report bytes saved)')
+            print('  --shards N or --shard-zones list, --shard-prefix path, --shard-only names (write to fragment files, see tinyshard.py)')
+            return( 0 )
+        elif opt in ("-t", "--ttl"):
+            ttl = arg
+        elif opt in ("-k", "--keys"):
+            keypaths.append( arg )
+        elif opt in ("-d", "--domain"):
+            hostname = arg
+        elif opt in ("-f", "--fptype"):
+            fptypes = (int(arg),)
+        elif opt in ("-j", "--jobs"):
+            jobs = int(arg)
+
+    if keypaths:
+        work = ( (path, hostname, fptypes, ttl) for path in keyFiles( keypaths ) )
+        statsStage( "write" )
+        try:
+            with outputStream() as out:
+                if jobs > 1:
+                    import multiprocessing
+                    with multiprocessing.Pool(jobs) as pool:
+                        for lines in statsTimed( "encode", pool.imap(keyFileJob, work, 16) ):
+                            for line in lines:
+                                statsCount( line )
+                                out.write( line + "\n" )
+                else:
+                    for lines in statsTimed( "encode", map(keyFileJob, work) ):
+                        for line in lines:
+                            statsCount( line )
+                            out.write( line + "\n" )
+        except ValueError as e:
+            sys.stderr.write( "tinysshfp: " + str(e) + "\n" )
+            return( 1 )
+        return( 0 )
+
+    statsStage( "write" )
+    with outputStream() as out:
+        for input_text in statsTimed( "read", sys.stdin ):
+            statsStage( "encode" )
+            hostname,xin,xsshfp,algid,fptype,fp = input_text.rstrip().split(" ")
+            line = tinySshfpRecord( hostname, algid, fptype, fp, ttl )
+            statsStage( "write" )
+            statsCount( line )
+            out.write( line + "\n" )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
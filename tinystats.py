@@ -0,0 +1,253 @@
+# tinystats - --stats and --profile options shared by the generator scripts
+#
+# example: ./tinycaa.py --stats --domain example.com
+#          ./tinyipv6.py -f hosts.txt --stats-json stats.json > data.ipv6
+#          ./tinygen.py --profile tinygen.prof manifest.txt > data.gen
+#
+# @statsOptions wraps a script's main(): it takes the options below out of the
+# argument list before the script's own getopt sees them.
+#
+#   --stats             report to stderr when the run ends
+#   --stats-json path   write the same report as JSON
+#   --profile path      run under cProfile and dump pstats data to path
+#                       (for flameprof, gprof2dot, snakeviz and the like)
+#
+# The report has the number of records and bytes written, how many rdata bytes
+# were written as escapes and the share of the output those escapes take up
+# (with --compact, measured on the compacted lines, see tinyshard.py), and
+# wall and CPU seconds for each stage of the run: setup, read, encode and
+# write. One clock is switched between stages as the run moves between them,
+# so the stages add up to the whole run. Streams are timed a batch of items at
+# a time, which keeps the cost of --stats to a few percent. CPU time is this process only; with
+# tinygen --jobs the workers' time shows up as encode wall time.
+#
+# Scripts mark stages with statsStage(), statsTimed() and statsOutput(), and
+# count lines they write themselves with statsCount() or statsBlock(); these
+# do nothing unless --stats or --stats-json was given.
+
+import sys
+import time
+import functools
+
+STAGES = ("setup", "read", "encode", "write")
+
+## the RunStats of the run in progress, None when stats are off
+ACTIVE = None
+
+## items pulled through statsTimed() per clock reading
+TIMED_BATCH = 256
+
+## compiled on first use by RunStats.compacted()
+COMPACT_ESCAPE_RE = None
+
+class RunStats:
+
+    def __init__( self ):
+        self.records = 0
+        self.bytes = 0
+        self.escapes = 0
+        self.escapechars = 0
+        self.saved = None
+        self.wall = dict.fromkeys(STAGES, 0.0)
+        self.cpu = dict.fromkeys(STAGES, 0.0)
+        self.stage = "setup"
+        self.wallmark = time.perf_counter()
+        self.cpumark = time.process_time()
+
+    def switch( self, stage ):
+        ## charges the time since the last switch to the current stage
+        ## and returns that stage, so the caller can switch back to it
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        previous = self.stage
+        self.wall[previous] += wall - self.wallmark
+        self.cpu[previous] += cpu - self.cpumark
+        self.stage = stage
+        self.wallmark = wall
+        self.cpumark = cpu
+        return( previous )
+
+    def timed( self, stage, items ):
+        ## yields items, charging the time spent producing them to stage
+        ## items are pulled TIMED_BATCH at a time, so the clocks are read
+        ## once per batch rather than once per item
+        items = iter(items)
+        while True:
+            batch = []
+            error = None
+            previous = self.switch( stage )
+            try:
+                for item in items:
+                    batch.append( item )
+                    if len(batch) == TIMED_BATCH:
+                        break
+            except Exception as e:
+                error = e
+            finally:
+                self.switch( previous )
+            yield from batch
+            if error is not None:
+                raise error
+            if len(batch) < TIMED_BATCH:
+                return
+
+    def output( self, lines ):
+        ## yields generated lines (without newlines), timed as encode and counted
+        for line in self.timed( "encode", lines ):
+            self.count( line )
+            yield( line )
+
+    def count( self, line ):
+        self.records += 1
+        self.bytes += len(line) + 1
+        ## tinyBytes writes every escaped byte as a backslash and three digits
+        escapes = line.count("\\")
+        self.escapes += escapes
+        self.escapechars += 4 * escapes
+
+    def countBlock( self, text ):
+        ## as count(), for a block of newline-terminated lines
+        escapes = text.count("\\")
+        self.records += text.count("\n")
+        self.bytes += len(text)
+        self.escapes += escapes
+        self.escapechars += 4 * escapes
+
+    def compacted( self, before, after ):
+        ## corrects the counts of lines already counted as before, and
+        ## written as after by tinybytes.compactText
+        ## compact escapes are "\\" or a backslash and one to three octal digits
+        global COMPACT_ESCAPE_RE
+        if COMPACT_ESCAPE_RE is None:
+            import re
+            COMPACT_ESCAPE_RE = re.compile(r"\\(?:[0-7]{1,3}|.)", re.DOTALL)
+        escapes = before.count("\\")
+        self.bytes -= len(before) - len(after)
+        self.escapes -= escapes
+        self.escapechars -= 4 * escapes
+        for match in COMPACT_ESCAPE_RE.finditer(after):
+            self.escapes += 1
+            self.escapechars += len(match.group())
+        self.saved = (self.saved or 0) + len(before) - len(after)
+
+    def report( self ):
+        self.switch( self.stage )
+        report = {
+            "records": self.records,
+            "bytes": self.bytes,
+            "escaped_bytes": self.escapes,
+            "escape_ratio": self.escapechars / self.bytes if self.bytes else 0.0,
+            "wall_seconds": sum(self.wall.values()),
+            "cpu_seconds": sum(self.cpu.values()),
+            "stages": { stage: {"wall_seconds": self.wall[stage], "cpu_seconds": self.cpu[stage]} for stage in STAGES },
+        }
+        if self.saved is not None:
+            report["compact_saved_bytes"] = self.saved
+        return( report )
+
+def statsStage( stage ):
+    ## marks the start of a stage that runs until the next statsStage()
+    if ACTIVE is not None:
+        ACTIVE.switch( stage )
+
+def statsTimed( stage, items ):
+    ## times an input iterable, eg statsTimed( "read", infile )
+    if ACTIVE is None:
+        return( items )
+    return( ACTIVE.timed( stage, items ) )
+
+def statsOutput( lines ):
+    ## times and counts an iterable of generated lines
+    if ACTIVE is None:
+        return( lines )
+    return( ACTIVE.output( lines ) )
+
+def statsCount( line ):
+    ## counts one generated line that was not passed through statsOutput()
+    if ACTIVE is not None:
+        ACTIVE.count( line )
+
+def statsBlock( text ):
+    ## counts a block of newline-terminated generated lines
+    if ACTIVE is not None:
+        ACTIVE.countBlock( text )
+
+def statsCompacted( before, after ):
+    ## recounts lines counted as before that were written in compact form as after
+    if ACTIVE is not None and before is not after:
+        ACTIVE.compacted( before, after )
+
+def splitOptions( argv ):
+    ## returns (remaining argv, show, json path, profile path)
+    rest = []
+    show = False
+    jsonpath = ""
+    profpath = ""
+    args = iter(argv)
+    for arg in args:
+        name, eq, value = arg.partition("=")
+        if arg == "--":
+            rest.append( arg )
+            rest.extend( args )
+        elif arg == "--stats":
+            show = True
+        elif name in ("--stats-json", "--profile"):
+            if not eq:
+                value = next(args, "")
+            if not value:
+                raise ValueError(name + " needs a file name")
+            if name == "--profile":
+                profpath = value
+            else:
+                jsonpath = value
+        else:
+            rest.append( arg )
+    return( rest, show, jsonpath, profpath )
+
+def writeReport( name, report, jsonpath ):
+    if jsonpath:
+        import json
+        with open(jsonpath, "w") as outfile:
+            json.dump( report, outfile, indent=1 )
+            outfile.write( "\n" )
+        return
+    sys.stderr.write( "{0} stats: {records} records, {bytes} bytes, {escaped_bytes} escaped bytes ({1:.1%} of output)\n".format(name, report["escape_ratio"], **report) )
+    for stage, times in report["stages"].items():
+        sys.stderr.write( "{0} stats: {1:<7} {wall_seconds:9.4f}s wall {cpu_seconds:9.4f}s cpu\n".format(name, stage, **times) )
+    sys.stderr.write( "{0} stats: {1:<7} {wall_seconds:9.4f}s wall {cpu_seconds:9.4f}s cpu\n".format(name, "total", **report) )
+
+def statsOptions( main ):
+    ## decorator for a script's main( argv=None ) adding --stats, --stats-json and --profile
+    name = main.__module__ if main.__module__ != "__main__" else sys.argv[0].rsplit("/", 1)[-1].rsplit(".", 1)[0]
+
+    @functools.wraps(main)
+    def wrapper( argv=None ):
+        global ACTIVE
+        if argv is None:
+            argv = sys.argv[1:]
+        try:
+            argv, show, jsonpath, profpath = splitOptions( argv )
+        except ValueError as e:
+            sys.stderr.write( name + ": " + str(e) + "\n" )
+            return( 1 )
+        if show or jsonpath:
+            ACTIVE = RunStats()
+        profiler = None
+        if profpath:
+            import cProfile
+            profiler = cProfile.Profile()
+        try:
+            if profiler is not None:
+                result = profiler.runcall( main, argv )
+            else:
+                result = main( argv )
+        finally:
+            if profiler is not None:
+                profiler.dump_stats( profpath )
+            stats = ACTIVE
+            ACTIVE = None
+            if stats is not None:
+                writeReport( name, stats.report(), jsonpath )
+        return( result )
+
+    return( wrapper )
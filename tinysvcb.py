@@ -4,43 +4,39 @@
 #
 # example: ./tinysvcb.py --https --domain example.com --priority 0 --target host.example.com
 #
+# batch: ./tinysvcb.py --https --file records.csv   (or "--file -" for stdin)
+#   CSV rows of domain,priority,target[,parameters[,ttl]]; identical parameter
+#   lists, in any order, are encoded once per run and cache statistics go to
+#   stderr
+#
 # Based on https://datatracker.ietf.org/doc/draft-ietf-dnsop-svcb-https/10/
 #
 # 2022 Lee Maguire
 
 import sys
-import getopt
-import ipaddress
-import base64
-
-rrtype = "65"
-domain = "example.com"
-priority = "0"
-target = "host.example.com"
-parameters = ""
-ttl = "86400"
+import functools
+from tinybytes import tinyLine, repeatedBytes
+from tinyname import wireName
+from tinyaddr import packIPv4, packIPv6
+from tinystats import statsOptions, statsStage, statsTimed, statsOutput, statsCount
+from tinyshard import outputStream, outputOptions
 
 def tinySVCBRecord( rrtype, domain, priority, target, parameters, ttl ):
-    output = ":"
-    output += tinyBytes( bytes(domain, "ascii") )
-    output += ":" + rrtype + ":"
-    output += tinyBytes( nboInt(2, priority) )
-    output += tinyBytes( lengthPrefixedLabels(target) )
-    if int(priority) > 0 and len(parameters) > 0:
-        output += tinyBytes( encodeParameters( parameters ) )
-    output += ":" + ttl
-    return( output )
+    owner, priobytes, pieces = svcbParts( domain, priority, target, parameters )
+    return( tinyLine( owner, rrtype, priobytes, ttl, 0, pieces ) )
 
-def tinyBytes( bytearr, encode_all=False ):
-    ## output printable ascii (but not space, "/", ":", "\")
-    ## all other characters output as octal \nnn codes
-    output = ""
-    for b in bytearr:
-        if not encode_all and b > 32 and b < 127 and b not in [47,58,92]:
-            output += chr(b)
-        else:
-            output += "\\{0:03o}".format(b)
-    return( output )
+def svcbRdata( domain, priority, target, parameters ):
+    ## returns the owner name and raw rdata bytes of the record tinySVCBRecord describes
+    owner, priobytes, pieces = svcbParts( domain, priority, target, parameters )
+    return( owner, priobytes + b"".join(pieces) )
+
+def svcbParts( domain, priority, target, parameters ):
+    ## returns the owner name, and the rdata as the priority and a tuple of the
+    ## target name and each SvcParam, which are kept apart as they repeat
+    pieces = ( wireName( target ), )
+    if int(priority) > 0 and len(parameters) > 0:
+        pieces += parameterPieces( parameters )
+    return( domain, nboInt(2, priority), pieces )
 
 def nboInt( length, number ):
     ## returns bytes representing an integer in network byte order (big endian)
@@ -51,137 +47,219 @@ def nboInt( length, number ):
 def lengthPrefixedLabels( domain ):
     ## if input "example.com", output should be "\007example\003com\000"
     ## if input ".", output should be "\000"
-    ## TODO: account for pre-escaped text
-    outbytes = bytearray(b'') 
-    if len(domain) > 1:
-        for label in domain.split("."):
-            outbytes += nboInt(1, len(label))
-            outbytes += bytes(label, "ascii")
-    outbytes += nboInt(1, 0)
-    return( outbytes )
+    ## kept for callers of the old name, see tinyname.wireName
+    return( bytearray(wireName( domain )) )
 
 def charString( text ):
     ## Appendix A in the spec
     output = text  ## TODO: actually implement
     return( output )
 
+## SvcParamKey names -> numeric ids, "keyNNNNN" is handled by getParamId
+PARAM_IDS = {
+    "mandatory": 0,
+    "alpn": 1,
+    "no-default-alpn": 2,
+    "port": 3,
+    "ipv4hint": 4,
+    "ech": 5,
+    "ipv6hint": 6,
+}
+
+## bounded caches: whole parsed parameter lists, and single key=value pairs
+PARAMETERS_CACHE_SIZE = 4096
+PARAM_CACHE_SIZE = 4096
+
 def getParamId( key ):
-    if key in "mandatory":
-        return( 0 )
-    elif key in "alpn":
-        return( 1 )
-    elif key in "no-default-alpn":
-        return( 2 )
-    elif key in "port":
-        return( 3 )
-    elif key in "ipv4hint":
-        return( 4 )
-    elif key in "ech":
-        return( 5 )
-    elif key in "ipv6hint":
-        return( 6 )
-    elif key.startswith('key'):
+    if key in PARAM_IDS:
+        return( PARAM_IDS[key] )
+    elif key.startswith('key') and key[3:].isdigit() and int(key[3:]) < 65536:
         return( int(key[3:]) )
+    raise ValueError("unknown SvcParamKey: " + key)
 
-def encodeParameters( parameters ):
-    outbytes = bytearray(b'')
+def parseParameters( parameters ):
+    ## returns a list of (svcid, raw value) in id order
+    ## parameters is a whitespace separated string, or a sequence of
+    ## "key=value" strings whose values may contain spaces
     paramdict = {}
+    if isinstance(parameters, str):
+        parameters = parameters.split()
 
     ## put parameter ids and raw values into a dictonary
-    for param in parameters.split(" "):
-        if param in "no-default-alpn":
+    for param in parameters:
+        if param == "no-default-alpn":
             svcint = getParamId( param )
             paramdict[svcint] = "empty" ## value is ignored
         else:
-            key,value = param.split("=")
+            key,value = param.split("=", 1)
             value = value.strip('\"')
             value = value.strip('\'')
             svcint = getParamId( key )
             paramdict[svcint] = value
 
-    ## go through the dictionary in id order
-    for svcid in sorted(paramdict):
-        outbytes += nboInt(2, svcid)
-
-        if svcid == 0: # mandatory
-            mandatory_ids = []
-            mandatory = paramdict[svcid].split(",")
-            for mandsvc in mandatory:
-                mandatory_ids.append( getParamId(mandsvc) )
-            outbytes += nboInt(2, len(mandatory_ids) * 2) # length is fixed 2 bytes per item
-            ## go through array in id order
-            for i in sorted(mandatory_ids):
-                outbytes += nboInt(2, i)
-
-        elif svcid == 1: # alpn
-            alpn_outbytes = bytearray(b'')
-            alpn_length = 0 
-            alpns = paramdict[svcid].split(",")
-            for alpn in alpns:
-                alpn_length += 1
-                alpn_bytes = bytes(alpn, "ascii") ## TODO: account for pre-escaped text
-                alpn_length += len(alpn_bytes)
-                alpn_outbytes += nboInt(1, len(alpn_bytes))
-                alpn_outbytes += alpn_bytes
-            outbytes += nboInt(2, alpn_length)
-            outbytes += alpn_outbytes
-
-        elif svcid == 3: # port
-            outbytes += nboInt(2, 2)
-            outbytes += nboInt(2, paramdict[svcid] ) # port value is just an int
-
-        elif svcid == 4: # ipv4hint
-            addresses = paramdict[svcid].split(",")
-            outbytes += nboInt(2, len(addresses) * 4) # length is fixed 4 bytes per item
-            for ipv4addr in addresses:
-                outbytes += ipaddress.IPv4Address(ipv4addr).packed
-
-        elif svcid == 5: # ech
-            ech = base64.b64decode(paramdict[svcid])
-            outbytes += nboInt(2, len(ech))
-            outbytes += ech
-
-        elif svcid == 6: # ipv6hint
-            addresses = paramdict[svcid].split(",")
-            outbytes += nboInt(2, len(addresses) * 16) # length is fixed 16 bytes per item
-            for ipv6addr in addresses:
-                outbytes += ipaddress.IPv6Address(ipv6addr).packed
-
-        elif svcid > 6:
-                key_val = charString(paramdict[svcid])
-                outbytes += nboInt(2, len(key_val))
-                outbytes += bytes(key_val, "ascii")
-
-    return( outbytes )
-
-opts, args = getopt.getopt(sys.argv[1:],"hd:p:t:a:l:",["help","https","svcb","priority=","target=","domain=","ttl=","parameters="])
-for opt, arg in opts:
-    if opt in ("-h", "--help"):
-        print('Usage: tinysvcb.py --https --domain example.com --priority 0 --target host.example.com')
-        print('  --svcb  (Use RR 64)')
-        print('  --https (Use RR 65)')
-        print('  --priority int (0 for alias)')
-        print('  --domain hostname (domain hostname)')
-        print('  --target hostname (service hostname)')
-        print('  --parameters "key=value key=value" (parameter list)')
-        print('  --ttl int (dns ttl)')
-        sys.exit()
-    elif opt in ("--svcb"):
-        rrtype = "64"
-    elif opt in ("--https"):
-        rrtype = "65"
-    elif opt in ("-d", "--domain"):
-        domain = arg
-    elif opt in ("-p", "--priority"):
-        priority = arg
-    elif opt in ("-t", "--target"):
-        target = arg
-    elif opt in ("-a", "--parameters"):
-        parameters = arg
-    elif opt in ("-l", "--ttl"):
-        ttl = arg
-
-line = tinySVCBRecord( rrtype, domain, priority, target, parameters, ttl)
-sys.stdout.write( line + "\n")
-
-sys.exit(0)
+    return( sorted(paramdict.items()) )
+
+@functools.lru_cache(maxsize=PARAM_CACHE_SIZE)
+def encodeParam( svcid, value ):
+    ## returns the wire format of one SvcParam: key, length and value
+    ## cached, so a large ech blob is only base64 decoded once per run
+    import base64
+    outbytes = bytearray(b'')
+    outbytes += nboInt(2, svcid)
+
+    if svcid == 0: # mandatory
+        mandatory_ids = []
+        mandatory = value.split(",")
+        for mandsvc in mandatory:
+            mandatory_ids.append( getParamId(mandsvc) )
+        outbytes += nboInt(2, len(mandatory_ids) * 2) # length is fixed 2 bytes per item
+        ## go through array in id order
+        for i in sorted(mandatory_ids):
+            outbytes += nboInt(2, i)
+
+    elif svcid == 1: # alpn
+        alpn_outbytes = bytearray(b'')
+        alpn_length = 0 
+        alpns = value.split(",")
+        for alpn in alpns:
+            alpn_length += 1
+            alpn_bytes = bytes(alpn, "ascii") ## TODO: account for pre-escaped text
+            alpn_length += len(alpn_bytes)
+            alpn_outbytes += nboInt(1, len(alpn_bytes))
+            alpn_outbytes += alpn_bytes
+        outbytes += nboInt(2, alpn_length)
+        outbytes += alpn_outbytes
+
+    elif svcid == 3: # port
+        outbytes += nboInt(2, 2)
+        outbytes += nboInt(2, value ) # port value is just an int
+
+    elif svcid == 4: # ipv4hint
+        addresses = value.split(",")
+        outbytes += nboInt(2, len(addresses) * 4) # length is fixed 4 bytes per item
+        for ipv4addr in addresses:
+            outbytes += packIPv4( ipv4addr )
+
+    elif svcid == 5: # ech
+        ech = base64.b64decode(value)
+        outbytes += nboInt(2, len(ech))
+        outbytes += ech
+
+    elif svcid == 6: # ipv6hint
+        addresses = value.split(",")
+        outbytes += nboInt(2, len(addresses) * 16) # length is fixed 16 bytes per item
+        for ipv6addr in addresses:
+            outbytes += packIPv6( ipv6addr )
+
+    elif svcid > 6:
+            key_val = charString(value)
+            outbytes += nboInt(2, len(key_val))
+            outbytes += bytes(key_val, "ascii")
+
+    return( bytes(outbytes) )
+
+def encodeParameters( parameters ):
+    ## returns the wire format of every SvcParam
+    return( b"".join( parameterPieces( parameters ) ) )
+
+def parameterPieces( parameters ):
+    ## returns the wire format of each SvcParam in id order, cached per parsed
+    ## parameter list, so any spelling or order of the same parameters hits
+    return( encodeParsed( tuple(parseParameters( parameters )) ) )
+
+@functools.lru_cache(maxsize=PARAMETERS_CACHE_SIZE)
+def encodeParsed( params ):
+    ## params is a tuple of (svcid, raw value) in id order
+    return( tuple([ encodeParam( svcid, value ) for svcid, value in params ]) )
+
+def parameterCacheStats():
+    ## returns hit and miss counts for the parameter caches
+    output = {}
+    for name, func in (("parameters", encodeParsed), ("param", encodeParam), ("target", wireName), ("escaped", repeatedBytes)):
+        info = func.cache_info()
+        output[name] = { "hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize }
+    return( output )
+
+def svcbCsvRecords( lines, rrtype, ttl ):
+    ## yields one tinydns line per CSV row of domain,priority,target[,parameters[,ttl]]
+    ## blank lines and "#" comments are skipped
+    import csv
+    for fields in csv.reader( line for line in lines if line.strip() and not line.lstrip().startswith("#") ):
+        fields = [ f.strip() for f in fields ]
+        if len(fields) < 3 or len(fields) > 5:
+            raise ValueError("expected domain,priority,target[,parameters[,ttl]], got: " + ",".join(fields))
+        fields += [""] * (5 - len(fields))
+        domain, priority, target, parameters, rowttl = fields
+        yield( tinySVCBRecord( rrtype, domain, priority, target, " ".join(parameters.split()), rowttl or ttl ) )
+
+@statsOptions
+@outputOptions
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    rrtype = "65"
+    domain = "example.com"
+    priority = "0"
+    target = "host.example.com"
+    parameters = ""
+    ttl = "86400"
+    batchfile = ""
+
+    opts, args = getopt.getopt(argv,"hd:p:t:a:l:f:",["help","https","svcb","priority=","target=","domain=","ttl=","parameters=","file="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: tinysvcb.py --https --domain example.com --priority 0 --target host.example.com')
+            print('  --svcb  (Use RR 64)')
+            print('  --https (Use RR 65)')
+            print('  --priority int (0 for alias)')
+            print('  --domain hostname (domain hostname)')
+            print('  --target hostname (service hostname)')
+            print('  --parameters "key=value key=value" (parameter list)')
+            print('  --ttl int (dns ttl)')
+            print('  --file csv (batch mode, rows of domain,priority,target[,parameters[,ttl]], "-" for stdin)')
+            print('  --stats, --stats-json file, --profile file (report run statistics, see tinystats.py)')
+            print('  --compact (write the shortest escaping tinydns-data accepts, report bytes saved)')
+            print('  --shards N or --shard-zones list, --shard-prefix path, --shard-only names (write to fragment files, see tinyshard.py)')
+            return( 0 )
+        elif opt in ("--svcb"):
+            rrtype = "64"
+        elif opt in ("--https"):
+            rrtype = "65"
+        elif opt in ("-d", "--domain"):
+            domain = arg
+        elif opt in ("-p", "--priority"):
+            priority = arg
+        elif opt in ("-t", "--target"):
+            target = arg
+        elif opt in ("-a", "--parameters"):
+            parameters = arg
+        elif opt in ("-l", "--ttl"):
+            ttl = arg
+        elif opt in ("-f", "--file"):
+            batchfile = arg
+
+    if batchfile:
+        if batchfile == "-":
+            infile = sys.stdin
+        else:
+            infile = open(batchfile, "r", newline="")
+        statsStage( "write" )
+        with outputStream() as out:
+            for line in statsOutput( svcbCsvRecords( statsTimed( "read", infile ), rrtype, ttl ) ):
+                out.write( line + "\n" )
+        for name, stats in parameterCacheStats().items():
+            sys.stderr.write( "tinysvcb {0} cache: {hits} hits, {misses} misses, {size}/{maxsize} entries\n".format(name, **stats) )
+        return( 0 )
+
+    statsStage( "encode" )
+    line = tinySVCBRecord( rrtype, domain, priority, target, parameters, ttl)
+    statsStage( "write" )
+    statsCount( line )
+    with outputStream() as out:
+        out.write( line + "\n" )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -9,42 +9,23 @@
 # 2022 Lee Maguire
 
 import sys
-import getopt
-
-domain = "example.com"
-service = "ldap"
-proto = "tcp"
-priority = 10
-weight = 20
-target = "ldap://dir.example.com:389"
-ttl = "86400"
-
-## https://www.iana.org/assignments/enum-services/enum-services.xhtml
-enumtype = ""
-enumsubtype = ""
-enumscheme = ""
+from tinybytes import tinyLine
+from tinystats import statsOptions, statsStage, statsCount
+from tinyshard import outputStream, outputOptions
 
 def tinyUriRecord( domain, prefix, priority, weight, target, ttl ):
-    output = ":"
-    srvdomain = prefix + "." + domain
-    output += tinyBytes( bytes(srvdomain, "ascii") )
-    output += ":256:"
-    output += tinyBytes( nboInt(2, priority), True )
-    output += tinyBytes( nboInt(2, weight), True )
-    output += tinyBytes( bytes(target, "ascii") )
-    output += ":" + ttl
-    return( output )
+    ## priority and weight are written as \nnn codes
+    owner, rdata = uriRdata( domain, prefix, priority, weight, target )
+    return( tinyLine( owner, 256, rdata, ttl, 4 ) )
 
-def tinyBytes( bytearr, encode_all=False ):
-    ## output printable ascii (but not space, "/", ":", "\")
-    ## all other characters output as octal \nnn codes
-    output = ""
-    for b in bytearr:
-        if not encode_all and b > 32 and b < 127 and b not in [47,58,92]:
-            output += chr(b)
-        else:
-            output += "\\{0:03o}".format(b)
-    return( output )
+def uriRdata( domain, prefix, priority, weight, target ):
+    ## returns the owner name and raw rdata bytes of the record tinyUriRecord describes
+    srvdomain = prefix + "." + domain
+    outbytes = bytearray(b'')
+    outbytes += nboInt(2, priority)
+    outbytes += nboInt(2, weight)
+    outbytes += bytes(target, "ascii")
+    return( srvdomain, bytes(outbytes) )
 
 def nboInt( length, number ):
     ## returns bytes representing an integer in network byte order (big endian)
@@ -52,50 +33,79 @@ def nboInt( length, number ):
     intbytes = int(number).to_bytes(length, "big")
     return( intbytes )
 
-opts, args = getopt.getopt(sys.argv[1:],"hd:s:p:t:l:",["help","domain=","service=","proto=","priority=","weight=","target=","enumtype=","enumsubtype=","enumscheme=","ttl="])
-for opt, arg in opts:
-    if opt in ("-h", "--help"):
-        print('Usage: tinyuri.py --domain example.com --service ldap --proto tcp --priority 10 --weight 20 --target "ldap://dir.example.com:389"')
-        print('  --domain domain-name')
-        print('  --service service-name (eg "ldap")')
-        print('  --proto protocol ("tcp" or "udp")')
-        print('  --priority int (eg 1)')
-        print('  --weight int (eg 10)')
-        print('  --target "uri" (eg "ldap://dir.example.com:389")')
-        print('  --ttl int (dns ttl)')
-        sys.exit()
-    elif opt in ("-d", "--domain"):
-        domain = arg
-    elif opt in ("--service"):
-        service = arg
-    elif opt in ("--proto"):
-        proto = arg
-    elif opt in ("-p", "--priority"):
-        priority = arg
-    elif opt in ("--weight"):
-        weight = arg
-    elif opt in ("-t", "--target"):
-        target = arg
-    elif opt in ("-l", "--ttl"):
-        ttl = arg
-    elif opt in ("--enumscheme"):
-        enumscheme = arg
-        proto = ""
-    elif opt in ("--enumsubtype"):
-        enumsubtype = arg
-        proto = ""
-    elif opt in ("--enumtype"):
-        enumtype = arg
-        proto = ""
+@statsOptions
+@outputOptions
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    domain = "example.com"
+    service = "ldap"
+    proto = "tcp"
+    priority = 10
+    weight = 20
+    target = "ldap://dir.example.com:389"
+    ttl = "86400"
+
+    ## https://www.iana.org/assignments/enum-services/enum-services.xhtml
+    enumtype = ""
+    enumsubtype = ""
+    enumscheme = ""
+
+    opts, args = getopt.getopt(argv,"hd:s:p:t:l:",["help","domain=","service=","proto=","priority=","weight=","target=","enumtype=","enumsubtype=","enumscheme=","ttl="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: tinyuri.py --domain example.com --service ldap --proto tcp --priority 10 --weight 20 --target "ldap://dir.example.com:389"')
+            print('  --domain domain-name')
+            print('  --service service-name (eg "ldap")')
+            print('  --proto protocol ("tcp" or "udp")')
+            print('  --priority int (eg 1)')
+            print('  --weight int (eg 10)')
+            print('  --target "uri" (eg "ldap://dir.example.com:389")')
+            print('  --ttl int (dns ttl)')
+            print('  --stats, --stats-json file, --profile file (report run statistics, see tinystats.py)')
+            print('  --compact (write the shortest escaping tinydns-data accepts, report bytes saved)')
+            print('  --shards N or --shard-zones list, --shard-prefix path, --shard-only names (write to fragment files, see tinyshard.py)')
+            return( 0 )
+        elif opt in ("-d", "--domain"):
+            domain = arg
+        elif opt in ("--service"):
+            service = arg
+        elif opt in ("--proto"):
+            proto = arg
+        elif opt in ("-p", "--priority"):
+            priority = arg
+        elif opt in ("--weight"):
+            weight = arg
+        elif opt in ("-t", "--target"):
+            target = arg
+        elif opt in ("-l", "--ttl"):
+            ttl = arg
+        elif opt in ("--enumscheme"):
+            enumscheme = arg
+            proto = ""
+        elif opt in ("--enumsubtype"):
+            enumsubtype = arg
+            proto = ""
+        elif opt in ("--enumtype"):
+            enumtype = arg
+            proto = ""
+
+    if proto:
+        prefix = "_" + service + "._" + proto
+    elif enumsubtype:
+        prefix = "_" + enumscheme + "._" + enumsubtype + "._" + enumtype
+    else:
+        prefix = "_" + enumscheme + "._" + enumtype
 
-if proto:
-    prefix = "_" + service + "._" + proto
-elif enumsubtype:
-    prefix = "_" + enumscheme + "._" + enumsubtype + "._" + enumtype
-else:
-    prefix = "_" + enumscheme + "._" + enumtype
+    statsStage( "encode" )
+    line = tinyUriRecord( domain, prefix, priority, weight, target, ttl )
+    statsStage( "write" )
+    statsCount( line )
+    with outputStream() as out:
+        out.write( line + "\n" )
 
-line = tinyUriRecord( domain, prefix, priority, weight, target, ttl )
-sys.stdout.write( line + "\n")
+    return( 0 )
 
-sys.exit(0)
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )
@@ -0,0 +1,157 @@
+# tinywatch - rebuild a data file from a directory of manifests as they change
+#
+# example: ./tinygen.py --watch manifests/ --output /etc/tinydns/root/data.generated
+#
+# Each manifest in the directory has its own output fragment, kept in a
+# fragment directory (by default the output file name plus ".fragments").
+# When a manifest changes, only its fragment is regenerated; the output file
+# is then rewritten from all the fragments, in manifest name order, and
+# renamed into place so readers never see a partial file. A manifest that
+# fails to build is reported and its previous fragment is kept, and so is a
+# --command that fails: the error is logged and watching goes on.
+#
+# Changes are noticed through inotify on Linux, via ctypes, so a save is
+# picked up at once; elsewhere, or if inotify cannot be set up, the directory
+# is polled every --interval seconds. Either way, what changed is decided by
+# comparing each manifest's size and modification time with the last scan.
+# On start, fragments older than their manifest are rebuilt.
+
+import os
+import sys
+import time
+
+## inotify(7) event bits
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+
+## after a wakeup, wait this long for an editor to finish writing
+SETTLE_SECONDS = 0.1
+
+def isManifest( name ):
+    ## skips hidden files and editor backups
+    return( not name.startswith(".") and not name.endswith("~") and not name.endswith(".swp") )
+
+def manifestSignatures( dirpath ):
+    ## returns {name: (mtime_ns, size)} for the manifests in a directory
+    signatures = {}
+    with os.scandir(dirpath) as entries:
+        for entry in entries:
+            if isManifest( entry.name ) and entry.is_file():
+                st = entry.stat()
+                signatures[entry.name] = (st.st_mtime_ns, st.st_size)
+    return( signatures )
+
+def writeAtomic( path, chunks ):
+    ## writes chunks of text to a temporary file and renames it over path
+    tmppath = path + ".tmp"
+    with open(tmppath, "w") as outfile:
+        for chunk in chunks:
+            outfile.write( chunk )
+    os.replace(tmppath, path)
+
+def buildFragment( manifest, fragment, generate ):
+    ## regenerates one fragment, returns an error message or None
+    ## generate( path ) yields the output lines of one manifest
+    ## any error from a builder, not just a bad value, must leave the watcher
+    ## running with the previous fragment
+    try:
+        writeAtomic( fragment, ( line + "\n" for line in generate( manifest ) ) )
+    except Exception as e:
+        if os.path.exists(fragment + ".tmp"):
+            os.unlink(fragment + ".tmp")
+        return( type(e).__name__ + ": " + str(e) )
+    return( None )
+
+def fragmentText( fragdir, names ):
+    for name in sorted(names):
+        with open(os.path.join(fragdir, name), "r") as infile:
+            yield( infile.read() )
+
+def inotifyDescriptor( dirpath ):
+    ## returns an inotify file descriptor watching dirpath, or None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+    except (OSError, AttributeError):
+        return( None )
+    if fd < 0:
+        return( None )
+    mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    if libc.inotify_add_watch(fd, os.fsencode(dirpath), mask) < 0:
+        os.close(fd)
+        return( None )
+    return( fd )
+
+def waitForChange( fd, interval ):
+    ## sleeps until inotify reports an event, or for interval seconds
+    if fd is None:
+        time.sleep(interval)
+        return
+    import select
+    readable, w, x = select.select([fd], [], [], interval)
+    if readable:
+        time.sleep(SETTLE_SECONDS)
+        try:
+            while os.read(fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+def watchManifests( dirpath, output, generate, fragdir="", interval=2.0, after=None, log=sys.stderr ):
+    ## keeps output up to date with the manifests in dirpath, never returns
+    ## after, if given, is called after every rewrite of output, eg to run tinydns-data,
+    ## and returns an error message to log or None
+    fragdir = fragdir or output + ".fragments"
+    os.makedirs(fragdir, exist_ok=True)
+    fd = inotifyDescriptor( dirpath )
+    log.write( "tinygen watch: " + dirpath + (" (inotify)" if fd is not None else " (polling)") + "\n" )
+    known = {}
+    first = True
+    while True:
+        current = manifestSignatures( dirpath )
+        changed = False
+        for name, signature in sorted(current.items()):
+            if known.get(name) == signature:
+                continue
+            fragment = os.path.join(fragdir, name)
+            ## on start, keep fragments that are newer than their manifest
+            if first and os.path.exists(fragment) and os.stat(fragment).st_mtime_ns >= signature[0]:
+                known[name] = signature
+                continue
+            start = time.perf_counter()
+            error = buildFragment( os.path.join(dirpath, name), fragment, generate )
+            if error is None:
+                log.write( "tinygen watch: rebuilt {0} in {1:.3f}s\n".format(name, time.perf_counter() - start) )
+                changed = True
+            else:
+                log.write( "tinygen watch: " + name + ": " + error + " (keeping the previous fragment)\n" )
+            known[name] = signature
+        for name in set(known) - set(current):
+            del known[name]
+            fragment = os.path.join(fragdir, name)
+            if os.path.exists(fragment):
+                os.unlink(fragment)
+            log.write( "tinygen watch: removed " + name + "\n" )
+            changed = True
+        ## drop fragments of manifests deleted while we were not running
+        for name in os.listdir(fragdir):
+            if name not in current and not name.endswith(".tmp"):
+                os.unlink(os.path.join(fragdir, name))
+                changed = True
+        if changed or first:
+            names = [ name for name in current if os.path.exists(os.path.join(fragdir, name)) ]
+            writeAtomic( output, fragmentText( fragdir, names ) )
+            log.write( "tinygen watch: wrote " + output + " from " + str(len(names)) + " fragments\n" )
+            if after is not None:
+                error = after()
+                if error is not None:
+                    log.write( "tinygen watch: " + error + "\n" )
+        log.flush()
+        first = False
+        waitForChange( fd, interval )
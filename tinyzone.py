@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+
+# tinyzone - convert the unusual records in a BIND master file to tinydns lines
+#
+# example: ./tinyzone.py --origin example.com db.example.com > data.zone
+#          named-compilezone -s full -o - example.com db.example.com | ./tinyzone.py -o example.com
+#
+# CAA, SRV, URI, LOC, SSHFP, SVCB, HTTPS and AAAA records are passed to the
+# matching builder (tinyCAARecord, tinySrvRecord, ...); every other type is
+# skipped and counted on stderr, as tinydns-data has its own lines for them.
+#
+# The file is read one record at a time, so memory use does not grow with the
+# size of the zone. $ORIGIN, $TTL and $INCLUDE, "@", relative names, blank
+# owners, optional ttl and class fields, parentheses, ";" comments and quoted
+# strings are understood. Lines without quotes, backslashes, parentheses or
+# comments take a fast path through str.split(). Escapes in owner names ("\.",
+# "\DDD") are read as in RFC 1035 and written back in tinydns-data's own
+# escaping, so "a\.b" stays one label.
+#
+# https://www.rfc-editor.org/rfc/rfc1035#section-5
+# https://www.rfc-editor.org/rfc/rfc2308#section-4 ($TTL)
+
+import sys
+from tinybytes import tinyBytes
+from tinyname import nameLabels
+from tinycaa import tinyCAARecord
+from tinysrv import tinySrvRecord
+from tinyuri import tinyUriRecord
+from tinyloc import tinyLocRecord
+from tinysvcb import tinySVCBRecord
+from tinyipv6 import tinyAAAARecord
+from tinysshfp import tinySshfpRecord
+from tinystats import statsOptions, statsStage, statsTimed, statsOutput
+from tinyshard import outputStream, outputOptions
+
+## a token is a quoted string (possibly glued to a prefix, as in alpn="h2,h3"),
+## a run of other characters, a parenthesis, or the start of a comment
+TOKEN_PATTERN = r'(?:[^\s"();\\]|\\.)*"(?:[^"\\]|\\.)*"|(?:[^\s"();\\]|\\.)+|[()]|;'
+TOKEN_RE = None
+
+CLASSES = ("IN", "CH", "HS", "CS")
+TTL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+def lineTokens( line ):
+    ## returns the tokens of one line, without any comment
+    ## a backslash can escape a space or a ";", so only lines without quotes,
+    ## backslashes, parentheses or comments are simply split on whitespace
+    if '"' not in line and "\\" not in line and "(" not in line and ")" not in line and ";" not in line:
+        return( line.split() )
+    global TOKEN_RE
+    if TOKEN_RE is None:
+        import re
+        TOKEN_RE = re.compile(TOKEN_PATTERN)
+    tokens = []
+    for token in TOKEN_RE.findall(line):
+        if token == ";":
+            break
+        tokens.append( token )
+    return( tokens )
+
+def unquote( text ):
+    ## removes the quotes and backslash escapes of a zone file string
+    ## if input '"a \\"b\\" \\065"', output should be 'a "b" A'
+    if text.startswith('"') and text.endswith('"') and len(text) > 1:
+        text = text[1:-1]
+    if "\\" not in text:
+        return( text )
+    output = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == "\\" and i + 1 < len(text):
+            if text[i + 1:i + 4].isdigit() and len(text[i + 1:i + 4]) == 3:
+                output.append( chr(int(text[i + 1:i + 4])) )
+                i += 4
+                continue
+            c = text[i + 1]
+            i += 1
+        output.append( c )
+        i += 1
+    return( "".join(output) )
+
+def parseTtl( text ):
+    ## returns a ttl in seconds as a string, "1h30m" is "5400"
+    if text.isdigit():
+        return( str(int(text)) )
+    seconds = 0
+    number = ""
+    for c in text.lower():
+        if c.isdigit():
+            number += c
+        elif c in TTL_UNITS and number:
+            seconds += int(number) * TTL_UNITS[c]
+            number = ""
+        else:
+            raise ValueError("bad ttl: " + text)
+    if number:
+        raise ValueError("bad ttl: " + text)
+    return( str(seconds) )
+
+def isTtl( token ):
+    return( token[0].isdigit() and token[-1].lower() in "0123456789smhdw" )
+
+def isAbsolute( name ):
+    ## a trailing dot makes a name absolute, unless it is escaped as in "a\\."
+    if not name.endswith("."):
+        return( False )
+    return( (len(name) - 1 - len(name[:-1].rstrip("\\"))) % 2 == 0 )
+
+def absoluteName( name, origin ):
+    ## returns a name without its trailing dot, "@" and relative names use origin
+    ## the root is returned as "."
+    if name == "@":
+        return( origin or "." )
+    if isAbsolute( name ):
+        return( name[:-1] or "." )
+    if not origin or origin == ".":
+        return( name )
+    return( name + "." + origin )
+
+def logicalLines( lines, name ):
+    ## yields (line number, tokens, blank owner) for each record or directive,
+    ## joining lines inside parentheses
+    tokens = []
+    depth = 0
+    blank = False
+    start = 0
+    for lineno, line in enumerate(lines, 1):
+        linetokens = lineTokens( line )
+        if depth == 0:
+            if not linetokens:
+                continue
+            start = lineno
+            blank = line[0] in " \t"
+        for token in linetokens:
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth -= 1
+                if depth < 0:
+                    raise ValueError(name + ":" + str(lineno) + ": unbalanced )")
+            else:
+                tokens.append( token )
+        if depth == 0 and tokens:
+            yield( start, tokens, blank )
+            tokens = []
+    if depth:
+        raise ValueError(name + ":" + str(start) + ": unbalanced (")
+
+def zoneRecords( lines, origin="", ttl="86400", name="-" ):
+    ## yields (owner, ttl, type, rdata tokens, origin) for each record in a master file
+    ## names are absolute and without the trailing dot; ttl is a string; origin
+    ## is the $ORIGIN in effect, for relative names in the rdata
+    owner = origin or "."
+    defaultttl = None
+    lastttl = ttl
+    for lineno, tokens, blank in logicalLines( lines, name ):
+        try:
+            if tokens[0].startswith("$"):
+                directive = tokens[0].upper()
+                if directive == "$ORIGIN":
+                    origin = absoluteName( tokens[1], origin )
+                elif directive == "$TTL":
+                    defaultttl = parseTtl( tokens[1] )
+                elif directive == "$INCLUDE":
+                    import os
+                    path = unquote( tokens[1] )
+                    if not os.path.isabs(path) and name != "-":
+                        path = os.path.join(os.path.dirname(name), path)
+                    inclorigin = absoluteName( tokens[2], origin ) if len(tokens) > 2 else origin
+                    with open(path, "r") as infile:
+                        yield from zoneRecords( infile, inclorigin, defaultttl or lastttl, path )
+                else:
+                    raise ValueError("unsupported directive " + tokens[0])
+                continue
+            pos = 0
+            if not blank:
+                owner = absoluteName( tokens[0], origin )
+                pos = 1
+            rrttl = None
+            ## ttl and class may come in either order, and either may be missing
+            while pos < len(tokens):
+                token = tokens[pos]
+                if isTtl( token ):
+                    rrttl = parseTtl( token )
+                elif token.upper() not in CLASSES:
+                    break
+                pos += 1
+            if pos >= len(tokens):
+                raise ValueError("missing record type")
+            if rrttl is None:
+                rrttl = defaultttl or lastttl
+            lastttl = rrttl
+            yield( owner, rrttl, tokens[pos].upper(), tokens[pos + 1:], origin )
+        except (ValueError, IndexError) as e:
+            raise ValueError(name + ":" + str(lineno) + ": " + (str(e) or "missing field"))
+
+def ownerText( owner ):
+    ## returns an owner with its RFC 1035 escapes read, as tinydns-data text
+    ## if input "a\\.b\\065.example.com", output should be "a\\056bA.example.com"
+    return( ".".join([ tinyBytes( label ).replace(".", "\\056") for label in nameLabels( owner ) ]) )
+
+def plainOwner( owner ):
+    ## returns an owner the builders can take, with the same labels, but any
+    ## byte other than printable ascii replaced; the owner field of the line is
+    ## then replaced with ownerText()
+    return( ".".join([ "".join([ chr(b) if b > 32 and b < 127 and b not in (46,92) else "x" for b in label ]) for label in nameLabels( owner ) ]) )
+
+def splitPrefix( owner ):
+    ## splits "_ldap._tcp.example.com" into ("_ldap._tcp", "example.com")
+    labels = owner.split(".")
+    n = 0
+    while n < len(labels) - 1 and labels[n].startswith("_"):
+        n += 1
+    if n == 0:
+        raise ValueError("owner has no _service labels: " + owner)
+    return( ".".join(labels[:n]), ".".join(labels[n:]) )
+
+def caaLine( owner, ttl, rdata, origin ):
+    flags, tag, value = rdata[0], rdata[1], unquote( " ".join(rdata[2:]) )
+    return( tinyCAARecord( owner, flags, tag, value, ttl ) )
+
+def srvLine( owner, ttl, rdata, origin ):
+    prefix, domain = splitPrefix( owner )
+    labels = prefix.split(".")
+    if len(labels) != 2:
+        raise ValueError("SRV owner should be _service._proto.domain: " + owner)
+    priority, weight, port, target = rdata
+    return( tinySrvRecord( domain, labels[0][1:], labels[1][1:], priority, weight, port, absoluteName( target, origin ), ttl ) )
+
+def uriLine( owner, ttl, rdata, origin ):
+    prefix, domain = splitPrefix( owner )
+    priority, weight, target = rdata
+    return( tinyUriRecord( domain, prefix, priority, weight, unquote( target ), ttl ) )
+
+def locLine( owner, ttl, rdata, origin ):
+    ## d1 [m1 [s1]] N|S d2 [m2 [s2]] E|W alt[m] [siz[m] [hp[m] [vp[m]]]]
+    fields = list(rdata)
+    coords = []
+    for hemispheres in ("NS", "EW"):
+        dms = []
+        while fields and fields[0].upper() not in hemispheres:
+            dms.append( fields.pop(0) )
+        if not fields or not dms or len(dms) > 3:
+            raise ValueError("bad LOC coordinates: " + " ".join(rdata))
+        dms += ["0"] * (3 - len(dms))
+        coords += dms + [fields.pop(0).upper()]
+    ## RFC 1876 defaults for the optional size and precisions
+    sizes = fields + ["1m", "10000m", "10m"][len(fields) - 1:] if fields else []
+    if len(sizes) != 4:
+        raise ValueError("bad LOC altitude or precision: " + " ".join(rdata))
+    return( tinyLocRecord( owner, *coords, *sizes, ttl ) )
+
+def sshfpLine( owner, ttl, rdata, origin ):
+    ## the fingerprint may be split over several fields
+    return( tinySshfpRecord( owner, rdata[0], rdata[1], "".join(rdata[2:]), ttl ) )
+
+def svcbLine( rrtype ):
+    ## each SvcParam is already one token, so a quoted value keeps its spaces
+    def line( owner, ttl, rdata, origin ):
+        params = []
+        for param in rdata[2:]:
+            key, eq, value = param.partition("=")
+            params.append( key + eq + unquote( value ) if eq else key )
+        return( tinySVCBRecord( rrtype, owner, rdata[0], absoluteName( rdata[1], origin ), tuple(params), ttl ) )
+    return( line )
+
+def aaaaLine( owner, ttl, rdata, origin ):
+    return( tinyAAAARecord( "r", owner, rdata[0], ttl ) )
+
+## record type -> function( owner, ttl, rdata tokens, origin ) returning a tinydns line
+ZONE_TYPES = {
+    "CAA": caaLine,
+    "SRV": srvLine,
+    "URI": uriLine,
+    "LOC": locLine,
+    "SSHFP": sshfpLine,
+    "SVCB": svcbLine( "64" ),
+    "HTTPS": svcbLine( "65" ),
+    "AAAA": aaaaLine,
+}
+
+def zoneLines( lines, origin="", ttl="86400", name="-", skipped=None ):
+    ## yields a tinydns line for each supported record in a master file
+    ## skipped, if given, is a dictionary that gets a count of each other type
+    for owner, rrttl, rtype, rdata, recorigin in zoneRecords( lines, origin, ttl, name ):
+        convert = ZONE_TYPES.get(rtype)
+        if convert is None:
+            if skipped is not None:
+                skipped[rtype] = skipped.get(rtype, 0) + 1
+            continue
+        try:
+            if "\\" not in owner:
+                yield( convert( owner, rrttl, rdata, recorigin ) )
+                continue
+            line = convert( plainOwner( owner ), rrttl, rdata, recorigin )
+            end = line.find(":", 1)
+            yield( line[0] + ownerText( owner ) + line[end:] )
+        except (ValueError, TypeError, OverflowError) as e:
+            raise ValueError(name + ": " + owner + " " + rtype + ": " + (str(e) or "bad rdata"))
+
+@statsOptions
+@outputOptions
+def main( argv=None ):
+    import getopt
+    if argv is None:
+        argv = sys.argv[1:]
+    origin = ""
+    ttl = "86400"
+
+    opts, args = getopt.getopt(argv,"ho:l:",["help","origin=","ttl="])
+    for opt, arg in opts:
+        if opt in ("-h", "--help"):
+            print('Usage: tinyzone.py --origin example.com [--ttl 86400] [zonefile ...]')
+            print('  --origin domain (initial $ORIGIN, for relative names and "@")')
+            print('  --ttl int (ttl for records before any $TTL or explicit ttl)')
+            print('  --stats, --stats-json file, --profile file (report run statistics, see tinystats.py)')
+            print('  --compact (write the shortest escaping tinydns-data accepts, report bytes saved)')
+            print('  --shards N or --shard-zones list, --shard-prefix path, --shard-only names (write to fragment files, see tinyshard.py)')
+            print('  zone files are read in order, stdin if none are given')
+            print('  record types: ' + " ".join(ZONE_TYPES))
+            return( 0 )
+        elif opt in ("-o", "--origin"):
+            origin = absoluteName( arg.rstrip(".") + ".", "" )
+        elif opt in ("-l", "--ttl"):
+            ttl = parseTtl( arg )
+
+    skipped = {}
+    statsStage( "write" )
+    with outputStream() as out:
+        for name in args or ["-"]:
+            infile = sys.stdin if name == "-" else open(name, "r")
+            with infile:
+                for line in statsOutput( zoneLines( statsTimed( "read", infile ), origin, ttl, name, skipped ) ):
+                    out.write( line + "\n" )
+
+    if skipped:
+        sys.stderr.write( "tinyzone: skipped " + ", ".join( str(n) + " " + rtype for rtype, n in sorted(skipped.items()) ) + "\n" )
+
+    return( 0 )
+
+if __name__ == "__main__":
+    sys.exit( main( sys.argv[1:] ) )